@@ -1,15 +1,108 @@
 import os
-from sqlmodel import create_engine, SQLModel, Session
+from sqlalchemy import Engine, event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool
+from sqlmodel import create_engine, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import settings
+from app.config.migrations import run_migrations
+from app.config.replica import RoutingSession
+from app.config.sharding import ShardMap
+from app.utils.metrics import instrument_engine
 
 sqlite_file_name = "../../database.sqlite"
 base_dir = os.path.dirname(os.path.realpath(__file__))
-database_url = f"sqlite:///{os.path.join(base_dir, sqlite_file_name)}"
 
-engine = create_engine(database_url, echo=True)
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def to_async_url(url: str) -> str:
+	parsed = make_url(url)
+	return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(hide_password=False)
+
+database_url = settings.DATABASE_URL or f"sqlite:///{os.path.join(base_dir, sqlite_file_name)}"
+async_database_url = settings.DATABASE_ASYNC_URL or to_async_url(database_url)
+replica_url = settings.DATABASE_REPLICA_URL
+async_replica_url = settings.DATABASE_REPLICA_ASYNC_URL or (to_async_url(replica_url) if replica_url else None)
+shard_urls = settings.DATABASE_SHARD_URLS
+
+# RoutingSession sends listing reads to one replica of the main database,
+# which would be the wrong database for users on the other shards.
+if replica_url and shard_urls:
+	raise ValueError("DATABASE_REPLICA_URL cannot be combined with DATABASE_SHARD_URLS")
+
+def set_sqlite_pragmas(engine: Engine, pragmas: dict):
+	@event.listens_for(engine, "connect")
+	def on_connect(dbapi_connection, connection_record):
+		cursor = dbapi_connection.cursor()
+		for name, value in pragmas.items():
+			cursor.execute(f"PRAGMA {name}={value}")
+		cursor.close()
+
+def engine_options(url: str, pool_size: int, max_overflow: int) -> dict:
+	parsed = make_url(url)
+	options = {}
+	# In-memory SQLite gets a single-connection pool from the dialect, which
+	# takes no size or timeout; every other database is served by a QueuePool.
+	if issubclass(parsed.get_dialect().get_pool_class(parsed), QueuePool):
+		options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=settings.DATABASE_POOL_TIMEOUT)
+	if parsed.get_backend_name() == "sqlite":
+		options["connect_args"] = {"check_same_thread": False}
+		return options
+	options.update(pool_pre_ping=settings.DATABASE_POOL_PRE_PING, pool_recycle=settings.DATABASE_POOL_RECYCLE)
+	# Stored timestamps are naive UTC, so PostgreSQL sessions run in UTC too
+	# instead of shifting values to the server's zone.
+	if parsed.get_backend_name() == "postgresql":
+		if parsed.get_driver_name() == "asyncpg":
+			options["connect_args"] = {"server_settings": {"timezone": "UTC"}}
+		else:
+			options["connect_args"] = {"options": "-c timezone=UTC"}
+	return options
+
+def create_app_engine(url: str,
+					  echo: bool = settings.DATABASE_ECHO,
+					  pragmas: dict = settings.SQLITE_PRAGMAS,
+					  pool_size: int = settings.DATABASE_POOL_SIZE,
+					  max_overflow: int = settings.DATABASE_MAX_OVERFLOW) -> Engine:
+	new_engine = create_engine(url, echo=echo, **engine_options(url, pool_size, max_overflow))
+	if new_engine.dialect.name == "sqlite":
+		set_sqlite_pragmas(new_engine, pragmas)
+	if settings.METRICS_ENABLED:
+		instrument_engine(new_engine)
+	return new_engine
+
+def create_app_async_engine(url: str,
+							echo: bool = settings.DATABASE_ECHO,
+							pragmas: dict = settings.SQLITE_PRAGMAS,
+							pool_size: int = settings.DATABASE_POOL_SIZE,
+							max_overflow: int = settings.DATABASE_MAX_OVERFLOW) -> AsyncEngine:
+	new_engine = create_async_engine(url, echo=echo, **engine_options(url, pool_size, max_overflow))
+	if new_engine.dialect.name == "sqlite":
+		set_sqlite_pragmas(new_engine.sync_engine, pragmas)
+	if settings.METRICS_ENABLED:
+		instrument_engine(new_engine.sync_engine)
+	return new_engine
+
+engine = create_app_engine(database_url)
+replica_engine = create_app_engine(replica_url) if replica_url else None
+async_engine = create_app_async_engine(async_database_url) if settings.DATABASE_ASYNC else None
+async_replica_engine = (create_app_async_engine(async_replica_url)
+						if settings.DATABASE_ASYNC and async_replica_url else None)
+shard_map = ShardMap([engine] + [create_app_engine(url) for url in shard_urls],
+					 [async_engine] + [create_app_async_engine(to_async_url(url)) for url in shard_urls]
+					 if settings.DATABASE_ASYNC else None)
 
 def init_db():
-	SQLModel.metadata.create_all(engine)
+	for shard_engine in shard_map.engines:
+		SQLModel.metadata.create_all(shard_engine)
+		run_migrations(shard_engine)
 
 def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+    with RoutingSession(engine, replica=replica_engine) as session:
+        yield session
+
+async def get_async_session():
+	replica = async_replica_engine.sync_engine if async_replica_engine else None
+	async with AsyncSession(async_engine, sync_session_class=RoutingSession, replica=replica) as session:
+		yield session
+
+get_db_session = get_async_session if settings.DATABASE_ASYNC else get_session
\ No newline at end of file
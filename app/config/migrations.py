@@ -0,0 +1,99 @@
+from sqlalchemy import Connection, Engine, Table, MetaData, Column, Integer, String, ForeignKey, insert, literal, text, inspect, func
+from sqlmodel import select
+from datetime import datetime, timezone
+from app.models.NoteModel import Note, Tag, NoteTag
+from app.models.UserModel import User
+from app.models.SchemaVersionModel import SchemaVersion
+from app.models.NoteSearchModel import NOTE_SEARCH_DDL
+
+# create_all only creates missing tables, so changes to existing tables are
+# applied here. Each migration runs once and is recorded in schema_version;
+# append new ones to MIGRATIONS and never edit one that has shipped.
+
+# Layout of the category table that migration 3 replaces with tag and
+# note_tag. Earlier migrations still run against it on old databases.
+legacy_category = Table(
+	"category", MetaData(),
+	Column("id", Integer, primary_key=True),
+	Column("name", String, nullable=False, index=True),
+	Column("note_id", Integer, ForeignKey("note.id"), index=True),
+)
+
+def create_indexes(connection: Connection, table: Table, *names: str):
+	indexes = {index.name: index for index in table.indexes}
+	for name in names:
+		indexes[name].create(connection, checkfirst=True)
+
+def add_lookup_indexes(connection: Connection):
+	create_indexes(connection, Note.__table__, "ix_note_user_id", "ix_note_user_id_is_archived_updated_at")
+	if inspect(connection).has_table("category"):
+		create_indexes(connection, legacy_category, "ix_category_note_id", "ix_category_name")
+	create_indexes(connection, User.__table__, "ix_user_username")
+
+def add_note_search_index(connection: Connection):
+	if connection.dialect.name != "sqlite":
+		return
+	for statement in NOTE_SEARCH_DDL:
+		connection.execute(text(statement))
+	connection.execute(text("INSERT INTO note_fts(note_fts) VALUES ('rebuild')"))
+
+def move_categories_to_tags(connection: Connection):
+	Tag.__table__.create(connection, checkfirst=True)
+	NoteTag.__table__.create(connection, checkfirst=True)
+	if not inspect(connection).has_table("category"):
+		return
+	category = legacy_category.c
+	owned_categories = (select(category.id, category.name, category.note_id, Note.user_id)
+		.join(Note, Note.id == category.note_id)
+		.where(Note.user_id.is_not(None))
+		.subquery())
+	tags = (select(owned_categories.c.user_id, owned_categories.c.name,
+				   literal(datetime.now(timezone.utc), Tag.updated_at.type))
+		.distinct())
+	connection.execute(insert(Tag).from_select(["user_id", "name", "updated_at"], tags))
+	# Each link keeps the id of the category row it replaces, so category ids
+	# held by clients stay valid. Repeated names on one note collapse into one.
+	links = (select(func.min(owned_categories.c.id), owned_categories.c.note_id, Tag.id)
+		.join(Tag, (Tag.user_id == owned_categories.c.user_id) & (Tag.name == owned_categories.c.name))
+		.group_by(owned_categories.c.note_id, Tag.id))
+	connection.execute(insert(NoteTag).from_select(["id", "note_id", "tag_id"], links))
+	legacy_category.drop(connection)
+
+def add_listing_indexes(connection: Connection):
+	create_indexes(connection, Note.__table__, "ix_note_user_id_is_archived_created_at",
+				   "ix_note_user_id_updated_at", "ix_note_user_id_created_at")
+
+def add_postgresql_search_index(connection: Connection):
+	# SQLite searches through note_fts (migration 2); PostgreSQL indexes the
+	# expression NoteService.search_notes_postgresql queries.
+	if connection.dialect.name != "postgresql":
+		return
+	connection.execute(text("CREATE INDEX IF NOT EXISTS ix_note_content_search "
+							"ON note USING gin (to_tsvector('simple', content))"))
+
+def add_note_revision(connection: Connection):
+	if "revision" in {column["name"] for column in inspect(connection).get_columns("note")}:
+		return
+	connection.execute(text("ALTER TABLE note ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"))
+
+MIGRATIONS = [
+	(1, add_lookup_indexes),
+	(2, add_note_search_index),
+	(3, move_categories_to_tags),
+	(4, add_listing_indexes),
+	(5, add_postgresql_search_index),
+	(6, add_note_revision),
+]
+
+def run_migrations(engine: Engine) -> list[int]:
+	applied_now = []
+	with engine.begin() as connection:
+		SchemaVersion.__table__.create(connection, checkfirst=True)
+		applied = set(connection.execute(select(SchemaVersion.version)).scalars())
+		for version, migration in MIGRATIONS:
+			if version in applied:
+				continue
+			migration(connection)
+			connection.execute(insert(SchemaVersion).values(version=version, applied_at=datetime.now(timezone.utc)))
+			applied_now.append(version)
+	return applied_now
@@ -0,0 +1,65 @@
+import time
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+from sqlalchemy import Engine
+from sqlmodel import Session
+from app.config import settings
+
+class ReplicaRouter:
+	# Remembers when each user last wrote. Replicas apply writes with some
+	# delay, and a read served from one right after a write would both show
+	# the old state and be cached under the new note_cache generation.
+	def __init__(self, max_lag: float):
+		self.max_lag = max_lag
+		self.last_writes: dict[int, float] = {}
+		self.lock = Lock()
+
+	def wrote(self, user_id: int):
+		now = time.monotonic()
+		with self.lock:
+			self.last_writes[user_id] = now
+			if len(self.last_writes) > 10000:
+				self.last_writes = {user: at for user, at in self.last_writes.items() if now - at < self.max_lag}
+
+	def replica_is_current(self, user_id: int) -> bool:
+		last_write = self.last_writes.get(user_id)
+		return last_write is None or time.monotonic() - last_write >= self.max_lag
+
+replica_router = ReplicaRouter(settings.DATABASE_REPLICA_MAX_LAG)
+
+class RoutingSession(Session):
+	# Binds to the primary, except inside reading_from_replica(). Flushes
+	# always go to the primary.
+	def __init__(self, *args, replica: Engine | None = None, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.replica = replica
+		self.use_replica = False
+
+	def get_bind(self, mapper=None, clause=None, **kwargs):
+		if self.use_replica and not self._flushing:
+			return self.replica
+		return super().get_bind(mapper, clause=clause, **kwargs)
+
+	@contextmanager
+	def reading_from_replica(self, user_id: int):
+		if self.replica is None or self.use_replica or not replica_router.replica_is_current(user_id):
+			yield
+			return
+		self.use_replica = True
+		try:
+			yield
+		finally:
+			self.use_replica = False
+
+def reads_from_replica(method):
+	# For service methods that only read. Outside a RoutingSession, e.g. in
+	# tests with a plain Session, the method runs on the session as is.
+	@wraps(method)
+	def wrapper(self, *args, **kwargs):
+		reading_from_replica = getattr(self.db, "reading_from_replica", None)
+		if reading_from_replica is None:
+			return method(self, *args, **kwargs)
+		with reading_from_replica(self.user_id):
+			return method(self, *args, **kwargs)
+	return wrapper
@@ -0,0 +1,123 @@
+from os import environ, cpu_count
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def env_bool(name: str, default: bool) -> bool:
+	value = environ.get(name)
+	if value is None:
+		return default
+	return value.strip().lower() in ("1", "true", "yes", "on")
+
+def env_int(name: str, default: int) -> int:
+	value = environ.get(name)
+	return int(value) if value else default
+
+def env_float(name: str, default: float) -> float:
+	value = environ.get(name)
+	return float(value) if value else default
+
+# Any SQLAlchemy URL; unset means the SQLite file next to the app. Async
+# URLs are derived (sqlite+aiosqlite, postgresql+asyncpg) unless given.
+# The PostgreSQL drivers (psycopg2, asyncpg) are not in requirements.txt.
+DATABASE_URL = environ.get("DATABASE_URL") or None
+DATABASE_ASYNC_URL = environ.get("DATABASE_ASYNC_URL") or None
+# Optional read replica for the listing reads; unset sends everything to
+# DATABASE_URL. A user's reads stay on the primary for REPLICA_MAX_LAG
+# seconds after their last write so they never see an older state.
+DATABASE_REPLICA_URL = environ.get("DATABASE_REPLICA_URL") or None
+DATABASE_REPLICA_ASYNC_URL = environ.get("DATABASE_REPLICA_ASYNC_URL") or None
+DATABASE_REPLICA_MAX_LAG = env_float("DATABASE_REPLICA_MAX_LAG", 5)
+# Further databases that users' notes and tags are spread over, comma
+# separated. DATABASE_URL is shard 0 and keeps the users and the user_shard
+# directory. Async URLs are derived per shard. Cannot be combined with a
+# replica.
+DATABASE_SHARD_URLS = [url.strip() for url in environ.get("DATABASE_SHARD_URLS", "").split(",") if url.strip()]
+# How long a move waits after blocking a user's writes for requests that
+# are already running to finish.
+DATABASE_SHARD_MOVE_GRACE = env_float("DATABASE_SHARD_MOVE_GRACE", 2)
+DATABASE_ECHO = env_bool("DATABASE_ECHO", False)
+# Serve requests through AsyncSession on the aiosqlite driver instead of
+# running sync sessions on the threadpool.
+DATABASE_ASYNC = env_bool("DATABASE_ASYNC", False)
+DATABASE_POOL_SIZE = env_int("DATABASE_POOL_SIZE", 10)
+DATABASE_MAX_OVERFLOW = env_int("DATABASE_MAX_OVERFLOW", 10)
+DATABASE_POOL_TIMEOUT = env_int("DATABASE_POOL_TIMEOUT", 30)
+# Server databases drop idle connections; pre-ping and recycling replace
+# them before a request runs into one. -1 never recycles.
+DATABASE_POOL_RECYCLE = env_int("DATABASE_POOL_RECYCLE", 1800)
+DATABASE_POOL_PRE_PING = env_bool("DATABASE_POOL_PRE_PING", False)
+
+# Applied to every new SQLite connection, in this order. journal_mode=WAL lets
+# readers run alongside the single writer, and busy_timeout makes a writer
+# wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+	"journal_mode": environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+	"synchronous": environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+	"busy_timeout": env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+	"cache_size": -env_int("SQLITE_CACHE_SIZE_KB", 65536),
+	"mmap_size": env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+	"temp_store": environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+# bcrypt runs on a dedicated pool so a burst of logins cannot starve the
+# workers serving notes. Calls beyond MAX_PENDING are rejected with 503.
+BCRYPT_ROUNDS = env_int("BCRYPT_ROUNDS", 12)
+PASSWORD_HASH_WORKERS = env_int("PASSWORD_HASH_WORKERS", min(4, cpu_count() or 1))
+PASSWORD_HASH_MAX_PENDING = env_int("PASSWORD_HASH_MAX_PENDING", 32)
+
+# Number of validated access tokens whose claims are cached; 0 disables it.
+TOKEN_CACHE_SIZE = env_int("TOKEN_CACHE_SIZE", 10000)
+# Where logged out tokens are remembered until they expire: "memory" only
+# covers the worker that handled the logout and is lost on restart, so run
+# several workers with "redis" (needs the redis package and REDIS_URL).
+TOKEN_REVOCATION_BACKEND = environ.get("TOKEN_REVOCATION_BACKEND", "memory")
+
+# Cache for NoteService reads: "memory" (in-process LRU), "redis" (needs the
+# redis package and REDIS_URL) or "none". A write only invalidates the memory
+# cache of its own process, so with several workers use "redis"; otherwise
+# other workers can serve categories and tag filters up to NOTE_CACHE_TTL old.
+NOTE_CACHE_BACKEND = environ.get("NOTE_CACHE_BACKEND", "memory")
+NOTE_CACHE_SIZE = env_int("NOTE_CACHE_SIZE", 10000)
+NOTE_CACHE_TTL = env_int("NOTE_CACHE_TTL", 300)
+REDIS_URL = environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+# Write-behind for note content edits: PATCH /notes/ appends the edit to
+# WRITE_BEHIND_LOG and answers, and the newest edit of each note is written
+# every WRITE_BEHIND_INTERVAL seconds. The buffer is per process, so this
+# needs a single worker. Set DATABASE_SHARD_MOVE_GRACE above the interval.
+WRITE_BEHIND_ENABLED = env_bool("WRITE_BEHIND_ENABLED", False)
+WRITE_BEHIND_INTERVAL = env_float("WRITE_BEHIND_INTERVAL", 1)
+WRITE_BEHIND_LOG = environ.get("WRITE_BEHIND_LOG", "write_behind.log")
+# fsync each appended edit; without it a power loss can drop edits that
+# were acknowledged but not yet flushed.
+WRITE_BEHIND_FSYNC = env_bool("WRITE_BEHIND_FSYNC", True)
+
+# Per-route latency and SQL statement histograms, served at /metrics in the
+# Prometheus text format.
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+
+
+# Token buckets per user (per client address before login), with separate
+# budgets for reads, writes and the login/signup routes. RATE values are
+# requests per second, BURST is the bucket size. "redis" shares the buckets
+# between processes; MAX_CONCURRENT caps in-flight requests per client.
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_BACKEND = environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_READ_PER_SECOND = env_float("RATE_LIMIT_READ_PER_SECOND", 50)
+RATE_LIMIT_READ_BURST = env_int("RATE_LIMIT_READ_BURST", 200)
+RATE_LIMIT_WRITE_PER_SECOND = env_float("RATE_LIMIT_WRITE_PER_SECOND", 20)
+RATE_LIMIT_WRITE_BURST = env_int("RATE_LIMIT_WRITE_BURST", 100)
+RATE_LIMIT_AUTH_PER_SECOND = env_float("RATE_LIMIT_AUTH_PER_SECOND", 5)
+RATE_LIMIT_AUTH_BURST = env_int("RATE_LIMIT_AUTH_BURST", 20)
+RATE_LIMIT_MAX_CONCURRENT = env_int("RATE_LIMIT_MAX_CONCURRENT", 16)
+RATE_LIMIT_MAX_KEYS = env_int("RATE_LIMIT_MAX_KEYS", 100000)
+
+# JSON and NDJSON responses of at least COMPRESSION_MIN_SIZE bytes are sent
+# with brotli (if the brotli package is installed) or gzip, whichever the
+# client accepts. Compression runs on the event loop, so the default level
+# favours speed: level 1 gets most of the size reduction of level 6.
+COMPRESSION_ENABLED = env_bool("COMPRESSION_ENABLED", True)
+COMPRESSION_MIN_SIZE = env_int("COMPRESSION_MIN_SIZE", 1024)
+COMPRESSION_GZIP_LEVEL = env_int("COMPRESSION_GZIP_LEVEL", 1)
+COMPRESSION_BROTLI_QUALITY = env_int("COMPRESSION_BROTLI_QUALITY", 4)
@@ -0,0 +1,180 @@
+import time
+from sqlalchemy import Connection, Engine, Table, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import datetime, timezone
+from app.config import settings
+from app.models.NoteModel import Note, Tag, NoteTag, NoteTombstone
+from app.models.UserShardModel import UserShard
+from app.services.NoteService import NoteService
+from app.utils.note_cache import note_cache
+
+def user_version(connection: Connection, user_id: int) -> tuple:
+	with Session(connection) as session:
+		return NoteService(user_id, session).get_notes_version()
+
+def delete_user_rows(connection: Connection, user_id: int):
+	owned_notes = select(Note.id).where(Note.user_id == user_id)
+	connection.execute(delete(NoteTag).where(NoteTag.note_id.in_(owned_notes)))
+	connection.execute(delete(Note).where(Note.user_id == user_id))
+	connection.execute(delete(Tag).where(Tag.user_id == user_id))
+	connection.execute(delete(NoteTombstone).where(NoteTombstone.user_id == user_id))
+
+def insert_rows(connection: Connection, table: Table, rows: list[dict]) -> dict[int, int]:
+	# Inserts rows under new ids and maps each old id to its new one. Ids are
+	# allocated per database, so the old ones may already be taken here.
+	if not rows:
+		return {}
+	query = insert(table).returning(table.c.id)
+	values = [{name: value for name, value in row.items() if name != "id"} for row in rows]
+	new_ids = sorted(connection.execute(query, values).scalars())
+	return {row["id"]: new_id for row, new_id in zip(rows, new_ids)}
+
+class ShardMap:
+	# Shard 0 is the main database, which also holds the users and the
+	# user_shard directory. Users without a directory row predate sharding
+	# and live on shard 0.
+	def __init__(self, engines: list[Engine], async_engines: list[AsyncEngine] | None = None):
+		self.engines = engines
+		self.async_engines = async_engines
+
+	@property
+	def directory(self) -> Engine:
+		return self.engines[0]
+
+	@property
+	def sharded(self) -> bool:
+		return len(self.engines) > 1
+
+	def place(self, user_id: int) -> int:
+		return user_id % len(self.engines)
+
+	def locate(self, user_id: int) -> UserShard:
+		with self.directory.connect() as connection:
+			row = connection.execute(select(UserShard.shard, UserShard.moving)
+				.where(UserShard.user_id == user_id)).first()
+		if row is None:
+			return UserShard(user_id=user_id)
+		return UserShard(user_id=user_id, shard=row.shard, moving=row.moving)
+
+	def assign(self, user_id: int, shard: int, moving: bool = False):
+		with self.directory.begin() as connection:
+			result = connection.execute(update(UserShard)
+				.where(UserShard.user_id == user_id)
+				.values(shard=shard, moving=moving))
+			if result.rowcount == 0:
+				connection.execute(insert(UserShard).values(user_id=user_id, shard=shard, moving=moving))
+
+	def bind(self, session: Session | AsyncSession, shard: int):
+		# Only valid before the session has run a statement.
+		if isinstance(session, AsyncSession):
+			session.bind = self.async_engines[shard]
+			session.sync_session.bind = self.async_engines[shard].sync_engine
+		else:
+			session.bind = self.engines[shard]
+		session.info["shard"] = shard
+
+	def copy_user(self, user_id: int, source: Engine, target: Engine) -> int | None:
+		# Copies the user's rows to the target under new ids, with a tombstone
+		# for every old note id and updated_at bumped on every copy, so clients
+		# syncing with ?since= drop the old ids and fetch the new ones. Returns
+		# None, leaving the target untouched, if the user's notes changed while
+		# they were read.
+		with source.connect() as reader, target.connect() as writer:
+			version = user_version(reader, user_id)
+			owned_notes = select(Note.id).where(Note.user_id == user_id)
+			tags = reader.execute(select(Tag.__table__).where(Tag.user_id == user_id).order_by(Tag.id)).mappings().all()
+			notes = reader.execute(select(Note.__table__).where(Note.user_id == user_id).order_by(Note.id)).mappings().all()
+			links = reader.execute(select(NoteTag.__table__)
+				.where(NoteTag.note_id.in_(owned_notes))
+				.order_by(NoteTag.id)).mappings().all()
+			tombstones = reader.execute(select(NoteTombstone.__table__)
+				.where(NoteTombstone.user_id == user_id)
+				.order_by(NoteTombstone.id)).mappings().all()
+			now = datetime.now(timezone.utc)
+			with writer.begin() as transaction:
+				delete_user_rows(writer, user_id)
+				tag_ids = insert_rows(writer, Tag.__table__, [dict(tag) for tag in tags])
+				note_ids = insert_rows(writer, Note.__table__, [{**note, "updated_at": now} for note in notes])
+				if links:
+					writer.execute(insert(NoteTag), [{"note_id": note_ids[link["note_id"]], "tag_id": tag_ids[link["tag_id"]]}
+													 for link in links])
+				moved_tombstones = ([{"note_id": tombstone["note_id"], "user_id": user_id, "deleted_at": tombstone["deleted_at"]}
+									 for tombstone in tombstones]
+									+ [{"note_id": note["id"], "user_id": user_id, "deleted_at": now} for note in notes])
+				if moved_tombstones:
+					writer.execute(insert(NoteTombstone), moved_tombstones)
+				if user_version(reader, user_id) != version:
+					transaction.rollback()
+					return None
+		return len(notes)
+
+	def move_user(self, user_id: int, target: int,
+				  grace: float = settings.DATABASE_SHARD_MOVE_GRACE, attempts: int = 5) -> int:
+		# Moves a user while the app is serving them: their writes are refused
+		# with 503 for the duration and reads stay on the source until the
+		# directory flips. Returns the number of notes moved.
+		source = self.locate(user_id).shard
+		if source == target:
+			return 0
+		self.assign(user_id, source, moving=True)
+		try:
+			# Lets writes that passed the check before the flag was set finish;
+			# any that are still running make the version check retry the copy.
+			time.sleep(grace)
+			moved = None
+			for _ in range(attempts):
+				moved = self.copy_user(user_id, self.engines[source], self.engines[target])
+				if moved is not None:
+					break
+			if moved is None:
+				raise RuntimeError(f"User {user_id} kept changing while being copied to shard {target}")
+			self.assign(user_id, target)
+		except BaseException:
+			self.assign(user_id, source)
+			raise
+		with self.engines[source].begin() as connection:
+			delete_user_rows(connection, user_id)
+		note_cache.invalidate(user_id)
+		return moved
+
+	def note_counts(self) -> dict[int, dict[int, int]]:
+		# Notes per user on each shard, by where the directory places the user,
+		# so rows left behind by an interrupted move are not counted.
+		with self.directory.connect() as connection:
+			placements = dict(connection.execute(select(UserShard.user_id, UserShard.shard)).all())
+		counts = {shard: {} for shard in range(len(self.engines))}
+		for shard, shard_engine in enumerate(self.engines):
+			with shard_engine.connect() as connection:
+				rows = connection.execute(select(Note.user_id, func.count(Note.id))
+					.where(Note.user_id.is_not(None))
+					.group_by(Note.user_id)).all()
+			for user_id, count in rows:
+				if placements.get(user_id, 0) == shard:
+					counts[shard][user_id] = count
+		return counts
+
+	def plan_balance(self) -> list[tuple[int, int, int]]:
+		# Greedy: repeatedly moves the largest user that narrows the gap
+		# between the fullest and the emptiest shard, until none does. Each
+		# user moves at most once. Returns (user_id, source, target) moves.
+		counts = self.note_counts()
+		totals = {shard: sum(users.values()) for shard, users in counts.items()}
+		moves = []
+		planned = set()
+		while True:
+			fullest = max(totals, key=totals.get)
+			emptiest = min(totals, key=totals.get)
+			gap = totals[fullest] - totals[emptiest]
+			candidates = [(count, user_id) for user_id, count in counts[fullest].items()
+						  if 0 < count * 2 <= gap and user_id not in planned]
+			if not candidates:
+				return moves
+			count, user_id = max(candidates)
+			del counts[fullest][user_id]
+			counts[emptiest][user_id] = count
+			totals[fullest] -= count
+			totals[emptiest] += count
+			planned.add(user_id)
+			moves.append((user_id, fullest, emptiest))
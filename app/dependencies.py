@@ -1,7 +1,19 @@
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Request, status
 from typing import Annotated
+from app.config.database import get_db_session, shard_map
 from app.utils.token_manager import get_current_user
 
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
-
+async def get_user_session(user: user_dependency, request: Request, session=Depends(get_db_session)):
+	# Binds the request session to the shard that holds the user's notes and
+	# tags. The directory lookup is a primary key read on the main database,
+	# cheap enough to run on the event loop.
+	if shard_map.sharded:
+		placement = shard_map.locate(user["id"])
+		if placement.moving and request.method not in ("GET", "HEAD"):
+			raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+								detail="Notes are being moved, retry shortly",
+								headers={"Retry-After": "1"})
+		shard_map.bind(session, placement.shard)
+	return session
@@ -3,7 +3,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.routers.users import users_router
 from app.routers.notes import notes_router
-from .config.database import init_db
+from app.routers.tags import tags_router
+from app.routers.metrics import metrics_router
+from app.utils.metrics import MetricsMiddleware
+from app.utils.rate_limit import RateLimitMiddleware
+from app.utils.compression import CompressionMiddleware
+from app.config import settings
+from .config.database import init_db, shard_map
+from app.utils.write_behind import write_behind
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,10 +18,21 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
 	init_db()
+	if settings.WRITE_BEHIND_ENABLED:
+		write_behind.start(shard_map.engines)
 	yield
+	write_behind.stop()
 
 app = FastAPI(lifespan=lifespan)
 
+if settings.COMPRESSION_ENABLED:
+	app.add_middleware(CompressionMiddleware)
+
+# Added before CORS so that it runs inside it and 429 responses still carry
+# the CORS headers browsers need to read them.
+if settings.RATE_LIMIT_ENABLED:
+	app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -25,6 +43,11 @@ app.add_middleware(
 
 app.include_router(users_router, prefix="/users", tags=["users"])
 app.include_router(notes_router, prefix="/notes", tags=["notes"])
+app.include_router(tags_router, prefix="/tags", tags=["tags"])
+
+if settings.METRICS_ENABLED:
+	app.add_middleware(MetricsMiddleware)
+	app.include_router(metrics_router, tags=["metrics"])
 
 @app.get("/")
 def health_check():
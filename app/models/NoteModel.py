@@ -1,20 +1,54 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, UniqueConstraint
 from typing import Optional
 from datetime import datetime, timezone
 
 class Note(SQLModel, table=True):
+	__table_args__ = (
+		Index("ix_note_user_id_is_archived_updated_at", "user_id", "is_archived", "updated_at"),
+		Index("ix_note_user_id_is_archived_created_at", "user_id", "is_archived", "created_at"),
+		Index("ix_note_user_id_updated_at", "user_id", "updated_at"),
+		Index("ix_note_user_id_created_at", "user_id", "created_at"),
+	)
 	id: int | None = Field(default=None, primary_key=True)
 	content: str
 	created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 	updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 	is_archived: bool = False
-	user_id: int | None = Field(default=None, foreign_key="user.id")
-	categories: list["Category"] = Relationship(back_populates="note")
+	# Bumped by every content change; patches name the revision they apply to.
+	revision: int = 0
+	user_id: int | None = Field(default=None, foreign_key="user.id", index=True)
+	tag_links: list["NoteTag"] = Relationship(back_populates="note", sa_relationship_kwargs={"lazy": "selectin", "order_by": "NoteTag.id"})
 	
-class Category(SQLModel, table=True):
+class Tag(SQLModel, table=True):
+	__table_args__ = (
+		UniqueConstraint("user_id", "name", name="uq_tag_user_id_name"),
+	)
 	id: int | None = Field(default=None, primary_key=True)
+	user_id: int = Field(foreign_key="user.id")
 	name: str
-	note_id: int | None = Field(default=None, foreign_key="note.id")
-	note: Optional[Note] = Relationship(back_populates="categories")
+	# Bumped by renames and merges, which change notes without touching them.
+	updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+	
+class NoteTag(SQLModel, table=True):
+	__tablename__ = "note_tag"
+	__table_args__ = (
+		UniqueConstraint("note_id", "tag_id", name="uq_note_tag_note_id_tag_id"),
+		Index("ix_note_tag_tag_id_note_id", "tag_id", "note_id"),
+	)
+	id: int | None = Field(default=None, primary_key=True)
+	note_id: int = Field(foreign_key="note.id")
+	tag_id: int = Field(foreign_key="tag.id")
+	note: Optional[Note] = Relationship(back_populates="tag_links")
+	tag: Optional[Tag] = Relationship(sa_relationship_kwargs={"lazy": "joined"})
+	
+class NoteTombstone(SQLModel, table=True):
+	__table_args__ = (
+		Index("ix_notetombstone_user_id_deleted_at", "user_id", "deleted_at"),
+	)
+	id: int | None = Field(default=None, primary_key=True)
+	note_id: int
+	user_id: int
+	deleted_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
@@ -0,0 +1,29 @@
+from sqlalchemy import DDL, event, table, column
+from app.models.NoteModel import Note
+
+# note_fts is an FTS5 index over note.content that reads the text from the
+# note table itself (external content), kept in sync by triggers. user_id is
+# indexed too, so a search is scoped to one user inside the index instead of
+# filtering every match afterwards; rank ignores it.
+NOTE_SEARCH_DDL = [
+	"""CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5(
+		content, user_id, content='note', content_rowid='id', prefix='2 3'
+	)""",
+	"INSERT INTO note_fts(note_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+	"""CREATE TRIGGER IF NOT EXISTS note_fts_after_insert AFTER INSERT ON note BEGIN
+		INSERT INTO note_fts(rowid, content, user_id) VALUES (new.id, new.content, new.user_id);
+	END""",
+	"""CREATE TRIGGER IF NOT EXISTS note_fts_after_delete AFTER DELETE ON note BEGIN
+		INSERT INTO note_fts(note_fts, rowid, content, user_id) VALUES ('delete', old.id, old.content, old.user_id);
+	END""",
+	"""CREATE TRIGGER IF NOT EXISTS note_fts_after_update AFTER UPDATE OF content, user_id ON note BEGIN
+		INSERT INTO note_fts(note_fts, rowid, content, user_id) VALUES ('delete', old.id, old.content, old.user_id);
+		INSERT INTO note_fts(rowid, content, user_id) VALUES (new.id, new.content, new.user_id);
+	END""",
+]
+
+note_fts = table("note_fts", column("rowid"), column("note_fts"), column("rank"))
+
+for statement in NOTE_SEARCH_DDL:
+	event.listen(Note.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Note.__table__, "before_drop", DDL("DROP TABLE IF EXISTS note_fts").execute_if(dialect="sqlite"))
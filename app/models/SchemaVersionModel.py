@@ -0,0 +1,7 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime, timezone
+
+class SchemaVersion(SQLModel, table=True):
+	__tablename__ = "schema_version"
+	version: int = Field(primary_key=True)
+	applied_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
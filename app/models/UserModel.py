@@ -2,5 +2,5 @@ from sqlmodel import SQLModel, Field
 
 class User(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    username: str
+    username: str = Field(unique=True, index=True)
     password: str
\ No newline at end of file
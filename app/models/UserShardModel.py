@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+
+class UserShard(SQLModel, table=True):
+	__tablename__ = "user_shard"
+	user_id: int = Field(primary_key=True, foreign_key="user.id")
+	shard: int = 0
+	# Set while the rebalancer copies the user to another shard; their
+	# writes are refused until the move completes.
+	moving: bool = False
@@ -0,0 +1,56 @@
+# Moves users between the shards listed in DATABASE_SHARD_URLS while the app
+# keeps serving them. Run with the app's environment:
+#   python -m app.rebalance status
+#   python -m app.rebalance move USER_ID SHARD
+#   python -m app.rebalance balance [--apply]
+# Moved notes, tags and categories get new ids; clients that sync with
+# ?since= pick the change up from the tombstones of the old ids.
+import argparse
+from app.config import settings
+from app.config.database import init_db, shard_map
+
+def print_status():
+	for shard, users in shard_map.note_counts().items():
+		print(f"shard {shard}: {len(users)} users, {sum(users.values())} notes")
+
+def move(user_id: int, shard: int):
+	moved = shard_map.move_user(user_id, shard)
+	print(f"user {user_id}: moved {moved} notes to shard {shard}")
+
+def balance(apply: bool, grace: float):
+	moves = shard_map.plan_balance()
+	if not moves:
+		print("shards are balanced")
+	for user_id, source, target in moves:
+		if not apply:
+			print(f"user {user_id}: shard {source} -> {target}")
+			continue
+		moved = shard_map.move_user(user_id, target, grace=grace)
+		print(f"user {user_id}: moved {moved} notes from shard {source} to {target}")
+
+def main():
+	parser = argparse.ArgumentParser(description="Inspect and rebalance note shards.")
+	commands = parser.add_subparsers(dest="command", required=True)
+	commands.add_parser("status", help="Users and notes per shard.")
+	move_parser = commands.add_parser("move", help="Move one user to a shard.")
+	move_parser.add_argument("user_id", type=int)
+	move_parser.add_argument("shard", type=int)
+	balance_parser = commands.add_parser("balance", help="Plan moves that even out notes per shard.")
+	balance_parser.add_argument("--apply", action="store_true", help="Run the planned moves instead of listing them.")
+	balance_parser.add_argument("--grace", type=float, default=settings.DATABASE_SHARD_MOVE_GRACE,
+								help="Seconds to wait for running writes before each copy.")
+	args = parser.parse_args()
+	if not shard_map.sharded:
+		parser.error("DATABASE_SHARD_URLS is not set")
+	init_db()
+	if args.command == "status":
+		print_status()
+	elif args.command == "move":
+		if not 0 <= args.shard < len(shard_map.engines):
+			parser.error(f"shard must be between 0 and {len(shard_map.engines) - 1}")
+		move(args.user_id, args.shard)
+	else:
+		balance(args.apply, args.grace)
+
+if __name__ == "__main__":
+	main()
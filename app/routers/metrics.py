@@ -0,0 +1,14 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+from app.utils.metrics import metrics
+from app.utils.token_manager import token_cache
+from app.utils.note_cache import note_cache
+from app.utils.write_behind import write_behind
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+	content = metrics.render({"token_cache": token_cache.stats(), "note_cache": note_cache.stats(),
+							  "write_behind": write_behind.stats()})
+	return PlainTextResponse(status_code=status.HTTP_200_OK, content=content, media_type="text/plain; version=0.0.4")
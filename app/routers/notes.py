@@ -1,79 +1,210 @@
-from fastapi import APIRouter, Depends, status, Response
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
-from app.dependencies import user_dependency
+from fastapi import APIRouter, Depends, status, Response, Query, Request, Header
+from fastapi.responses import StreamingResponse
+from app.dependencies import user_dependency, get_user_session
 from app.schemas.NoteSchema import NoteSchema
 from app.schemas.NoteContentSchema import NoteContentSchema
-from app.services.NoteService import NoteService
-from app.config.database import get_session
+from app.schemas.NotePatchSchema import NotePatchSchema
+from app.schemas.NoteBatchSchema import NoteBatchCreateSchema, NoteBatchIdsSchema, NoteBatchArchiveSchema, NoteBatchRetagSchema
+from app.schemas.NoteFilterSchema import NoteFilterSchema, NoteSort
+from app.schemas.NoteImportSchema import NoteImportSchema, IMPORT_CHUNK_SIZE, MAX_IMPORT_LINE_BYTES
+from app.services.AsyncNoteService import AsyncNoteService
+from app.utils.etag import make_etag, etag_matches
+from app.utils.fieldsets import NoteFieldset
+from app.utils.json_response import FastJSONResponse
+from app.utils.ndjson import to_ndjson, batches_to_ndjson, read_lines, LineTooLongError
+from app.utils.text_patch import StaleRevisionError
+from pydantic import ValidationError
+from datetime import datetime
 
 notes_router = APIRouter()
 
+MAX_PAGE_SIZE = 1000
+
+def notes_page(notes, limit: int | None, filters: NoteFilterSchema | None = None) -> dict:
+	content = {"notes": notes}
+	if limit is not None:
+		filters = filters or NoteFilterSchema()
+		content["next_cursor"] = filters.next_cursor(notes[-1]) if len(notes) == limit else None
+	return content
+
 @notes_router.post("/")
-def create_notes(user: user_dependency, note: NoteSchema, session=Depends(get_session)):
-	new_note = NoteService(user["id"], session).create_note(note)
-	return JSONResponse(status_code=status.HTTP_201_CREATED, content={"note": jsonable_encoder(new_note)})
+async def create_notes(user: user_dependency, note: NoteSchema, session=Depends(get_user_session)):
+	new_note = await AsyncNoteService(user["id"], session).create_note(note)
+	return FastJSONResponse(status_code=status.HTTP_201_CREATED, content={"note": new_note})
 	
 @notes_router.get("/")
-def get_notes(user: user_dependency, session=Depends(get_session)):
-	notes = NoteService(user["id"], session).get_notes()
-	return JSONResponse(status_code=status.HTTP_200_OK, content={"notes": jsonable_encoder(notes)})
+async def get_notes(user: user_dependency,
+					request: Request,
+					limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+					cursor: str | None = None,
+					since: datetime | None = None,
+					archived: bool | None = None,
+					tag: str | None = None,
+					created_after: datetime | None = None,
+					created_before: datetime | None = None,
+					updated_after: datetime | None = None,
+					updated_before: datetime | None = None,
+					sort: NoteSort = "id",
+					stream: bool = False,
+					fields: str | None = None,
+					summary: bool = False,
+					if_none_match: str | None = Header(default=None),
+					session=Depends(get_user_session)):
+	filters = NoteFilterSchema(archived=archived, tag=tag, sort=sort,
+							   created_after=created_after, created_before=created_before,
+							   updated_after=updated_after, updated_before=updated_before)
+	try:
+		fieldset = NoteFieldset(fields, summary)
+		if cursor is not None:
+			filters.parse_cursor(cursor)
+	except ValueError as error:
+		return FastJSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"detail": str(error)})
+	note_service = AsyncNoteService(user["id"], session)
+	if stream:
+		notes = note_service.stream_notes(filters=filters)
+		if fieldset.trims:
+			notes = (fieldset.apply(note) async for note in notes)
+		return StreamingResponse(to_ndjson(notes), media_type="application/x-ndjson")
+	version = await note_service.get_notes_version()
+	etag = make_etag(*version, request.url.query)
+	if etag_matches(if_none_match, etag):
+		return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+	notes = await note_service.get_notes(limit, cursor, since, filters, version)
+	content = notes_page(notes, limit, filters)
+	content["notes"] = fieldset.apply_all(notes)
+	if since is not None:
+		# Clients apply "deleted" before "notes": SQLite may reuse the id of a
+		# deleted note for a new one.
+		content["deleted"] = await note_service.get_deleted_note_ids(since)
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content=content, headers={"ETag": etag})
+
+@notes_router.get("/export")
+async def export_notes(user: user_dependency, session=Depends(get_user_session)):
+	batches = AsyncNoteService(user["id"], session).export_notes()
+	return StreamingResponse(batches_to_ndjson(batches), media_type="application/x-ndjson",
+							 headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'})
+
+@notes_router.post("/import")
+async def import_notes(user: user_dependency, request: Request, session=Depends(get_user_session)):
+	# Chunks are committed as they fill up. On an invalid line the response
+	# reports how many notes were imported before it.
+	note_service = AsyncNoteService(user["id"], session)
+	imported = 0
+	chunk = []
+	line_number = 0
+	try:
+		async for line_number, line in read_lines(request.stream(), MAX_IMPORT_LINE_BYTES):
+			chunk.append(NoteImportSchema.model_validate_json(line))
+			if len(chunk) == IMPORT_CHUNK_SIZE:
+				imported += await note_service.import_notes(chunk)
+				chunk = []
+		if chunk:
+			imported += await note_service.import_notes(chunk)
+	except ValidationError as error:
+		return FastJSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+								content={"imported": imported, "line": line_number,
+										 "detail": error.errors(include_url=False, include_context=False)})
+	except LineTooLongError as error:
+		return FastJSONResponse(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+								content={"imported": imported, "line": error.args[0]})
+	return FastJSONResponse(status_code=status.HTTP_201_CREATED, content={"imported": imported})
+
+@notes_router.get("/search")
+async def search_notes(user: user_dependency,
+					   q: str,
+					   limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+					   offset: int = Query(default=0, ge=0),
+					   session=Depends(get_user_session)):
+	notes = await AsyncNoteService(user["id"], session).search_notes(q, limit, offset)
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"notes": notes})
 
 @notes_router.delete("/")
-def delete_note(user: user_dependency, note_id: int, session=Depends(get_session)):
-	deleted_note = NoteService(user["id"], session).delete_note(note_id)
+async def delete_note(user: user_dependency, note_id: int, session=Depends(get_user_session)):
+	deleted_note = await AsyncNoteService(user["id"], session).delete_note(note_id)
 	if not deleted_note:
-		return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"deleted": False})
-	return JSONResponse(status_code=status.HTTP_200_OK, content={"deleted": True})
+		return FastJSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"deleted": False})
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"deleted": True})
 
 @notes_router.patch("/archived")
-def change_note_archived_status(user: user_dependency, note_id: int, session=Depends(get_session)):
-	updated_note = NoteService(user["id"], session).update_archived_status(note_id)
+async def change_note_archived_status(user: user_dependency, note_id: int, session=Depends(get_user_session)):
+	updated_note = await AsyncNoteService(user["id"], session).update_archived_status(note_id)
 	if not updated_note:
-		return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"updated": False})
-	return JSONResponse(status_code=status.HTTP_200_OK, content={"updated": jsonable_encoder(updated_note)})
+		return FastJSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"updated": False})
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"updated": updated_note})
 
 @notes_router.patch("/")
-def change_note_content(user: user_dependency, note_id: int, content: NoteContentSchema, session=Depends(get_session)):
-	updated_note = NoteService(user["id"], session).update_content(note_id, content.content)
+async def change_note_content(user: user_dependency, note_id: int, content: NoteContentSchema, session=Depends(get_user_session)):
+	try:
+		updated_note = await AsyncNoteService(user["id"], session).update_content(note_id, content.content, content.base_revision)
+	except StaleRevisionError as error:
+		return FastJSONResponse(status_code=status.HTTP_409_CONFLICT, content={"updated": False, "revision": error.args[0]})
 	if not updated_note:
-		return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"updated": False})
-	return JSONResponse(status_code=status.HTTP_200_OK, content={"updated": jsonable_encoder(updated_note)})
+		return FastJSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"updated": False})
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"updated": updated_note})
+
+@notes_router.patch("/diff")
+async def patch_note_content(user: user_dependency, note_id: int, patch: NotePatchSchema, session=Depends(get_user_session)):
+	try:
+		updated_note = await AsyncNoteService(user["id"], session).patch_content(note_id, patch.base_revision, patch.ops)
+	except StaleRevisionError as error:
+		return FastJSONResponse(status_code=status.HTTP_409_CONFLICT, content={"updated": False, "revision": error.args[0]})
+	except ValueError as error:
+		return FastJSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"detail": str(error)})
+	if not updated_note:
+		return FastJSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"updated": False})
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"updated": updated_note})
 	
 @notes_router.get("/categories", tags=["category"])
-def get_categories_by_note_id(user: user_dependency, note_id: int, session=Depends(get_session)):
-	note_categories = NoteService(user["id"], session).get_note_categories_by_note_id(note_id)
-	return JSONResponse(status_code=status.HTTP_200_OK, content={"categories": jsonable_encoder(note_categories)})
+async def get_categories_by_note_id(user: user_dependency, note_id: int, session=Depends(get_user_session)):
+	note_categories = await AsyncNoteService(user["id"], session).get_note_categories_by_note_id(note_id)
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"categories": note_categories})
 
 @notes_router.post("/categories", tags=["category"])
-def add_category(user: user_dependency, note_id: int, name: str, session=Depends(get_session)):
-	new_category = NoteService(user["id"], session).add_category(note_id, name)
+async def add_category(user: user_dependency, note_id: int, name: str, session=Depends(get_user_session)):
+	new_category = await AsyncNoteService(user["id"], session).add_category(note_id, name)
 	if not new_category:
-		return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"added": False})
-	return JSONResponse(status_code=status.HTTP_200_OK, content={"added": jsonable_encoder(new_category)})
+		return FastJSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"added": False})
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"added": new_category})
 	
 @notes_router.delete("/categories", tags=["category"])
-def delete_catergory_by_id(user: user_dependency, category_id: int, session=Depends(get_session)):
-	category_to_delete = NoteService(user["id"], session).delete_category_by_category_id(category_id)
+async def delete_catergory_by_id(user: user_dependency, category_id: int, session=Depends(get_user_session)):
+	category_to_delete = await AsyncNoteService(user["id"], session).delete_category_by_category_id(category_id)
 	if not category_to_delete:
-		return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"deleted": False})
-	return JSONResponse(status_code=status.HTTP_200_OK, content={"deleted": True})
+		return FastJSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"deleted": False})
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"deleted": True})
 
 @notes_router.patch("/categories", tags=["category"])
-def update_category_name_by_id(user: user_dependency, category_id: int, new_name: str, session=Depends(get_session)):
-	category_to_update = NoteService(user["id"], session).update_category_by_category_id(category_id, new_name)
+async def update_category_name_by_id(user: user_dependency, category_id: int, new_name: str, session=Depends(get_user_session)):
+	category_to_update = await AsyncNoteService(user["id"], session).update_category_by_category_id(category_id, new_name)
 	if not category_to_update:
-		return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"updated": False})
-	return JSONResponse(status_code=status.HTTP_200_OK, content={"updated": jsonable_encoder(category_to_update)})
+		return FastJSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"updated": False})
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"updated": category_to_update})
 	
 @notes_router.get("/categories/filterbyname", tags=["category"])
-def filter_notes_by_category(user: user_dependency, name: str, session=Depends(get_session)):
-	notes_with_specific_category_name = NoteService(user["id"], session).get_categories_by_name(name)
-	return JSONResponse(status_code=status.HTTP_200_OK, content={"notes": jsonable_encoder(notes_with_specific_category_name)})
-	
+async def filter_notes_by_category(user: user_dependency,
+								   name: str,
+								   limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+								   cursor: int | None = None,
+								   session=Depends(get_user_session)):
+	notes_with_specific_category_name = await AsyncNoteService(user["id"], session).get_categories_by_name(name, limit, cursor)
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content=notes_page(notes_with_specific_category_name, limit))
 
+@notes_router.post("/batch", tags=["batch"])
+async def create_notes_batch(user: user_dependency, batch: NoteBatchCreateSchema, session=Depends(get_user_session)):
+	results = await AsyncNoteService(user["id"], session).create_notes(batch.notes)
+	return FastJSONResponse(status_code=status.HTTP_201_CREATED, content={"results": results})
 
+@notes_router.patch("/batch/archived", tags=["batch"])
+async def archive_notes_batch(user: user_dependency, batch: NoteBatchArchiveSchema, session=Depends(get_user_session)):
+	results = await AsyncNoteService(user["id"], session).archive_notes(batch.note_ids, batch.is_archived)
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"results": results})
 
+@notes_router.delete("/batch", tags=["batch"])
+async def delete_notes_batch(user: user_dependency, batch: NoteBatchIdsSchema, session=Depends(get_user_session)):
+	results = await AsyncNoteService(user["id"], session).delete_notes(batch.note_ids)
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"results": results})
 
-	
-	
\ No newline at end of file
+@notes_router.put("/batch/categories", tags=["batch"])
+async def retag_notes_batch(user: user_dependency, batch: NoteBatchRetagSchema, session=Depends(get_user_session)):
+	results = await AsyncNoteService(user["id"], session).retag_notes(batch.notes)
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"results": results})
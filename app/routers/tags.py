@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, status
+from app.dependencies import user_dependency, get_user_session
+from app.services.AsyncTagService import AsyncTagService
+from app.utils.json_response import FastJSONResponse
+
+tags_router = APIRouter()
+
+@tags_router.get("/")
+async def get_tags(user: user_dependency, session=Depends(get_user_session)):
+	tags = await AsyncTagService(user["id"], session).get_tags()
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"tags": tags})
+
+@tags_router.patch("/")
+async def rename_tag(user: user_dependency, tag_id: int, new_name: str, session=Depends(get_user_session)):
+	tag_service = AsyncTagService(user["id"], session)
+	if not await tag_service.tag_name_is_available(new_name):
+		return FastJSONResponse(status_code=status.HTTP_409_CONFLICT, content={"updated": False})
+	renamed_tag = await tag_service.rename_tag(tag_id, new_name)
+	if not renamed_tag:
+		return FastJSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"updated": False})
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"updated": renamed_tag})
+
+@tags_router.post("/merge")
+async def merge_tags(user: user_dependency, source_id: int, target_id: int, session=Depends(get_user_session)):
+	merged_tag = await AsyncTagService(user["id"], session).merge_tags(source_id, target_id)
+	if not merged_tag:
+		return FastJSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"merged": False})
+	return FastJSONResponse(status_code=status.HTTP_200_OK, content={"merged": merged_tag})
@@ -0,0 +1,20 @@
+from sqlmodel import SQLModel, Field
+from app.schemas.NoteSchema import NoteSchema
+
+MAX_BATCH_SIZE = 1000
+
+class NoteBatchCreateSchema(SQLModel):
+	notes: list[NoteSchema] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+class NoteBatchIdsSchema(SQLModel):
+	note_ids: list[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+class NoteBatchArchiveSchema(NoteBatchIdsSchema):
+	is_archived: bool
+
+class NoteRetagSchema(SQLModel):
+	note_id: int
+	categories: list[str]
+
+class NoteBatchRetagSchema(SQLModel):
+	notes: list[NoteRetagSchema] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
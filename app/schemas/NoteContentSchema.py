@@ -2,4 +2,6 @@ from sqlmodel import SQLModel
 
 class NoteContentSchema(SQLModel):
 	content: str
-	
\ No newline at end of file
+	# When given, the edit is refused with 409 unless the note is still at
+	# this revision.
+	base_revision: int | None = None
@@ -0,0 +1,35 @@
+from sqlmodel import SQLModel
+from typing import Literal
+from datetime import datetime
+
+NoteSort = Literal["id", "-id", "created_at", "-created_at", "updated_at", "-updated_at"]
+
+class NoteFilterSchema(SQLModel):
+	archived: bool | None = None
+	tag: str | None = None
+	created_after: datetime | None = None
+	created_before: datetime | None = None
+	updated_after: datetime | None = None
+	updated_before: datetime | None = None
+	sort: NoteSort = "id"
+
+	@property
+	def sort_field(self) -> str:
+		return self.sort.removeprefix("-")
+
+	@property
+	def descending(self) -> bool:
+		return self.sort.startswith("-")
+
+	# Timestamp sorts page on (timestamp, id), so their cursor carries both:
+	# "2024-05-01T10:00:00.123456,42". The id sort keeps plain id cursors.
+	def next_cursor(self, note: dict) -> int | str:
+		if self.sort_field == "id":
+			return note["id"]
+		return f"{note[self.sort_field]},{note['id']}"
+
+	def parse_cursor(self, cursor: str) -> tuple:
+		if self.sort_field == "id":
+			return (int(cursor),)
+		timestamp, _, note_id = cursor.rpartition(",")
+		return datetime.fromisoformat(timestamp), int(note_id)
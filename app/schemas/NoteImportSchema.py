@@ -0,0 +1,15 @@
+from sqlmodel import SQLModel
+from datetime import datetime
+
+# Lines are validated and inserted in chunks of this size, one transaction
+# per chunk.
+IMPORT_CHUNK_SIZE = 5000
+MAX_IMPORT_LINE_BYTES = 1024 * 1024
+
+class NoteImportSchema(SQLModel):
+	content: str
+	categories: list[str] = []
+	created_at: datetime | None = None
+	# Accepted so exported lines import as they are, but not stored.
+	updated_at: datetime | None = None
+	is_archived: bool = False
@@ -0,0 +1,14 @@
+from sqlmodel import SQLModel, Field
+
+# Ops are applied as one chain of || in SQL, and SQLite caps expression
+# depth at 1000. Larger rewrites can send the full content instead.
+MAX_PATCH_OPS = 200
+
+class TextOpSchema(SQLModel):
+	offset: int = Field(ge=0)
+	delete: int = Field(default=0, ge=0)
+	insert: str = ""
+
+class NotePatchSchema(SQLModel):
+	base_revision: int = Field(ge=0)
+	ops: list[TextOpSchema] = Field(min_length=1, max_length=MAX_PATCH_OPS)
@@ -0,0 +1,35 @@
+from starlette.concurrency import iterate_in_threadpool
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.services.AsyncService import AsyncService
+from app.services.NoteService import NoteService
+from app.schemas.NoteFilterSchema import NoteFilterSchema
+from app.utils.write_behind import write_behind
+
+class AsyncNoteService(AsyncService):
+	service_class = NoteService
+
+	async def stream_notes(self, batch_size: int = 500, filters: NoteFilterSchema | None = None):
+		note_service = NoteService(self.owner, self.db)
+		if not isinstance(self.db, AsyncSession):
+			async for notes in iterate_in_threadpool(note_service.stream_notes(batch_size, filters)):
+				for note in notes:
+					yield note
+			return
+		query = note_service.listing_query(filters or NoteFilterSchema()).execution_options(yield_per=batch_size)
+		async with AsyncSession(self.db.bind) as session:
+			result = await session.stream_scalars(query)
+			async for note in result:
+				yield write_behind.overlay(self.owner, note_service.display_note_with_categories(note))
+
+	async def export_notes(self, batch_size: int = 1000):
+		note_service = NoteService(self.owner, self.db)
+		if not isinstance(self.db, AsyncSession):
+			async for records in iterate_in_threadpool(note_service.export_notes(batch_size)):
+				yield records
+			return
+		query = note_service.export_query().execution_options(yield_per=batch_size)
+		async with AsyncSession(self.db.bind) as session:
+			result = await session.stream(query)
+			async for notes in result.partitions():
+				category_rows = await session.exec(note_service.export_categories_query([note.id for note in notes]))
+				yield note_service.export_records(notes, category_rows)
@@ -0,0 +1,26 @@
+from starlette.concurrency import run_in_threadpool
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+class AsyncService:
+	# Exposes every method of a sync service as a coroutine. With an
+	# AsyncSession the call runs through run_sync on the async driver, with a
+	# Session it runs on the threadpool, so routes are written once for both.
+	service_class = None
+
+	def __init__(self, owner, db: Session | AsyncSession):
+		self.owner = owner
+		self.db = db
+
+	async def run(self, name: str, *args, **kwargs):
+		if isinstance(self.db, AsyncSession):
+			return await self.db.run_sync(
+				lambda session: getattr(self.service_class(self.owner, session), name)(*args, **kwargs))
+		return await run_in_threadpool(getattr(self.service_class(self.owner, self.db), name), *args, **kwargs)
+
+	def __getattr__(self, name: str):
+		if name.startswith("_") or not hasattr(self.service_class, name):
+			raise AttributeError(name)
+		async def call(*args, **kwargs):
+			return await self.run(name, *args, **kwargs)
+		return call
@@ -0,0 +1,5 @@
+from app.services.AsyncService import AsyncService
+from app.services.TagService import TagService
+
+class AsyncTagService(AsyncService):
+	service_class = TagService
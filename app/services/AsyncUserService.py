@@ -0,0 +1,20 @@
+from app.services.AsyncService import AsyncService
+from app.services.UserService import UserService
+from app.models.UserModel import User
+from app.utils.hash_password import password_hasher
+
+class AsyncUserService(AsyncService):
+	service_class = UserService
+
+	async def create_user(self) -> bool:
+		user_service = UserService(self.owner, None)
+		if not user_service.has_valid_credentials() or not await self.username_is_avalaible():
+			return False
+		hashed_password = await password_hasher.hash(self.owner.password)
+		return await self.run("create_user", hashed_password)
+
+	async def authenticate_user(self) -> bool | User:
+		user = await self.get_user_by_username()
+		if user and await password_hasher.verify(self.owner.password, user.password):
+			return user
+		return False
@@ -1,6 +1,17 @@
-from sqlmodel import Session, select, delete
+from sqlmodel import Session, select, delete, insert, update, not_, or_
+from sqlalchemy import func, tuple_, literal_column
 from app.schemas.NoteSchema import NoteSchema
-from app.models.NoteModel import Note, Category
+from app.schemas.NoteBatchSchema import NoteRetagSchema
+from app.schemas.NoteImportSchema import NoteImportSchema
+from app.schemas.NoteFilterSchema import NoteFilterSchema
+from app.schemas.NotePatchSchema import TextOpSchema
+from app.models.NoteModel import Note, Tag, NoteTag, NoteTombstone
+from app.models.NoteSearchModel import note_fts
+from app.utils.search_query import to_match_query, to_tsquery
+from app.utils.note_cache import note_cache, cached_read
+from app.utils.write_behind import write_behind
+from app.utils.text_patch import StaleRevisionError, apply_ops, patched_length, out_of_range, splice
+from app.config.replica import replica_router, reads_from_replica
 from datetime import datetime, timezone
 
 class NoteService:
@@ -8,120 +19,506 @@ class NoteService:
 		self.user_id = user_id
 		self.db = db
 	
-	def convert_categorites(self, categories: list[str]) -> list[Category]:
-		categories_list = []
-		for name in categories:
-			categories_list.append(Category(name=name))
-		return categories_list
+	def display_category(self, link: NoteTag) -> dict:
+		# A category is a note_tag link shown with its tag's name, so its id
+		# identifies one tag on one note.
+		return {"id": link.id, "name": link.tag.name, "note_id": link.note_id}
 	
 	def display_note_with_categories(self, note: Note):
 		return {
 			**note.model_dump(by_alias=True),
-			'categories': [category.model_dump() for category in note.categories]
+			'categories': [self.display_category(link) for link in note.tag_links]
 		} 
 		
+	def commit(self):
+		self.db.commit()
+		replica_router.wrote(self.user_id)
+		note_cache.invalidate(self.user_id)
+	
+	def owned_note_ids(self):
+		return select(Note.id).where(Note.user_id == self.user_id)
 
 	def create_note(self, note: NoteSchema) -> Note:
-		categories = self.convert_categorites(note.categories)
-		new_note = Note(content=note.content,
-				  		user_id=self.user_id,
-						categories=categories)
-		self.db.add(new_note)
-		self.db.commit()
-		self.db.refresh(new_note)
-		return self.display_note_with_categories(new_note)
+		return self.create_notes([note])[0]
 	
-	def get_notes(self) -> list[Note]:
-		query = select(Note).where(Note.user_id == self.user_id)
-		result = self.db.exec(query).all()
-		return [ self.display_note_with_categories(note) for note in result ]
+	def paginate(self, query, limit: int | None, cursor: int | None):
+		query = query.order_by(Note.id)
+		if cursor is not None:
+			query = query.where(Note.id > cursor)
+		if limit is not None:
+			query = query.limit(limit)
+		return query
+	
+	def notes_query(self):
+		return select(Note).where(Note.user_id == self.user_id)
+	
+	def as_utc(self, timestamp: datetime) -> datetime:
+		# Timestamps are stored as naive UTC, so aware values are converted
+		# before they are compared with stored ones.
+		return timestamp.astimezone(timezone.utc) if timestamp.tzinfo else timestamp
+	
+	def filter_notes(self, query, filters: NoteFilterSchema):
+		# Ranges are half-open: *_after is inclusive, *_before exclusive.
+		if filters.archived is not None:
+			query = query.where(Note.is_archived == filters.archived)
+		if filters.tag is not None:
+			tagged = (select(NoteTag.note_id)
+				.join(Tag, Tag.id == NoteTag.tag_id)
+				.where(Tag.user_id == self.user_id, Tag.name == filters.tag))
+			query = query.where(Note.id.in_(tagged))
+		if filters.created_after is not None:
+			query = query.where(Note.created_at >= self.as_utc(filters.created_after))
+		if filters.created_before is not None:
+			query = query.where(Note.created_at < self.as_utc(filters.created_before))
+		if filters.updated_after is not None:
+			query = query.where(Note.updated_at >= self.as_utc(filters.updated_after))
+		if filters.updated_before is not None:
+			query = query.where(Note.updated_at < self.as_utc(filters.updated_before))
+		return query
+	
+	def sort_keys(self, filters: NoteFilterSchema) -> tuple:
+		# id breaks ties between equal timestamps, which keeps pages stable.
+		if filters.sort_field == "id":
+			return (Note.id,)
+		return (getattr(Note, filters.sort_field), Note.id)
+	
+	def listing_query(self, filters: NoteFilterSchema):
+		keys = self.sort_keys(filters)
+		query = self.filter_notes(self.notes_query(), filters)
+		return query.order_by(*[key.desc() if filters.descending else key for key in keys])
+	
+	def sorted_page(self, query, filters: NoteFilterSchema, limit: int | None, cursor: int | str | None):
+		# Keyset pagination: the cursor holds the sort key of the last note of
+		# the previous page, so each page starts with an index seek.
+		if cursor is not None:
+			values = filters.parse_cursor(str(cursor))
+			if filters.sort_field == "id":
+				position, after = Note.id, values[0]
+			else:
+				position = tuple_(*self.sort_keys(filters))
+				after = tuple_(self.as_utc(values[0]), values[1])
+			query = query.where(position < after if filters.descending else position > after)
+		if limit is not None:
+			query = query.limit(limit)
+		return query
+	
+	@cached_read
+	@reads_from_replica
+	def get_notes(self,
+				  limit: int | None = None,
+				  cursor: int | str | None = None,
+				  since: datetime | None = None,
+				  filters: NoteFilterSchema | None = None,
+				  version: tuple = ()) -> list[Note]:
+		# version is only part of the cache key. Passing get_notes_version()
+		# ties the cached page to the ETag sent with it, including when the
+		# write was made in a process whose invalidation did not reach this one.
+		filters = filters or NoteFilterSchema()
+		query = self.listing_query(filters)
+		if since is not None:
+			since = self.as_utc(since)
+			# Renaming or merging a tag changes its notes without touching them.
+			retagged = (select(NoteTag.note_id)
+				.join(Tag, Tag.id == NoteTag.tag_id)
+				.where(Tag.user_id == self.user_id, Tag.updated_at > since))
+			query = query.where(or_(Note.updated_at > since, Note.id.in_(retagged)))
+		result = self.db.exec(self.sorted_page(query, filters, limit, cursor)).all()
+		return write_behind.overlay_all(self.user_id, [ self.display_note_with_categories(note) for note in result ])
+	
+	@reads_from_replica
+	def get_deleted_note_ids(self, since: datetime) -> list[int]:
+		query = (select(NoteTombstone.note_id)
+			.where(NoteTombstone.user_id == self.user_id, NoteTombstone.deleted_at > self.as_utc(since))
+			.order_by(NoteTombstone.id))
+		return list(self.db.exec(query).all())
+	
+	@reads_from_replica
+	def get_notes_version(self) -> tuple:
+		# Any write changes the note count, the newest updated_at, the newest
+		# tombstone or the newest tag change, so together they identify the
+		# state of the listing.
+		last_deleted_at = (select(func.max(NoteTombstone.deleted_at))
+			.where(NoteTombstone.user_id == self.user_id)
+			.scalar_subquery())
+		last_tag_change = (select(func.max(Tag.updated_at))
+			.where(Tag.user_id == self.user_id)
+			.scalar_subquery())
+		query = (select(func.count(Note.id), func.max(Note.updated_at), last_deleted_at, last_tag_change)
+			.where(Note.user_id == self.user_id))
+		return (*self.db.exec(query).one(), write_behind.version(self.user_id))
+	
+	def stream_notes(self, batch_size: int = 500, filters: NoteFilterSchema | None = None):
+		# The request session is closed before a streamed body is sent, so the
+		# stream reads through its own session on the same engine. Yields one
+		# list per batch, so a threadpool consumer pays one hop per batch.
+		query = self.listing_query(filters or NoteFilterSchema()).execution_options(yield_per=batch_size)
+		with Session(self.db.get_bind()) as session:
+			for notes in session.exec(query).partitions():
+				yield write_behind.overlay_all(self.user_id, [self.display_note_with_categories(note) for note in notes])
 		
+	def export_query(self):
+		return (select(Note.id, Note.content, Note.created_at, Note.updated_at, Note.is_archived)
+			.where(Note.user_id == self.user_id)
+			.order_by(Note.id))
+	
+	def export_categories_query(self, note_ids: list[int]):
+		return (select(NoteTag.note_id, Tag.name)
+			.join(Tag, Tag.id == NoteTag.tag_id)
+			.where(NoteTag.note_id.in_(note_ids))
+			.order_by(NoteTag.id))
+	
+	def export_records(self, notes, category_rows) -> list[dict]:
+		# Ids are left out so the records can be imported into another account
+		# or instance.
+		categories = {}
+		for note_id, name in category_rows:
+			categories.setdefault(note_id, []).append(name)
+		return [{"content": self.pending_content(note.id, note.content), "created_at": note.created_at, "updated_at": note.updated_at,
+				 "is_archived": note.is_archived, "categories": categories.get(note.id, [])}
+				for note in notes]
+	
+	def export_notes(self, batch_size: int = 1000):
+		# Yields one list of records per batch of rows read from a server-side
+		# cursor, so memory depends on the batch size and not on the account.
+		with Session(self.db.get_bind()) as session:
+			result = session.exec(self.export_query().execution_options(yield_per=batch_size))
+			for notes in result.partitions():
+				category_rows = session.exec(self.export_categories_query([note.id for note in notes]))
+				yield self.export_records(notes, category_rows)
+	
+	def import_notes(self, notes: list[NoteImportSchema]) -> int:
+		now = datetime.now(timezone.utc)
+		# updated_at is the import time, whatever the file says, or clients
+		# syncing with ?since= would never see the imported notes.
+		rows = [{"content": note.content,
+				 "created_at": self.as_utc(note.created_at or now),
+				 "updated_at": now,
+				 "is_archived": note.is_archived,
+				 "user_id": self.user_id} for note in notes]
+		# Core inserts on the session's connection skip the ORM's per-row bulk
+		# insert bookkeeping, which is most of the cost at import sizes.
+		query = insert(Note.__table__).returning(Note.__table__.c.id)
+		note_ids = sorted(self.db.connection().execute(query, rows).scalars())
+		self.insert_categories([(note_id, name)
+								for note_id, note in zip(note_ids, notes)
+								for name in note.categories])
+		self.commit()
+		return len(note_ids)
+	
 	def get_note_by_id(self, note_id) -> Note | bool:
-		query = select(Note).where(Note.id == note_id)
+		query = select(Note).where(Note.id == note_id, Note.user_id == self.user_id)
 		result = self.db.exec(query).first()
 		return result if result else False
 		
 	def delete_note(self, note_id: int) -> bool:
-		note_to_delete = self.get_note_by_id(note_id)
-		if not note_to_delete:
+		return self.delete_notes([note_id])[0]["deleted"]
+	
+	def update_note(self, note_id: int, *conditions, **values) -> Note | bool:
+		query = (update(Note)
+			.where(Note.id == note_id, Note.user_id == self.user_id, *conditions)
+			.values(**values)
+			.returning(*Note.__table__.c)
+			.execution_options(synchronize_session=False))
+		row = self.db.exec(query).first()
+		self.commit()
+		return Note(**row._mapping) if row else False
+	
+	def note_row(self, note_id: int):
+		query = select(*Note.__table__.c).where(Note.id == note_id, Note.user_id == self.user_id)
+		return self.db.connection().execute(query).first()
+	
+	def update_content(self, note_id: int, new_content: str, base_revision: int | None = None) -> Note | bool:
+		if write_behind.running:
+			return self.buffer_content(note_id, base_revision, lambda content: new_content)
+		if base_revision is None:
+			return self.update_note(note_id, content=new_content, revision=Note.revision + 1,
+									updated_at=datetime.now(timezone.utc))
+		return self.update_revision(note_id, base_revision, new_content)
+	
+	def patch_content(self, note_id: int, base_revision: int, ops: list[TextOpSchema]) -> dict | bool:
+		# Returns the note without its content, which the client already has.
+		if write_behind.running:
+			note = self.buffer_content(note_id, base_revision, lambda content: apply_ops(content, ops))
+			return note.model_dump(exclude={"content"}) if note else False
+		# The text is patched by the UPDATE itself, which also checks the base
+		# revision and that every op falls inside the current text.
+		query = (update(Note)
+			.where(Note.id == note_id, Note.user_id == self.user_id, Note.revision == base_revision,
+				   func.length(Note.content) >= patched_length(ops))
+			.values(content=splice(Note.content, ops), revision=base_revision + 1, updated_at=datetime.now(timezone.utc))
+			.returning(*[column for column in Note.__table__.c if column.name != "content"])
+			.execution_options(synchronize_session=False))
+		row = self.db.exec(query).first()
+		self.commit()
+		if row:
+			return dict(row._mapping)
+		query = select(Note.revision, func.length(Note.content)).where(Note.id == note_id, Note.user_id == self.user_id)
+		current = self.db.exec(query).first()
+		if current is None:
 			return False
-		self.delete_category_by_note_id(note_id)
-		self.db.delete(note_to_delete)
-		self.db.commit()
-		return True
+		revision, length = current
+		if revision != base_revision:
+			raise StaleRevisionError(revision)
+		raise out_of_range(length)
 	
-	def update_content(self, note_id: int, new_content: str) -> Note | bool:
-		note_to_update = self.get_note_by_id(note_id)
-		if not note_to_update:
+	def update_revision(self, note_id: int, base_revision: int, new_content: str) -> Note | bool:
+		# The UPDATE checks the base again, so an edit committed after the note
+		# was read is never overwritten.
+		note = self.update_note(note_id, Note.revision == base_revision, content=new_content,
+								revision=base_revision + 1, updated_at=datetime.now(timezone.utc))
+		if note:
+			return note
+		row = self.note_row(note_id)
+		if not row:
 			return False
-		note_to_update.content = new_content 
-		note_to_update.updated_at = datetime.now(timezone.utc)
-		self.db.add(note_to_update)
-		self.db.commit()
-		self.db.refresh(note_to_update)
-		return note_to_update
+		raise StaleRevisionError(row.revision)
+	
+	def buffer_content(self, note_id: int, base_revision: int | None, change) -> Note | bool:
+		# The note is still read to check it exists and belongs to the user,
+		# as a plain row: the ORM load of its tag links would cost more than
+		# the commit this path saves. The commit is left to the flush.
+		shard = self.db.info.get("shard", 0)
+		while True:
+			flushes = write_behind.flushes
+			row = self.note_row(note_id)
+			if not row:
+				return False
+			with write_behind.lock:
+				# A flush that committed after the read may have stored a newer
+				# revision than the row shows.
+				if write_behind.flushes != flushes:
+					continue
+				pending = write_behind.get(self.user_id, note_id)
+				content, revision = (pending.content, pending.revision) if pending else (row.content, row.revision)
+				if base_revision is not None and revision != base_revision:
+					raise StaleRevisionError(revision)
+				edit = write_behind.add(self.user_id, note_id, shard, change(content), revision + 1)
+			note_cache.invalidate(self.user_id)
+			return Note(**{**row._mapping, "content": edit.content, "revision": edit.revision, "updated_at": edit.updated_at})
+	
+	def pending_content(self, note_id: int, content: str) -> str:
+		edit = write_behind.get(self.user_id, note_id)
+		return edit.content if edit else content
 		
 	def update_archived_status(self, note_id: int) -> Note | bool:
-		note_to_update = self.get_note_by_id(note_id)
-		if not note_to_update:
-			return False
-		note_to_update.is_archived = not note_to_update.is_archived
-		self.db.add(note_to_update)
-		self.db.commit()
-		self.db.refresh(note_to_update)
-		return note_to_update
+		return self.update_note(note_id, is_archived=not_(Note.is_archived), updated_at=datetime.now(timezone.utc))
+	
+	def delete_unused_tags(self, tag_ids) -> None:
+		# A tag lives as long as a note uses it, as categories did before tags
+		# were shared, so unlinking its last note removes it from /tags.
+		tag_ids = list(set(tag_ids))
+		if not tag_ids:
+			return
+		in_use = select(NoteTag.id).where(NoteTag.tag_id == Tag.id).exists()
+		self.db.exec(delete(Tag)
+			.where(Tag.user_id == self.user_id, Tag.id.in_(tag_ids), not_(in_use))
+			.execution_options(synchronize_session=False))
+	
+	def touch_note(self, note_id: int) -> bool:
+		query = (update(Note)
+			.where(Note.id == note_id, Note.user_id == self.user_id)
+			.values(updated_at=datetime.now(timezone.utc))
+			.returning(Note.id)
+			.execution_options(synchronize_session=False))
+		return self.db.exec(query).first() is not None
 	
-	def get_note_categories_by_note_id(self, note_id: int) -> list[Category] | bool:
+	@cached_read
+	@reads_from_replica
+	def get_note_categories_by_note_id(self, note_id: int) -> list[dict] | bool:
 		note_to_get_categories = self.get_note_by_id(note_id)
 		if not note_to_get_categories:
 			return False
-		return note_to_get_categories.categories
+		return [self.display_category(link) for link in note_to_get_categories.tag_links]
 	
-	def get_category_by_id(self, category_id: int) -> Category | bool:
-		query = select(Category).where(Category.id == category_id)
-		result = self.db.exec(query).first()
-		return result if result else False
+	def get_tag_ids(self, names) -> dict[str, int]:
+		names = list(dict.fromkeys(names))
+		if not names:
+			return {}
+		query = select(Tag.name, Tag.id).where(Tag.user_id == self.user_id, Tag.name.in_(names))
+		tag_ids = dict(self.db.exec(query).all())
+		now = datetime.now(timezone.utc)
+		missing = [{"user_id": self.user_id, "name": name, "updated_at": now} for name in names if name not in tag_ids]
+		if missing:
+			tag_ids.update(self.db.exec(insert(Tag).returning(Tag.name, Tag.id), params=missing).all())
+		return tag_ids
 	
-	def add_category(self, note_id : int, name: str) -> Category | bool:
-		note_exists = self.get_note_by_id(note_id)
-		if not note_exists:
+	def add_category(self, note_id : int, name: str) -> dict | bool:
+		# Bumping updated_at doubles as the ownership check.
+		if not self.touch_note(note_id):
 			return False
-		new_category = Category(note_id=note_id, name=name)
-		self.db.add(new_category)
-		self.db.commit()
-		self.db.refresh(new_category)
-		return new_category
+		query = (select(Tag.id, NoteTag.id)
+			.outerjoin(NoteTag, (NoteTag.tag_id == Tag.id) & (NoteTag.note_id == note_id))
+			.where(Tag.user_id == self.user_id, Tag.name == name))
+		tag_id, link_id = self.db.exec(query).first() or (None, None)
+		if tag_id is None:
+			query = insert(Tag).values(user_id=self.user_id, name=name, updated_at=datetime.now(timezone.utc)).returning(Tag.id)
+			tag_id = self.db.exec(query).scalar()
+		if link_id is None:
+			link_id = self.db.exec(insert(NoteTag).values(note_id=note_id, tag_id=tag_id).returning(NoteTag.id)).scalar()
+		self.commit()
+		return {"id": link_id, "name": name, "note_id": note_id}
 	
 	def delete_category_by_category_id(self, category_id: int) -> bool:
-		category_to_delete = self.get_category_by_id(category_id)
-		if not category_to_delete:
+		query = (delete(NoteTag)
+			.where(NoteTag.id == category_id, NoteTag.note_id.in_(self.owned_note_ids()))
+			.returning(NoteTag.note_id, NoteTag.tag_id)
+			.execution_options(synchronize_session=False))
+		deleted = self.db.exec(query).first()
+		if deleted is None:
 			return False
-		self.db.delete(category_to_delete)
-		self.db.commit()
+		self.delete_unused_tags([deleted.tag_id])
+		self.touch_note(deleted.note_id)
+		self.commit()
 		return True
 	
-	def delete_category_by_note_id(self, note_id: int): 
-		query = delete(Category).where(Category.note_id == note_id)
-		result = self.db.exec(query)
-		self.db.commit()
-	
-	def update_category_by_category_id(self, category_id: int, new_name: str) -> Category | bool:
-		category_to_update = self.get_category_by_id(category_id)
-		if not category_to_update:
+	def update_category_by_category_id(self, category_id: int, new_name: str) -> dict | bool:
+		link = self.db.exec(select(NoteTag.note_id, NoteTag.tag_id)
+			.where(NoteTag.id == category_id, NoteTag.note_id.in_(self.owned_note_ids()))).first()
+		if link is None:
 			return False
-		category_to_update.name = new_name
-		self.db.add(category_to_update)
-		self.db.commit()
-		self.db.refresh(category_to_update)
-		return category_to_update
+		tag_id = self.get_tag_ids([new_name])[new_name]
+		# If the note already has the new tag, that link is dropped so this one
+		# can take its place and keep its id.
+		self.db.exec(delete(NoteTag)
+			.where(NoteTag.note_id == link.note_id, NoteTag.tag_id == tag_id, NoteTag.id != category_id)
+			.execution_options(synchronize_session=False))
+		query = (update(NoteTag)
+			.where(NoteTag.id == category_id, NoteTag.note_id.in_(self.owned_note_ids()))
+			.values(tag_id=tag_id)
+			.returning(NoteTag.note_id)
+			.execution_options(synchronize_session=False))
+		row = self.db.exec(query).first()
+		if row is None:
+			self.db.rollback()
+			return False
+		self.delete_unused_tags([link.tag_id])
+		self.touch_note(row.note_id)
+		self.commit()
+		return {"id": category_id, "name": new_name, "note_id": row.note_id}
 	
-	def get_categories_by_name(self, name: str) -> list[Category]:
-		user_notes = self.get_notes()
-		user_notes_ids = [note["id"] for note in user_notes]
-		query = select(Category.note_id).where(Category.name == name and Category.note_id in user_notes_ids)
-		result = self.db.exec(query).unique().all()
-		return [note for note in user_notes if note["id"] in result]
+	@cached_read
+	@reads_from_replica
+	def get_categories_by_name(self, name: str, limit: int | None = None, cursor: int | None = None) -> list[Note]:
+		# Tags belong to one user and only link that user's notes, so filtering
+		# on the tag keeps the plan on ix_note_tag_tag_id_note_id instead of
+		# walking every note of the user.
+		query = (select(Note)
+			.join(NoteTag, NoteTag.note_id == Note.id)
+			.join(Tag, Tag.id == NoteTag.tag_id)
+			.where(Tag.user_id == self.user_id, Tag.name == name))
+		result = self.db.exec(self.paginate(query, limit, cursor)).all()
+		return write_behind.overlay_all(self.user_id, [ self.display_note_with_categories(note) for note in result ])
 	
-
-		
-	
\ No newline at end of file
+	def search_notes(self, text: str, limit: int = 20, offset: int = 0) -> list[dict]:
+		if self.db.get_bind().dialect.name == "postgresql":
+			return self.search_notes_postgresql(text, limit, offset)
+		terms = to_match_query(text)
+		if terms is None:
+			return []
+		snippet = func.snippet(note_fts.c.note_fts, 0, "[", "]", "…", 16)
+		query = (select(Note, snippet)
+			.join(note_fts, note_fts.c.rowid == Note.id)
+			.where(note_fts.c.note_fts.op("MATCH")(f'user_id:"{self.user_id}" AND content:({terms})'),
+				   Note.user_id == self.user_id)
+			.order_by(note_fts.c.rank)
+			.limit(limit)
+			.offset(offset))
+		result = self.db.exec(query).all()
+		return [ {**self.display_note_with_categories(note), "snippet": snippet} for note, snippet in result ]
+	
+	def search_notes_postgresql(self, text: str, limit: int, offset: int) -> list[dict]:
+		# Same contract as the FTS5 search, on the GIN index that migration 5
+		# builds over to_tsvector('simple', content). The configuration is
+		# inlined rather than bound so the expression matches the index.
+		terms = to_tsquery(text)
+		if terms is None:
+			return []
+		document = func.to_tsvector(literal_column("'simple'"), Note.content)
+		tsquery = func.to_tsquery(literal_column("'simple'"), terms)
+		snippet = func.ts_headline(literal_column("'simple'"), Note.content, tsquery,
+								   "StartSel=[, StopSel=], MaxWords=16, MinWords=8")
+		query = (select(Note, snippet)
+			.where(document.op("@@")(tsquery), Note.user_id == self.user_id)
+			.order_by(func.ts_rank(document, tsquery).desc(), Note.id)
+			.limit(limit)
+			.offset(offset))
+		result = self.db.exec(query).all()
+		return [ {**self.display_note_with_categories(note), "snippet": snippet} for note, snippet in result ]
+	
+	def insert_categories(self, pairs: list[tuple[int, str]]) -> dict[int, list[dict]]:
+		categories = {}
+		pairs = list(dict.fromkeys(pairs))
+		if not pairs:
+			return categories
+		tag_ids = self.get_tag_ids(name for _, name in pairs)
+		rows = [{"note_id": note_id, "tag_id": tag_ids[name]} for note_id, name in pairs]
+		query = insert(NoteTag.__table__).returning(NoteTag.__table__.c.id, NoteTag.__table__.c.note_id)
+		for link, (_, name) in zip(sorted(self.db.connection().execute(query, rows)), pairs):
+			categories.setdefault(link.note_id, []).append({"id": link.id, "name": name, "note_id": link.note_id})
+		return categories
+	
+	def create_notes(self, notes: list[NoteSchema]) -> list[dict]:
+		now = datetime.now(timezone.utc)
+		rows = [{"content": note.content, "created_at": now, "updated_at": now, "is_archived": False, "user_id": self.user_id}
+				for note in notes]
+		# sort_by_parameter_order would make SQLite insert row by row. A single
+		# multi-row INSERT assigns ascending ids in parameter order, so sorting
+		# the returned rows by id lines them up with the parameters instead.
+		query = insert(Note).returning(*Note.__table__.c)
+		new_notes = [Note(**row._mapping) for row in sorted(self.db.exec(query, params=rows))]
+		categories = self.insert_categories([(new_note.id, name)
+											 for new_note, note in zip(new_notes, notes)
+											 for name in note.categories])
+		self.commit()
+		return [{**new_note.model_dump(), "categories": categories.get(new_note.id, [])}
+				for new_note in new_notes]
+	
+	def archive_notes(self, note_ids: list[int], is_archived: bool) -> list[dict]:
+		query = (update(Note)
+			.where(Note.user_id == self.user_id, Note.id.in_(note_ids))
+			.values(is_archived=is_archived, updated_at=datetime.now(timezone.utc))
+			.returning(Note.id)
+			.execution_options(synchronize_session=False))
+		updated = set(self.db.exec(query).scalars())
+		self.commit()
+		return [{"id": note_id, "updated": note_id in updated} for note_id in note_ids]
+	
+	def delete_notes(self, note_ids: list[int]) -> list[dict]:
+		owned_notes = self.owned_note_ids().where(Note.id.in_(note_ids))
+		unlinked_tags = self.db.exec(delete(NoteTag)
+			.where(NoteTag.note_id.in_(owned_notes))
+			.returning(NoteTag.tag_id)
+			.execution_options(synchronize_session=False)).scalars().all()
+		self.delete_unused_tags(unlinked_tags)
+		query = (delete(Note)
+			.where(Note.user_id == self.user_id, Note.id.in_(note_ids))
+			.returning(Note.id)
+			.execution_options(synchronize_session=False))
+		deleted = set(self.db.exec(query).scalars())
+		if deleted:
+			now = datetime.now(timezone.utc)
+			self.db.exec(insert(NoteTombstone), params=[{"note_id": note_id, "user_id": self.user_id, "deleted_at": now}
+														for note_id in deleted])
+		self.commit()
+		write_behind.discard(self.user_id, list(deleted))
+		return [{"id": note_id, "deleted": note_id in deleted} for note_id in note_ids]
+	
+	def retag_notes(self, notes: list[NoteRetagSchema]) -> list[dict]:
+		new_categories = {note.note_id: note.categories for note in notes}
+		query = (update(Note)
+			.where(Note.user_id == self.user_id, Note.id.in_(new_categories))
+			.values(updated_at=datetime.now(timezone.utc))
+			.returning(Note.id)
+			.execution_options(synchronize_session=False))
+		owned = set(self.db.exec(query).scalars())
+		unlinked_tags = self.db.exec(delete(NoteTag)
+			.where(NoteTag.note_id.in_(owned))
+			.returning(NoteTag.tag_id)
+			.execution_options(synchronize_session=False)).scalars().all()
+		categories = self.insert_categories([(note_id, name)
+											 for note_id, names in new_categories.items() if note_id in owned
+											 for name in names])
+		self.delete_unused_tags(unlinked_tags)
+		self.commit()
+		return [{"id": note.note_id, "updated": note.note_id in owned, "categories": categories.get(note.note_id, [])}
+				for note in notes]
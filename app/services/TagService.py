@@ -0,0 +1,78 @@
+from sqlmodel import Session, select, delete, insert, update
+from sqlalchemy import func, literal
+from sqlalchemy.exc import IntegrityError
+from app.models.NoteModel import Tag, NoteTag
+from app.utils.note_cache import note_cache, cached_read
+from app.config.replica import replica_router
+from datetime import datetime, timezone
+
+class TagService:
+	def __init__(self, user_id: int, db: Session):
+		self.user_id = user_id
+		self.db = db
+	
+	def commit(self):
+		self.db.commit()
+		replica_router.wrote(self.user_id)
+		note_cache.invalidate(self.user_id)
+	
+	def owned_tag_ids(self):
+		return select(Tag.id).where(Tag.user_id == self.user_id)
+	
+	@cached_read
+	def get_tags(self) -> list[dict]:
+		query = (select(Tag.id, Tag.name, func.count(NoteTag.id).label("note_count"))
+			.outerjoin(NoteTag, NoteTag.tag_id == Tag.id)
+			.where(Tag.user_id == self.user_id)
+			.group_by(Tag.id, Tag.name)
+			.order_by(Tag.name))
+		return [row._asdict() for row in self.db.exec(query)]
+	
+	def tag_name_is_available(self, name: str) -> bool:
+		query = select(Tag.id).where(Tag.user_id == self.user_id, Tag.name == name)
+		return self.db.exec(query).first() is None
+	
+	def rename_tag(self, tag_id: int, new_name: str) -> dict | bool:
+		# Notes refer to the tag by id, so a rename is one row however many
+		# notes carry it.
+		query = (update(Tag)
+			.where(Tag.id == tag_id, Tag.user_id == self.user_id)
+			.values(name=new_name, updated_at=datetime.now(timezone.utc))
+			.returning(Tag.id, Tag.name)
+			.execution_options(synchronize_session=False))
+		try:
+			row = self.db.exec(query).first()
+			self.commit()
+		except IntegrityError:
+			self.db.rollback()
+			return False
+		return row._asdict() if row else False
+	
+	def merge_tags(self, source_id: int, target_id: int) -> dict | bool:
+		if source_id == target_id:
+			return False
+		query = (update(Tag)
+			.where(Tag.id == target_id, Tag.user_id == self.user_id)
+			.values(updated_at=datetime.now(timezone.utc))
+			.returning(Tag.id, Tag.name)
+			.execution_options(synchronize_session=False))
+		target = self.db.exec(query).first()
+		if target is None:
+			return False
+		source_links = NoteTag.tag_id.in_(self.owned_tag_ids().where(Tag.id == source_id))
+		# Notes are moved with set-based statements, so a merge is four
+		# statements however many notes carry the source tag.
+		tagged_with_target = select(NoteTag.note_id).where(NoteTag.tag_id == target_id)
+		moved = (select(NoteTag.note_id, literal(target_id))
+			.where(source_links, NoteTag.note_id.not_in(tagged_with_target)))
+		self.db.exec(insert(NoteTag).from_select(["note_id", "tag_id"], moved))
+		self.db.exec(delete(NoteTag).where(source_links).execution_options(synchronize_session=False))
+		query = (delete(Tag)
+			.where(Tag.id == source_id, Tag.user_id == self.user_id)
+			.returning(Tag.id)
+			.execution_options(synchronize_session=False))
+		if self.db.exec(query).first() is None:
+			self.db.rollback()
+			return False
+		self.commit()
+		return target._asdict()
@@ -1,21 +1,32 @@
 from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
 from app.utils.hash_password import hash_password, verify_password
 from app.schemas.UserSchema import UserSchema
 from app.models.UserModel import User
+from app.models.UserShardModel import UserShard
+from app.config.database import shard_map
 
 class UserService:
 	def __init__(self, user: UserSchema, db: Session):
 		self.user = user
 		self.db = db
 		
-	def create_user(self) -> int:
-		valid_username_and_password = len(self.user.username) > 0 and len(self.user.password) > 0
-		if not self.username_is_avalaible() or not valid_username_and_password:
+	def has_valid_credentials(self) -> bool:
+		return len(self.user.username) > 0 and len(self.user.password) > 0
+		
+	def create_user(self, hashed_password: str | None = None) -> int:
+		if not self.username_is_avalaible() or not self.has_valid_credentials():
 			return False
 		new_user = User(username=self.user.username,
-						password=hash_password(self.user.password))
+						password=hashed_password or hash_password(self.user.password))
 		self.db.add(new_user)
-		self.db.commit()
+		try:
+			self.db.flush()
+			self.db.add(UserShard(user_id=new_user.id, shard=shard_map.place(new_user.id)))
+			self.db.commit()
+		except IntegrityError:
+			self.db.rollback()
+			return False
 		return True
 		
 	def username_is_avalaible(self) -> bool:
@@ -23,9 +34,12 @@ class UserService:
 		result = self.db.exec(query).first()
 		return False if result else True
 		
-	def authenticate_user(self) -> bool | User:
+	def get_user_by_username(self) -> User | None:
 		query = select(User).where(User.username == self.user.username)
-		user = self.db.exec(query).first()
+		return self.db.exec(query).first()
+		
+	def authenticate_user(self) -> bool | User:
+		user = self.get_user_by_username()
 		if user and verify_password(self.user.password, user.password):
 			return user
 		return False
\ No newline at end of file
@@ -0,0 +1,128 @@
+from app.config import settings
+import zlib
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+def accepted_encodings(scope) -> dict[str, float]:
+	for name, value in scope["headers"]:
+		if name == b"accept-encoding":
+			encodings = {}
+			for item in value.decode("latin-1").split(","):
+				coding, _, params = item.strip().partition(";")
+				quality = 1.0
+				key, _, number = params.strip().partition("=")
+				if key.strip() == "q":
+					try:
+						quality = float(number)
+					except ValueError:
+						quality = 0.0
+				encodings[coding.strip().lower()] = quality
+			return encodings
+	return {}
+
+def choose_encoding(scope) -> str | None:
+	encodings = accepted_encodings(scope)
+	if brotli is not None and encodings.get("br", 0) > 0:
+		return "br"
+	if encodings.get("gzip", 0) > 0:
+		return "gzip"
+	return None
+
+class Encoder:
+	def __init__(self, encoding: str):
+		self.encoding = encoding
+		if encoding == "br":
+			self.compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+		else:
+			# wbits=31 writes the gzip header and trailer.
+			self.compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+	def compress(self, data: bytes) -> bytes:
+		# Flushes so each chunk of a streamed body reaches the client as it
+		# is produced instead of waiting for the compressor's window to fill.
+		if self.encoding == "br":
+			return self.compressor.process(data) + self.compressor.flush()
+		return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+	def finish(self, data: bytes = b"") -> bytes:
+		if self.encoding == "br":
+			return self.compressor.process(data) + self.compressor.finish()
+		return self.compressor.compress(data) + self.compressor.flush()
+
+class CompressionMiddleware:
+	# Negotiates brotli (when the brotli package is installed) or gzip for JSON
+	# and NDJSON bodies of at least COMPRESSION_MIN_SIZE bytes. Streamed bodies
+	# are compressed chunk by chunk.
+	def __init__(self, app, minimum_size: int | None = None):
+		self.app = app
+		self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+	async def __call__(self, scope, receive, send):
+		encoding = choose_encoding(scope) if scope["type"] == "http" else None
+		if encoding is None:
+			await self.app(scope, receive, send)
+			return
+		start = None
+		encoder = None
+		passthrough = False
+
+		async def compressing_send(message):
+			nonlocal start, encoder, passthrough
+			if message["type"] == "http.response.start":
+				start = message
+				headers = dict(message.get("headers", []))
+				content_type = headers.get(b"content-type", b"").decode("latin-1")
+				passthrough = (b"content-encoding" in headers
+							   or not content_type.startswith(COMPRESSIBLE_TYPES))
+				return
+			if message["type"] != "http.response.body":
+				await send(message)
+				return
+			body = message.get("body", b"")
+			more_body = message.get("more_body", False)
+			if passthrough:
+				if start is not None:
+					await send(start)
+					start = None
+				await send(message)
+				return
+			if start is not None:
+				if not more_body and len(body) < self.minimum_size:
+					start["headers"] = vary(start.get("headers", []))
+					await send(start)
+					start = None
+					await send(message)
+					return
+				encoder = Encoder(encoding)
+				start["headers"] = compressed_headers(start.get("headers", []), encoding)
+				if not more_body:
+					body = encoder.finish(body)
+					start["headers"].append((b"content-length", str(len(body)).encode()))
+					await send(start)
+					start = None
+					await send({"type": "http.response.body", "body": body})
+					return
+				await send(start)
+				start = None
+			data = encoder.compress(body) if more_body else encoder.finish(body)
+			await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+		await self.app(scope, receive, compressing_send)
+
+def vary(headers) -> list:
+	existing = [value for name, value in headers if name == b"vary"]
+	headers = [(name, value) for name, value in headers if name != b"vary"]
+	headers.append((b"vary", b", ".join(existing + [b"Accept-Encoding"])))
+	return headers
+
+def compressed_headers(headers, encoding: str) -> list:
+	# The ETag is kept as is: 304s carry no body, so they would otherwise
+	# answer with a different validator than the 200 they stand in for.
+	result = [(name, value) for name, value in vary(headers) if name != b"content-length"]
+	result.append((b"content-encoding", encoding.encode()))
+	return result
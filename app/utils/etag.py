@@ -0,0 +1,11 @@
+from hashlib import sha256
+
+def make_etag(*parts) -> str:
+	digest = sha256("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+	return f'"{digest[:32]}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+	if not if_none_match:
+		return False
+	candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+	return "*" in candidates or etag in candidates
@@ -0,0 +1,37 @@
+NOTE_FIELDS = ("id", "content", "created_at", "updated_at", "is_archived", "revision", "user_id", "categories")
+SUMMARY_LENGTH = 200
+
+class NoteFieldset:
+	# Trims serialized notes for list views: ?fields= keeps only the named
+	# keys (id is always kept, clients page and sync by it) and summary mode
+	# cuts content to SUMMARY_LENGTH characters and drops the note_id each
+	# category repeats. Notes come from note_cache, so they are copied.
+	def __init__(self, fields: str | None = None, summary: bool = False):
+		self.fields = None
+		if fields is not None:
+			names = {name.strip() for name in fields.split(",") if name.strip()}
+			unknown = names.difference(NOTE_FIELDS)
+			if unknown:
+				raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+			self.fields = [name for name in NOTE_FIELDS if name in names or name == "id"]
+		self.summary = summary
+
+	@property
+	def trims(self) -> bool:
+		return self.fields is not None or self.summary
+
+	def apply(self, note: dict) -> dict:
+		if self.fields is not None:
+			note = {name: note[name] for name in self.fields}
+		if not self.summary:
+			return note
+		note = dict(note)
+		if "content" in note:
+			note["truncated"] = len(note["content"]) > SUMMARY_LENGTH
+			note["content"] = note["content"][:SUMMARY_LENGTH]
+		if "categories" in note:
+			note["categories"] = [{"id": category["id"], "name": category["name"]} for category in note["categories"]]
+		return note
+
+	def apply_all(self, notes: list[dict]) -> list[dict]:
+		return [self.apply(note) for note in notes] if self.trims else notes
@@ -1,9 +1,49 @@
+import asyncio
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from fastapi import HTTPException, status
+from app.config import settings
+from app.utils.metrics import metrics
 
-def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
+def hash_password(password: str, rounds: int = settings.BCRYPT_ROUNDS) -> str:
+    salt = bcrypt.gensalt(rounds)
+    with metrics.timed("bcrypt_hash"):
+        hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed_password.decode('utf-8')  
     
 def verify_password(password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
\ No newline at end of file
+    with metrics.timed("bcrypt_verify"):
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+class PasswordHasher:
+    # bcrypt releases the GIL, so a thread pool gives real parallelism. The
+    # semaphore bounds running plus queued calls; past it callers get a 503
+    # right away instead of waiting behind the burst.
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+        self.slots = BoundedSemaphore(max_pending)
+        self.rounds = rounds
+
+    async def run(self, function, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Too many password operations, try again later.",
+                                headers={"Retry-After": "1"})
+        try:
+            future = self.executor.submit(function, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, password, hashed_password)
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS,
+                                 settings.PASSWORD_HASH_MAX_PENDING,
+                                 settings.BCRYPT_ROUNDS)
\ No newline at end of file
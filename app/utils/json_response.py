@@ -0,0 +1,9 @@
+from typing import Any
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+class FastJSONResponse(JSONResponse):
+	# pydantic-core serializes models, datetimes and nested lists straight to
+	# bytes in one pass, so content does not go through jsonable_encoder first.
+	def render(self, content: Any) -> bytes:
+		return to_json(content)
@@ -0,0 +1,147 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from sqlalchemy import Engine, event
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+	def __init__(self, buckets: tuple):
+		self.buckets = buckets
+		self.counts = [0] * len(buckets)
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value: float):
+		# The first bucket whose upper bound is >= value; values above the last
+		# bound only count towards +Inf.
+		i = bisect_left(self.buckets, value)
+		if i < len(self.buckets):
+			self.counts[i] += 1
+		self.sum += value
+		self.count += 1
+
+	def samples(self):
+		# Prometheus buckets are cumulative and end with +Inf.
+		cumulative = 0
+		for bound, count in zip(self.buckets, self.counts):
+			cumulative += count
+			yield f"{bound:g}", cumulative
+		yield "+Inf", self.count
+
+class QueryStats:
+	def __init__(self):
+		self.count = 0
+		self.seconds = 0.0
+
+# Set for the duration of a request. Services run on the threadpool or inside
+# run_sync, which both copy the context, so statements land on the request
+# that issued them.
+current_queries: ContextVar[QueryStats | None] = ContextVar("current_queries", default=None)
+
+def format_labels(labels: dict) -> str:
+	return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+class Metrics:
+	def __init__(self):
+		self.families: dict[str, tuple[str, tuple, dict[tuple, Histogram]]] = {}
+		self.lock = Lock()
+
+	def histogram(self, name: str, help: str, buckets: tuple):
+		self.families.setdefault(name, (help, buckets, {}))
+
+	def observe(self, name: str, value: float, **labels):
+		_, buckets, series = self.families[name]
+		key = tuple(labels.items())
+		with self.lock:
+			if key not in series:
+				series[key] = Histogram(buckets)
+			series[key].observe(value)
+
+	@contextmanager
+	def timed(self, operation: str):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe("notapp_operation_duration_seconds", time.perf_counter() - start, operation=operation)
+
+	def observe_request(self, method: str, route: str, status: int, seconds: float, queries: QueryStats):
+		self.observe("notapp_request_duration_seconds", seconds, method=method, route=route, status=status)
+		self.observe("notapp_request_db_queries", queries.count, method=method, route=route)
+		self.observe("notapp_request_db_seconds", queries.seconds, method=method, route=route)
+
+	def clear(self):
+		with self.lock:
+			for _, _, series in self.families.values():
+				series.clear()
+
+	def render(self, gauges: dict[str, dict] | None = None) -> str:
+		lines = []
+		with self.lock:
+			for name, (help, _, series) in self.families.items():
+				lines.append(f"# HELP {name} {help}")
+				lines.append(f"# TYPE {name} histogram")
+				for key, histogram in series.items():
+					labels = format_labels(dict(key))
+					separator = "," if labels else ""
+					for bound, count in histogram.samples():
+						lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {count}')
+					lines.append(f"{name}_sum{{{labels}}} {histogram.sum:g}")
+					lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+		for prefix, stats in (gauges or {}).items():
+			for key, value in stats.items():
+				lines.append(f"# TYPE notapp_{prefix}_{key} gauge")
+				lines.append(f"notapp_{prefix}_{key} {float(value):g}")
+		return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+metrics.histogram("notapp_request_duration_seconds", "Time to serve a request, by route.", LATENCY_BUCKETS)
+metrics.histogram("notapp_request_db_queries", "SQL statements issued per request.", QUERY_COUNT_BUCKETS)
+metrics.histogram("notapp_request_db_seconds", "Time spent executing SQL per request.", LATENCY_BUCKETS)
+metrics.histogram("notapp_operation_duration_seconds", "Time spent in bcrypt and JWT operations.", LATENCY_BUCKETS)
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	context.query_start = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	queries = current_queries.get()
+	if queries is not None:
+		queries.count += 1
+		queries.seconds += time.perf_counter() - context.query_start
+
+def instrument_engine(engine: Engine):
+	event.listen(engine, "before_cursor_execute", before_cursor_execute)
+	event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+class MetricsMiddleware:
+	# Plain ASGI rather than BaseHTTPMiddleware, which runs the app in a
+	# separate task and re-streams every response body.
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		status = 500
+		async def send_with_status(message):
+			nonlocal status
+			if message["type"] == "http.response.start":
+				status = message["status"]
+			await send(message)
+		queries = QueryStats()
+		token = current_queries.set(queries)
+		start = time.perf_counter()
+		try:
+			await self.app(scope, receive, send_with_status)
+		finally:
+			current_queries.reset(token)
+			# Labelling by route template rather than path keeps note ids out of
+			# the series.
+			route = scope.get("route")
+			metrics.observe_request(scope["method"], route.path if route else "unmatched", status,
+									time.perf_counter() - start, queries)
@@ -0,0 +1,31 @@
+from pydantic_core import to_json
+
+class LineTooLongError(ValueError):
+	pass
+
+async def to_ndjson(records):
+	async for record in records:
+		yield to_json(record) + b"\n"
+
+async def batches_to_ndjson(batches):
+	# One chunk per batch keeps the number of writes to the client low.
+	async for records in batches:
+		yield b"".join(to_json(record) + b"\n" for record in records)
+
+async def read_lines(chunks, max_line_bytes: int):
+	# Splits a byte stream into (line number, line) pairs as it arrives, so
+	# only the current chunk and one partial line are held in memory. Blank
+	# lines are skipped but still counted.
+	buffer = b""
+	line_number = 0
+	async for chunk in chunks:
+		lines = (buffer + chunk).split(b"\n")
+		buffer = lines.pop()
+		if len(buffer) > max_line_bytes:
+			raise LineTooLongError(line_number + len(lines) + 1)
+		for line in lines:
+			line_number += 1
+			if line.strip():
+				yield line_number, line
+	if buffer.strip():
+		yield line_number + 1, buffer
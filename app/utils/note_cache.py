@@ -0,0 +1,125 @@
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from typing import Protocol
+from uuid import uuid4
+from pydantic_core import to_json, from_json, to_jsonable_python
+from app.config import settings
+
+class CacheBackend(Protocol):
+	# The subset of the Redis client API the note cache relies on, so a
+	# redis.Redis instance can be used as a backend as is.
+	def get(self, key: str) -> bytes | None: ...
+	def set(self, key: str, value: bytes, ex: int | None = None): ...
+	def delete(self, *keys: str): ...
+
+class MemoryCache:
+	def __init__(self, max_size: int):
+		self.max_size = max_size
+		self.entries: OrderedDict[str, tuple[bytes, float | None]] = OrderedDict()
+		self.lock = Lock()
+
+	def get(self, key: str) -> bytes | None:
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None:
+				return None
+			value, expires_at = entry
+			if expires_at is not None and expires_at <= time.monotonic():
+				del self.entries[key]
+				return None
+			self.entries.move_to_end(key)
+			return value
+
+	def set(self, key: str, value: bytes, ex: int | None = None):
+		expires_at = time.monotonic() + ex if ex else None
+		with self.lock:
+			self.entries[key] = (value, expires_at)
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.max_size:
+				self.entries.popitem(last=False)
+
+	def delete(self, *keys: str):
+		with self.lock:
+			for key in keys:
+				self.entries.pop(key, None)
+
+class NoteCache:
+	# Entries are keyed by a per-user generation token. A write replaces the
+	# token, which orphans every cached read of that user at once and leaves
+	# other users untouched; orphans age out of the backend. A token lost to
+	# eviction is replaced by a fresh random one, so stale entries can never
+	# be read again.
+	def __init__(self, backend: CacheBackend | None, ttl: int):
+		self.backend = backend
+		self.ttl = ttl
+		self.namespace = "notes"
+		self.hits = 0
+		self.misses = 0
+		self.invalidations = 0
+
+	def generation(self, user_id: int) -> str:
+		key = f"{self.namespace}:{user_id}:generation"
+		token = self.backend.get(key)
+		if token is None:
+			token = uuid4().hex.encode()
+			self.backend.set(key, token)
+		return token.decode()
+
+	def get_or_load(self, user_id: int, name: str, args: tuple, load):
+		if self.backend is None:
+			return to_jsonable_python(load())
+		key = f"{self.namespace}:{user_id}:{self.generation(user_id)}:{name}:{to_json(args).decode()}"
+		cached = self.backend.get(key)
+		if cached is not None:
+			self.hits += 1
+			return from_json(cached)
+		self.misses += 1
+		value = to_jsonable_python(load())
+		self.backend.set(key, to_json(value), ex=self.ttl)
+		return value
+
+	def invalidate(self, user_id: int):
+		if self.backend is None:
+			return
+		self.invalidations += 1
+		self.backend.set(f"{self.namespace}:{user_id}:generation", uuid4().hex.encode())
+
+	def clear(self):
+		# Moving to a new key namespace drops every entry without flushing a
+		# backend that may be shared with other data.
+		self.namespace = f"notes-{uuid4().hex[:8]}"
+		self.hits = 0
+		self.misses = 0
+		self.invalidations = 0
+
+	def stats(self) -> dict:
+		lookups = self.hits + self.misses
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"invalidations": self.invalidations,
+			"hit_rate": self.hits / lookups if lookups else 0.0,
+		}
+
+def create_backend(name: str) -> CacheBackend | None:
+	if name == "memory":
+		return MemoryCache(settings.NOTE_CACHE_SIZE)
+	if name == "redis":
+		import redis
+		return redis.Redis.from_url(settings.REDIS_URL)
+	return None
+
+note_cache = NoteCache(create_backend(settings.NOTE_CACHE_BACKEND), settings.NOTE_CACHE_TTL)
+
+def cached_read(method):
+	# Reads through a session bound to a shard are keyed by it too, so a
+	# listing cached before the user moved shards is not served after.
+	@wraps(method)
+	def wrapper(self, *args, **kwargs):
+		shard = self.db.info.get("shard")
+		name = method.__name__ if shard is None else f"{method.__name__}@{shard}"
+		return note_cache.get_or_load(self.user_id, name, (args, kwargs),
+									  lambda: method(self, *args, **kwargs))
+	return wrapper
@@ -0,0 +1,154 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Protocol
+from fastapi import HTTPException
+from app.config import settings
+from app.utils.json_response import FastJSONResponse
+from app.utils.token_manager import get_current_user
+import math
+import time
+
+@dataclass(frozen=True)
+class Budget:
+	rate: float
+	burst: int
+
+class BucketStore(Protocol):
+	# Takes one token from the bucket at key. Returns 0 when the request may
+	# proceed, otherwise the seconds until a token is available.
+	async def take(self, key: str, budget: Budget) -> float: ...
+
+class MemoryBucketStore:
+	def __init__(self, max_keys: int):
+		self.max_keys = max_keys
+		self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+		self.lock = Lock()
+
+	async def take(self, key: str, budget: Budget) -> float:
+		now = time.monotonic()
+		with self.lock:
+			tokens, updated_at = self.buckets.get(key, (budget.burst, now))
+			tokens = min(budget.burst, tokens + (now - updated_at) * budget.rate)
+			allowed = tokens >= 1
+			self.buckets[key] = (tokens - 1 if allowed else tokens, now)
+			self.buckets.move_to_end(key)
+			# Evicting the least recently seen key only refills its bucket.
+			if len(self.buckets) > self.max_keys:
+				self.buckets.popitem(last=False)
+		return 0.0 if allowed else (1 - tokens) / budget.rate
+
+	def clear(self):
+		with self.lock:
+			self.buckets.clear()
+
+class RedisBucketStore:
+	# The refill and the take run in one script so that every app process
+	# sharing the Redis instance sees the same bucket.
+	SCRIPT = """
+	local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+	local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+	local tokens = tonumber(bucket[1]) or burst
+	local updated_at = tonumber(bucket[2]) or now
+	tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+	local wait = 0
+	if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+	redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+	redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+	return tostring(wait)
+	"""
+
+	def __init__(self, client):
+		self.client = client
+		self.script = client.register_script(self.SCRIPT)
+
+	async def take(self, key: str, budget: Budget) -> float:
+		wait = await self.script(keys=[f"ratelimit:{key}"], args=[budget.rate, budget.burst, time.time()])
+		return float(wait)
+
+def create_bucket_store(name: str) -> BucketStore:
+	if name == "redis":
+		import redis.asyncio
+		return RedisBucketStore(redis.asyncio.Redis.from_url(settings.REDIS_URL))
+	return MemoryBucketStore(settings.RATE_LIMIT_MAX_KEYS)
+
+AUTH_PATHS = {"/users/login", "/users/create"}
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+class RateLimiter:
+	def __init__(self, store: BucketStore, budgets: dict[str, Budget], max_concurrent: int):
+		self.store = store
+		self.budgets = budgets
+		self.max_concurrent = max_concurrent
+		self.in_flight: dict[str, int] = {}
+		self.enabled = True
+
+	def budget_name(self, method: str, path: str) -> str:
+		if path.rstrip("/") in AUTH_PATHS:
+			return "auth"
+		return "write" if method in WRITE_METHODS else "read"
+
+	def client_key(self, scope) -> str:
+		# Authenticated requests are limited per user, everything else per
+		# client address. Claims usually come from the token cache, so this
+		# costs a dictionary lookup rather than a signature check.
+		for name, value in scope["headers"]:
+			if name == b"authorization":
+				scheme, _, token = value.decode("latin-1").partition(" ")
+				if scheme.lower() == "bearer" and token:
+					try:
+						return f"user:{get_current_user(token)['id']}"
+					except HTTPException:
+						pass
+				break
+		client = scope.get("client")
+		return f"ip:{client[0] if client else 'unknown'}"
+
+	async def check(self, scope) -> tuple[str, float]:
+		key = self.client_key(scope)
+		name = self.budget_name(scope["method"], scope["path"])
+		return key, await self.store.take(f"{name}:{key}", self.budgets[name])
+
+def too_many_requests(retry_after: float) -> FastJSONResponse:
+	return FastJSONResponse(status_code=429, content={"detail": "Too Many Requests"},
+							headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+class RateLimitMiddleware:
+	def __init__(self, app, limiter: "RateLimiter | None" = None):
+		self.app = app
+		self.limiter = limiter or rate_limiter
+
+	async def __call__(self, scope, receive, send):
+		limiter = self.limiter
+		if scope["type"] != "http" or not limiter.enabled or scope["method"] == "OPTIONS":
+			await self.app(scope, receive, send)
+			return
+		key, retry_after = await limiter.check(scope)
+		if retry_after > 0:
+			await too_many_requests(retry_after)(scope, receive, send)
+			return
+		# The in-flight count is per process; it caps how many workers one
+		# client can hold at once, e.g. with long exports or imports.
+		if limiter.in_flight.get(key, 0) >= limiter.max_concurrent:
+			await too_many_requests(1)(scope, receive, send)
+			return
+		limiter.in_flight[key] = limiter.in_flight.get(key, 0) + 1
+		try:
+			await self.app(scope, receive, send)
+		finally:
+			remaining = limiter.in_flight[key] - 1
+			if remaining:
+				limiter.in_flight[key] = remaining
+			else:
+				del limiter.in_flight[key]
+
+rate_limiter = RateLimiter(
+	create_bucket_store(settings.RATE_LIMIT_BACKEND),
+	{
+		"read": Budget(settings.RATE_LIMIT_READ_PER_SECOND, settings.RATE_LIMIT_READ_BURST),
+		"write": Budget(settings.RATE_LIMIT_WRITE_PER_SECOND, settings.RATE_LIMIT_WRITE_BURST),
+		"auth": Budget(settings.RATE_LIMIT_AUTH_PER_SECOND, settings.RATE_LIMIT_AUTH_BURST),
+	},
+	settings.RATE_LIMIT_MAX_CONCURRENT,
+)
+rate_limiter.enabled = settings.RATE_LIMIT_ENABLED
@@ -0,0 +1,13 @@
+import re
+
+def to_match_query(text: str) -> str | None:
+	# Free text never reaches FTS5 as query syntax: every word is quoted and
+	# only a trailing * survives, as a prefix search. Words are ANDed.
+	terms = [f'"{word}"{"*" if star else ""}' for word, star in re.findall(r"(\w+)(\*?)", text)]
+	return " ".join(terms) if terms else None
+
+def to_tsquery(text: str) -> str | None:
+	# The PostgreSQL counterpart: the same words, ANDed, with word* as a
+	# prefix match. \w never matches tsquery operators or quotes.
+	terms = [f"{word}{':*' if star else ''}" for word, star in re.findall(r"(\w+)(\*?)", text)]
+	return " & ".join(terms) if terms else None
@@ -0,0 +1,50 @@
+from functools import reduce
+from operator import add
+from sqlalchemy import func, literal
+
+class StaleRevisionError(Exception):
+	# Raised with the note's current revision when an edit names an older one.
+	pass
+
+# Each op deletes `delete` characters at `offset` and inserts `insert`
+# there. Offsets refer to the base content and count code points; ops must
+# be sorted by offset and must not overlap.
+
+def patched_length(ops) -> int:
+	# The length the base content needs for every op to fall inside it.
+	position = 0
+	for op in ops:
+		if op.offset < position:
+			raise ValueError("Operations must be sorted by offset and must not overlap")
+		position = op.offset + op.delete
+	return position
+
+def out_of_range(length: int) -> ValueError:
+	return ValueError(f"Operations run past the end of the note ({length} characters)")
+
+def apply_ops(content: str, ops) -> str:
+	if patched_length(ops) > len(content):
+		raise out_of_range(len(content))
+	parts = []
+	position = 0
+	for op in ops:
+		parts.append(content[position:op.offset])
+		parts.append(op.insert)
+		position = op.offset + op.delete
+	parts.append(content[position:])
+	return "".join(parts)
+
+def splice(column, ops):
+	# The same edit as apply_ops, as a SQL expression, so the text is patched
+	# in the database without being read out and sent back. substr counts
+	# characters on both SQLite and PostgreSQL.
+	parts = []
+	position = 0
+	for op in ops:
+		if op.offset > position:
+			parts.append(func.substr(column, position + 1, op.offset - position, type_=column.type))
+		if op.insert:
+			parts.append(literal(op.insert, column.type))
+		position = op.offset + op.delete
+	parts.append(func.substr(column, position + 1, type_=column.type))
+	return reduce(add, parts)
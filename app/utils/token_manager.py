@@ -1,10 +1,18 @@
 from fastapi import HTTPException, status, Depends 
-from typing import Annotated
+from typing import Annotated, Protocol
 from jose import jwt, JWTError
 from datetime import datetime, timezone, timedelta
 from os import environ 
 from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from uuid import uuid4
+import math
+import time
+from app.config import settings
+from app.utils.metrics import metrics
 
 load_dotenv()
 
@@ -12,21 +20,158 @@ ALGORITHM = "HS256"
 SECRET_KEY = environ.get("JWT_SECRET_KEY")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="users/login")
 
+class RevocationStore(Protocol):
+	def add(self, key: str, expires_at: float): ...
+	def contains(self, key: str) -> bool: ...
+	def clear(self): ...
+
+class MemoryRevocationStore:
+	# Per process and lost on restart: a logout only holds in the worker
+	# that handled it. Use the redis store with more than one worker.
+	def __init__(self):
+		self.revoked: dict[str, float] = {}
+		self.lock = Lock()
+
+	def add(self, key: str, expires_at: float):
+		now = time.time()
+		with self.lock:
+			self.revoked = {revoked: exp for revoked, exp in self.revoked.items() if exp > now}
+			self.revoked[key] = expires_at
+
+	def contains(self, key: str) -> bool:
+		with self.lock:
+			return key in self.revoked
+
+	def clear(self):
+		with self.lock:
+			self.revoked.clear()
+
+class RedisRevocationStore:
+	# Shared by every worker and kept across restarts; each key expires
+	# with the token it revokes.
+	def __init__(self, client):
+		self.client = client
+		self.namespace = "revoked"
+
+	def add(self, key: str, expires_at: float):
+		if expires_at == float("inf"):
+			self.client.set(f"{self.namespace}:{key}", b"1")
+		elif expires_at > time.time():
+			self.client.set(f"{self.namespace}:{key}", b"1", exat=math.ceil(expires_at))
+
+	def contains(self, key: str) -> bool:
+		return bool(self.client.exists(f"{self.namespace}:{key}"))
+
+	def clear(self):
+		# A new namespace instead of deleting keys on a shared server, as
+		# NoteCache.clear does.
+		self.namespace = f"revoked-{uuid4().hex[:8]}"
+
+def create_revocation_store(name: str) -> RevocationStore:
+	if name == "redis":
+		import redis
+		return RedisRevocationStore(redis.Redis.from_url(settings.REDIS_URL))
+	return MemoryRevocationStore()
+
+class TokenCache:
+	# Validated claims keyed by a hash of the token, kept until the token's
+	# exp so repeated requests skip the signature check. Revoked tokens are
+	# remembered by the revocation store until they would have expired anyway.
+	def __init__(self, max_size: int, revocations: RevocationStore | None = None):
+		self.max_size = max_size
+		self.entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+		self.revocations = revocations or MemoryRevocationStore()
+		self.hits = 0
+		self.misses = 0
+		self.lock = Lock()
+
+	def key(self, token: str) -> str:
+		return sha256(token.encode("utf-8")).hexdigest()
+
+	def get(self, token: str) -> dict | None:
+		key = self.key(token)
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None or entry[1] <= time.time():
+				if entry is not None:
+					del self.entries[key]
+				self.misses += 1
+				return None
+			self.entries.move_to_end(key)
+			self.hits += 1
+			return entry[0]
+
+	def put(self, token: str, claims: dict, expires_at: float):
+		if self.max_size <= 0:
+			return
+		key = self.key(token)
+		with self.lock:
+			self.entries[key] = (claims, expires_at)
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.max_size:
+				self.entries.popitem(last=False)
+
+	def revoke(self, token: str, expires_at: float):
+		key = self.key(token)
+		with self.lock:
+			self.entries.pop(key, None)
+		self.revocations.add(key, expires_at)
+
+	def is_revoked(self, token: str) -> bool:
+		return self.revocations.contains(self.key(token))
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+			self.hits = 0
+			self.misses = 0
+		self.revocations.clear()
+
+	def stats(self) -> dict:
+		with self.lock:
+			return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, create_revocation_store(settings.TOKEN_REVOCATION_BACKEND))
+
 def create_access_token(username: str, user_id: int, expires_delta: timedelta):
-	encode = {"sub": username, "id": user_id}
+	# jti makes every token unique, so revoking one never affects another
+	# issued in the same second.
+	encode = {"sub": username, "id": user_id, "jti": uuid4().hex}
 	expires = datetime.now(timezone.utc) + expires_delta
 	encode.update({"exp": expires})
-	return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
+	with metrics.timed("jwt_encode"):
+		return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_access_token(token: str) -> dict:
+	with metrics.timed("jwt_decode"):
+		payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+	username: str = payload.get("sub")
+	user_id: int = payload.get("id")
+	if username is None or user_id is None:
+		raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+							detail="Could not validate user.")
+	return {"username": username, "id": user_id, "exp": payload.get("exp")}
 
 def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
+	if token_cache.is_revoked(token):
+		raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+							detail="Could not validate user.")
+	cached = token_cache.get(token)
+	if cached is not None:
+		return cached
 	try:
-		payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-		username: str = payload.get("sub")
-		user_id: int = payload.get("id")
-		if username is None or user_id is None:
-			raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-								detail="Could not validate user.")
-		return {"username": username, "id": user_id}
+		claims = decode_access_token(token)
 	except JWTError:
 		raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-							detail="Could not validate user.")
\ No newline at end of file
+							detail="Could not validate user.")
+	user = {"username": claims["username"], "id": claims["id"]}
+	if claims["exp"] is not None:
+		token_cache.put(token, user, claims["exp"])
+	return user
+
+def revoke_access_token(token: str):
+	try:
+		claims = decode_access_token(token)
+	except JWTError:
+		return
+	token_cache.revoke(token, claims["exp"] or float("inf"))
\ No newline at end of file
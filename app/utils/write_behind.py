@@ -0,0 +1,210 @@
+import glob
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from sqlalchemy import Engine, bindparam
+from pydantic_core import to_json, from_json
+from app.config import settings
+from app.config.replica import replica_router
+from app.models.NoteModel import Note
+from app.utils.note_cache import note_cache
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PendingEdit:
+	user_id: int
+	note_id: int
+	shard: int
+	content: str
+	revision: int
+	updated_at: datetime
+
+	@property
+	def key(self) -> tuple[int, int]:
+		return self.user_id, self.note_id
+
+class WriteBehindBuffer:
+	# Content edits are acknowledged once they are appended to the log, and
+	# only the newest edit of each note reaches the database, in one
+	# transaction per shard every `interval` seconds. The log is split into
+	# numbered segments: a flush starts a new one and deletes the ones it
+	# covered, and start() replays whatever a crash left behind. The buffer
+	# lives in one process, so the app must run a single worker.
+	def __init__(self, log_path: str, interval: float, fsync: bool = True):
+		self.log_path = log_path
+		self.interval = interval
+		self.fsync = fsync
+		self.engines: list[Engine] = []
+		self.pending: dict[tuple[int, int], PendingEdit] = {}
+		# Edits being written by a flush stay visible until it commits.
+		self.flushing: dict[tuple[int, int], PendingEdit] = {}
+		self.segment = 0
+		self.log = None
+		# Reentrant so that NoteService can hold it across its revision check
+		# and add().
+		self.lock = threading.RLock()
+		self.flush_lock = threading.Lock()
+		self.stopped = threading.Event()
+		self.thread = None
+		self.flushes = 0
+		self.edits = 0
+
+	@property
+	def running(self) -> bool:
+		return self.thread is not None
+
+	def segment_path(self, segment: int) -> str:
+		return f"{self.log_path}.{segment}"
+
+	def segments(self) -> list[int]:
+		suffixes = (path.rpartition(".")[2] for path in glob.glob(f"{glob.escape(self.log_path)}.*"))
+		return sorted(int(suffix) for suffix in suffixes if suffix.isdigit())
+
+	def open_segment(self, segment: int):
+		self.segment = segment
+		self.log = open(self.segment_path(segment), "ab")
+
+	def append(self, record: dict):
+		self.log.write(to_json(record) + b"\n")
+		self.log.flush()
+		if self.fsync:
+			os.fsync(self.log.fileno())
+
+	def start(self, engines: list[Engine]):
+		# engines are indexed by shard, as in ShardMap.
+		self.engines = engines
+		segments = self.segments()
+		for segment in segments:
+			self.replay(segment)
+		self.open_segment(segments[-1] + 1 if segments else 0)
+		self.flush()
+		self.stopped.clear()
+		self.thread = threading.Thread(target=self.run, name="write-behind", daemon=True)
+		self.thread.start()
+
+	def stop(self):
+		if self.thread is None:
+			return
+		self.stopped.set()
+		self.thread.join()
+		self.thread = None
+		self.flush()
+		self.log.close()
+		self.log = None
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			self.flush()
+
+	def replay(self, segment: int):
+		with open(self.segment_path(segment), "rb") as log:
+			for line in log:
+				try:
+					record = from_json(line)
+				except ValueError:
+					# A crash while appending leaves at most one torn line,
+					# and that edit was never acknowledged.
+					continue
+				if "discard" in record:
+					for note_id in record["discard"]:
+						self.pending.pop((record["user_id"], note_id), None)
+					continue
+				edit = PendingEdit(record["user_id"], record["note_id"], record["shard"], record["content"],
+								   record["revision"], datetime.fromisoformat(record["updated_at"]))
+				self.pending[edit.key] = edit
+
+	def add(self, user_id: int, note_id: int, shard: int, content: str, revision: int) -> PendingEdit:
+		edit = PendingEdit(user_id, note_id, shard, content, revision, datetime.now(timezone.utc))
+		with self.lock:
+			self.append({"user_id": user_id, "note_id": note_id, "shard": shard,
+						 "content": content, "revision": revision, "updated_at": edit.updated_at})
+			self.pending[edit.key] = edit
+			self.edits += 1
+		return edit
+
+	def discard(self, user_id: int, note_ids: list[int]):
+		# For deleted notes. Logged too, so a replay cannot write an edit into
+		# a new note that reuses the id.
+		with self.lock:
+			if not any(self.get(user_id, note_id) for note_id in note_ids):
+				return
+			self.append({"user_id": user_id, "discard": note_ids})
+			for note_id in note_ids:
+				self.pending.pop((user_id, note_id), None)
+
+	def get(self, user_id: int, note_id: int) -> PendingEdit | None:
+		key = (user_id, note_id)
+		return self.pending.get(key) or self.flushing.get(key)
+
+	def overlay(self, user_id: int, note: dict) -> dict:
+		edit = self.get(user_id, note["id"]) if self.pending or self.flushing else None
+		if edit is None:
+			return note
+		return {**note, "content": edit.content, "revision": edit.revision, "updated_at": edit.updated_at}
+
+	def overlay_all(self, user_id: int, notes: list[dict]) -> list[dict]:
+		if not self.pending and not self.flushing:
+			return notes
+		return [self.overlay(user_id, note) for note in notes]
+
+	def version(self, user_id: int) -> datetime | None:
+		# Part of the notes version, so ETags change with each pending edit.
+		edits = [edit.updated_at for edits in (self.pending, self.flushing)
+				 for edit in list(edits.values()) if edit.user_id == user_id]
+		return max(edits, default=None)
+
+	def flush(self) -> int:
+		with self.flush_lock:
+			with self.lock:
+				if not self.pending:
+					return 0
+				self.flushing, self.pending = self.pending, {}
+				covered = self.segment
+				if self.log is not None:
+					self.log.close()
+					self.open_segment(covered + 1)
+			try:
+				self.write(list(self.flushing.values()))
+			except Exception:
+				logger.exception("Write-behind flush failed, retrying on the next interval")
+				with self.lock:
+					self.pending = {**self.flushing, **self.pending}
+					self.flushing = {}
+				return 0
+			flushed = len(self.flushing)
+			# flushes counts committed flushes; NoteService compares it across
+			# a read to tell whether the row it read may be older than the
+			# edit that just left the buffer.
+			with self.lock:
+				self.flushing = {}
+				self.flushes += 1
+			for segment in self.segments():
+				if segment <= covered:
+					os.remove(self.segment_path(segment))
+			return flushed
+
+	def write(self, edits: list[PendingEdit]):
+		# updated_at is the flush time, so clients that synced with ?since=
+		# while the edit was pending still receive it.
+		now = datetime.now(timezone.utc)
+		query = (Note.__table__.update()
+			.where(Note.__table__.c.id == bindparam("note_id"), Note.__table__.c.user_id == bindparam("owner_id"))
+			.values(content=bindparam("new_content"), revision=bindparam("new_revision"), updated_at=now))
+		by_shard = {}
+		for edit in edits:
+			by_shard.setdefault(edit.shard, []).append(
+				{"note_id": edit.note_id, "owner_id": edit.user_id, "new_content": edit.content, "new_revision": edit.revision})
+		for shard, params in by_shard.items():
+			with self.engines[shard].begin() as connection:
+				connection.execute(query, params)
+		for user_id in {edit.user_id for edit in edits}:
+			replica_router.wrote(user_id)
+			note_cache.invalidate(user_id)
+
+	def stats(self) -> dict:
+		return {"pending": len(self.pending), "edits": self.edits, "flushes": self.flushes}
+
+write_behind = WriteBehindBuffer(settings.WRITE_BEHIND_LOG, settings.WRITE_BEHIND_INTERVAL, settings.WRITE_BEHIND_FSYNC)
@@ -0,0 +1,53 @@
+# Times NoteService.get_categories_by_name for accounts of growing size that
+# always hold the same number of matching notes.
+# Run from the repository root: python -m benchmarks.bench_filter_by_name
+import os
+import tempfile
+import time
+from sqlalchemy import insert
+from sqlmodel import SQLModel, Session, create_engine
+from app.models.NoteModel import Note, Tag, NoteTag
+from app.models.UserModel import User
+from app.services.NoteService import NoteService
+
+ACCOUNT_SIZES = [1_000, 10_000, 100_000]
+MATCHING_NOTES = 50
+REPEAT = 20
+
+def seed(session: Session, user_id: int, size: int):
+	session.execute(insert(Note), [
+		{"id": user_id * 1_000_000 + i, "content": f"note {i}", "user_id": user_id}
+		for i in range(size)
+	])
+	names = ["match"] + [f"tag {i}" for i in range(100)]
+	tag_ids = {name: user_id * 1_000 + i for i, name in enumerate(names)}
+	session.execute(insert(Tag), [{"id": tag_id, "user_id": user_id, "name": name} for name, tag_id in tag_ids.items()])
+	step = size // MATCHING_NOTES
+	session.execute(insert(NoteTag), [
+		{"note_id": user_id * 1_000_000 + i, "tag_id": tag_ids["match" if i % step == 0 else f"tag {i % 100}"]}
+		for i in range(size)
+	])
+	session.commit()
+
+def main():
+	with tempfile.TemporaryDirectory() as tmp:
+		engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}")
+		SQLModel.metadata.create_all(engine)
+		with Session(engine) as session:
+			for user_id, size in enumerate(ACCOUNT_SIZES, start=1):
+				seed(session, user_id, size)
+			print(f"{'notes':>10} {'matches':>8} {'ms/query':>10}")
+			for user_id, size in enumerate(ACCOUNT_SIZES, start=1):
+				service = NoteService(user_id, session)
+				# Bypasses note_cache so every call reaches the database.
+				get_categories_by_name = NoteService.get_categories_by_name.__wrapped__
+				notes = get_categories_by_name(service, "match")
+				start = time.perf_counter()
+				for _ in range(REPEAT):
+					get_categories_by_name(service, "match")
+				elapsed = (time.perf_counter() - start) / REPEAT * 1000
+				print(f"{size:>10} {len(notes):>8} {elapsed:>10.2f}")
+		engine.dispose()
+
+if __name__ == "__main__":
+	main()
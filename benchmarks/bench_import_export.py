@@ -0,0 +1,85 @@
+# Imports a generated JSONL file through POST /notes/import, streaming the
+# body in 64 KiB pieces, then exports the account through the same generator
+# that feeds GET /notes/export. Reports time and resident memory growth.
+# httpx's ASGI transport buffers response bodies, so the export is consumed
+# directly from the stream rather than through the client. RSS includes
+# SQLite's page cache and mmap, up to SQLITE_CACHE_SIZE_KB and SQLITE_MMAP_SIZE;
+# set both low to see the memory used by the import and export themselves.
+# Run from the repository root: JWT_SECRET_KEY=x python -m benchmarks.bench_import_export [notes]
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import timedelta
+import httpx
+from sqlmodel import Session
+from app.main import app
+from app.config.database import create_app_engine, get_db_session
+from app.services.AsyncNoteService import AsyncNoteService
+from app.utils.ndjson import batches_to_ndjson
+from app.utils.token_manager import create_access_token
+from benchmarks.seed import WORDS, seed_database
+
+NOTES = 1_000_000
+TAGS = [f"tag {i}" for i in range(50)]
+READ_SIZE = 64 * 1024
+
+def max_rss_mb() -> float:
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def write_jsonl(path: str, count: int):
+	rng = random.Random(0)
+	with open(path, "w") as jsonl:
+		for _ in range(count):
+			note = {"content": " ".join(rng.choices(WORDS, k=20)), "categories": rng.sample(TAGS, 2)}
+			jsonl.write(json.dumps(note) + "\n")
+
+async def read_file(path: str):
+	with open(path, "rb") as jsonl:
+		while chunk := jsonl.read(READ_SIZE):
+			yield chunk
+
+async def import_and_export(path: str, engine, user_id: int, token: str):
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+		rss = max_rss_mb()
+		start = time.perf_counter()
+		response = await client.post("/notes/import", content=read_file(path),
+									 headers={"Authorization": f"Bearer {token}"})
+		elapsed = time.perf_counter() - start
+		print(f"import: {response.json()} in {elapsed:.1f} s, max RSS +{max_rss_mb() - rss:.0f} MB")
+	with Session(engine) as session:
+		rss = max_rss_mb()
+		start = time.perf_counter()
+		lines = exported = 0
+		async for chunk in batches_to_ndjson(AsyncNoteService(user_id, session).export_notes()):
+			lines += chunk.count(b"\n")
+			exported += len(chunk)
+		elapsed = time.perf_counter() - start
+		print(f"export: {lines} notes, {exported / 1024 / 1024:.0f} MB in {elapsed:.1f} s, max RSS +{max_rss_mb() - rss:.0f} MB")
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else NOTES
+	with tempfile.TemporaryDirectory() as tmp:
+		path = os.path.join(tmp, "notes.jsonl")
+		write_jsonl(path, count)
+		print(f"{count} notes, {os.path.getsize(path) / 1024 / 1024:.0f} MB of JSONL")
+		engine = create_app_engine(f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}")
+		user = seed_database(engine, 1, 0, 0, 0, "unused")[0]
+		token = create_access_token(user.username, user.id, timedelta(hours=1))
+		def get_bench_session():
+			with Session(engine) as session:
+				yield session
+		app.dependency_overrides[get_db_session] = get_bench_session
+		try:
+			asyncio.run(import_and_export(path, engine, user.id, token))
+		finally:
+			app.dependency_overrides.clear()
+			engine.dispose()
+
+if __name__ == "__main__":
+	main()
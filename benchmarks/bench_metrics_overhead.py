@@ -0,0 +1,66 @@
+# Measures what the instrumentation costs: the SQLAlchemy statement hooks per
+# statement, and MetricsMiddleware per request on a minimal route, each
+# against the same work without instrumentation.
+# Run from the repository root: python -m benchmarks.bench_metrics_overhead
+import asyncio
+import time
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from app.utils.metrics import MetricsMiddleware, QueryStats, current_queries, instrument_engine
+
+STATEMENTS = 20_000
+REQUESTS = 20_000
+ROUNDS = 5
+
+def time_statements(instrumented: bool) -> float:
+	engine = create_engine("sqlite://")
+	if instrumented:
+		instrument_engine(engine)
+	token = current_queries.set(QueryStats())
+	with engine.connect() as connection:
+		start = time.perf_counter()
+		for _ in range(STATEMENTS):
+			connection.execute(text("SELECT 1")).scalar()
+		elapsed = time.perf_counter() - start
+	current_queries.reset(token)
+	engine.dispose()
+	return elapsed / STATEMENTS * 1_000_000
+
+def build_app(instrumented: bool) -> FastAPI:
+	app = FastAPI()
+	@app.get("/ping")
+	async def ping():
+		return {"ok": True}
+	if instrumented:
+		app.add_middleware(MetricsMiddleware)
+	return app
+
+async def time_requests(instrumented: bool) -> float:
+	app = build_app(instrumented)
+	scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+			 "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"",
+			 "headers": [], "client": ("127.0.0.1", 1), "server": ("testserver", 80)}
+	async def receive():
+		return {"type": "http.request", "body": b"", "more_body": False}
+	async def send(message):
+		pass
+	start = time.perf_counter()
+	for _ in range(REQUESTS):
+		await app(dict(scope), receive, send)
+	return (time.perf_counter() - start) / REQUESTS * 1_000_000
+
+def best_of(measure) -> float:
+	# The fastest of several rounds filters out scheduling noise.
+	return min(measure() for _ in range(ROUNDS))
+
+def main():
+	print(f"{'':>12} {'plain us':>10} {'instrumented us':>16} {'overhead us':>12}")
+	plain = best_of(lambda: time_statements(False))
+	instrumented = best_of(lambda: time_statements(True))
+	print(f"{'statement':>12} {plain:>10.2f} {instrumented:>16.2f} {instrumented - plain:>12.2f}")
+	plain = best_of(lambda: asyncio.run(time_requests(False)))
+	instrumented = best_of(lambda: asyncio.run(time_requests(True)))
+	print(f"{'request':>12} {plain:>10.2f} {instrumented:>16.2f} {instrumented - plain:>12.2f}")
+
+if __name__ == "__main__":
+	main()
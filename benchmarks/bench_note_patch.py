@@ -0,0 +1,67 @@
+# One-character edits to a large note: a full content replacement against a
+# PATCH /notes/diff operation. Reports the request body size, the time per
+# edit from body parsing to commit, and the WAL bytes each commit writes.
+# SQLite stores the row whole and note_fts re-tokenizes the whole note on
+# every content change, so the last two columns stay with the note size.
+# Run from the repository root: python -m benchmarks.bench_note_patch
+import os
+import tempfile
+import time
+from sqlalchemy import insert, text
+from sqlmodel import SQLModel, Session
+from app.config.database import create_app_engine
+from app.config.migrations import run_migrations
+from app.models.NoteModel import Note
+from app.schemas.NoteContentSchema import NoteContentSchema
+from app.schemas.NotePatchSchema import NotePatchSchema
+from app.services.NoteService import NoteService
+
+NOTE_SIZE = 200_000
+EDITS = 200
+
+def full_edit(service: NoteService, note_id: int, content: str, edit: int) -> int:
+	content = content[:edit] + "x" + content[edit + 1:]
+	body = NoteContentSchema(content=content).model_dump_json()
+	service.update_content(note_id, NoteContentSchema.model_validate_json(body).content)
+	return len(body)
+
+def patch_edit(service: NoteService, note_id: int, content: str, edit: int) -> int:
+	body = NotePatchSchema.model_validate({"base_revision": edit,
+										   "ops": [{"offset": edit, "delete": 1, "insert": "x"}]}).model_dump_json()
+	patch = NotePatchSchema.model_validate_json(body)
+	service.patch_content(note_id, patch.base_revision, patch.ops)
+	return len(body)
+
+def run(engine, edit_note) -> tuple[float, float, float]:
+	with Session(engine) as session:
+		content = "lorem ipsum " * (NOTE_SIZE // 12)
+		note_id = session.execute(insert(Note).returning(Note.id),
+								  [{"content": content, "user_id": 1}]).scalar_one()
+		session.commit()
+		session.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+		wal_path = f"{engine.url.database}-wal"
+		service = NoteService(1, session)
+		body_bytes = 0
+		start = time.perf_counter()
+		for edit in range(EDITS):
+			body_bytes += edit_note(service, note_id, content, edit)
+			session.close()
+		elapsed = time.perf_counter() - start
+		wal_bytes = os.path.getsize(wal_path)
+	return body_bytes / EDITS, elapsed / EDITS * 1e6, wal_bytes / EDITS
+
+def main():
+	with tempfile.TemporaryDirectory() as tmp:
+		print(f"{EDITS} one-character edits to a {NOTE_SIZE // 1000} KB note")
+		print(f"{'mode':>6} {'body bytes':>11} {'µs/edit':>9} {'WAL bytes/edit':>15}")
+		for name, edit_note in (("full", full_edit), ("patch", patch_edit)):
+			engine = create_app_engine(f"sqlite:///{os.path.join(tmp, f'{name}.sqlite')}",
+									   pragmas={"journal_mode": "WAL", "wal_autocheckpoint": 0})
+			SQLModel.metadata.create_all(engine)
+			run_migrations(engine)
+			body_bytes, micros, wal_bytes = run(engine, edit_note)
+			print(f"{name:>6} {body_bytes:>11.0f} {micros:>9.0f} {wal_bytes:>15.0f}")
+			engine.dispose()
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,63 @@
+# Reports the bytes GET /notes/ sends for one account in each listing mode,
+# uncompressed and with gzip (and brotli when installed), plus the time to
+# serve each variant from a warm note cache.
+# Run from the repository root: JWT_SECRET_KEY=x python -m benchmarks.bench_payload_size [notes]
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+import httpx
+from sqlmodel import Session
+from app.main import app
+from app.config.database import create_app_engine, get_db_session
+from app.utils.compression import brotli
+from app.utils.rate_limit import rate_limiter
+from app.utils.token_manager import create_access_token
+from benchmarks.seed import seed_database
+
+NOTES = 2000
+ROUNDS = 20
+MODES = {
+	"full": {},
+	"summary": {"summary": "true"},
+	"fields": {"fields": "updated_at,categories"},
+	"fields+summary": {"fields": "content,updated_at", "summary": "true"},
+}
+
+async def measure(token: str):
+	encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+		print(f"{'mode':>16} {'encoding':>9} {'bytes':>10} {'ms':>8}")
+		for mode, params in MODES.items():
+			for encoding in encodings:
+				headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": encoding}
+				await client.get("/notes/", params=params, headers=headers)
+				start = time.perf_counter()
+				for _ in range(ROUNDS):
+					async with client.stream("GET", "/notes/", params=params, headers=headers) as response:
+						sent = sum([len(chunk) async for chunk in response.aiter_raw()])
+				elapsed = (time.perf_counter() - start) / ROUNDS * 1000
+				print(f"{mode:>16} {encoding:>9} {sent:>10} {elapsed:>8.2f}")
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else NOTES
+	with tempfile.TemporaryDirectory() as tmp:
+		engine = create_app_engine(f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}")
+		user = seed_database(engine, 1, count, 20, 3, "unused")[0]
+		token = create_access_token(user.username, user.id, timedelta(hours=1))
+		def get_bench_session():
+			with Session(engine) as session:
+				yield session
+		app.dependency_overrides[get_db_session] = get_bench_session
+		rate_limiter.enabled = False
+		try:
+			asyncio.run(measure(token))
+		finally:
+			app.dependency_overrides.clear()
+			engine.dispose()
+
+if __name__ == "__main__":
+	main()
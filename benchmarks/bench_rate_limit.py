@@ -0,0 +1,55 @@
+# Measures what RateLimitMiddleware costs per request on a minimal route, for
+# an anonymous client keyed by address and for a client with a bearer token
+# whose claims are in the token cache, against the same route without it.
+# Budgets are set high enough that every request is let through.
+# Run from the repository root: JWT_SECRET_KEY=x python -m benchmarks.bench_rate_limit
+import asyncio
+import time
+from datetime import timedelta
+from fastapi import FastAPI
+from app.utils.rate_limit import Budget, MemoryBucketStore, RateLimiter, RateLimitMiddleware
+from app.utils.token_manager import create_access_token
+
+REQUESTS = 20_000
+ROUNDS = 5
+
+def build_app(limited: bool) -> FastAPI:
+	app = FastAPI()
+	@app.get("/ping")
+	async def ping():
+		return {"ok": True}
+	if limited:
+		budget = Budget(rate=1_000_000, burst=1_000_000)
+		limiter = RateLimiter(MemoryBucketStore(100_000), {"read": budget, "write": budget, "auth": budget}, 16)
+		app.add_middleware(RateLimitMiddleware, limiter=limiter)
+	return app
+
+async def time_requests(limited: bool, headers: list) -> float:
+	app = build_app(limited)
+	scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+			 "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"",
+			 "headers": headers, "client": ("127.0.0.1", 1), "server": ("testserver", 80)}
+	async def receive():
+		return {"type": "http.request", "body": b"", "more_body": False}
+	async def send(message):
+		pass
+	start = time.perf_counter()
+	for _ in range(REQUESTS):
+		await app(dict(scope), receive, send)
+	return (time.perf_counter() - start) / REQUESTS * 1_000_000
+
+def best_of(measure) -> float:
+	# The fastest of several rounds filters out scheduling noise.
+	return min(measure() for _ in range(ROUNDS))
+
+def main():
+	token = create_access_token("bench", 1, timedelta(hours=1))
+	clients = {"anonymous": [], "bearer": [(b"authorization", f"Bearer {token}".encode())]}
+	print(f"{'':>12} {'plain us':>10} {'limited us':>11} {'overhead us':>12}")
+	for name, headers in clients.items():
+		plain = best_of(lambda: asyncio.run(time_requests(False, headers)))
+		limited = best_of(lambda: asyncio.run(time_requests(True, headers)))
+		print(f"{name:>12} {plain:>10.2f} {limited:>11.2f} {limited - plain:>12.2f}")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,50 @@
+# Times NoteService.search_notes as the table grows, up to 1M synthetic notes
+# spread over 1000 users. Every user owns the same share of the notes.
+# Run from the repository root: python -m benchmarks.bench_search [sizes...]
+import os
+import random
+import sys
+import tempfile
+import time
+from sqlalchemy import insert
+from sqlmodel import SQLModel, Session, create_engine
+from app.models.NoteModel import Note
+from app.models.UserModel import User
+from app.services.NoteService import NoteService
+
+SIZES = [10_000, 100_000, 1_000_000]
+USERS = 1000
+REPEAT = 50
+WORDS = [f"word{i}" for i in range(5000)]
+
+def seed(session: Session, start: int, count: int):
+	random.seed(start)
+	for offset in range(0, count, 50_000):
+		session.execute(insert(Note), [
+			{"content": " ".join(random.choices(WORDS, k=30)), "user_id": (start + offset + i) % USERS}
+			for i in range(min(50_000, count - offset))
+		])
+	session.commit()
+
+def main():
+	sizes = [int(size) for size in sys.argv[1:]] or SIZES
+	with tempfile.TemporaryDirectory() as tmp:
+		engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}")
+		SQLModel.metadata.create_all(engine)
+		print(f"{'notes':>10} {'query':>14} {'ms/query':>10}")
+		seeded = 0
+		with Session(engine) as session:
+			for size in sizes:
+				seed(session, seeded, size - seeded)
+				seeded = size
+				service = NoteService(7, session)
+				for text in ("word42", "word123*", "word1 word2"):
+					start = time.perf_counter()
+					for _ in range(REPEAT):
+						service.search_notes(text, limit=20)
+					elapsed = (time.perf_counter() - start) / REPEAT * 1000
+					print(f"{size:>10} {text:>14} {elapsed:>10.2f}")
+		engine.dispose()
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,42 @@
+# Compares rendering a 10k note listing with jsonable_encoder + JSONResponse
+# against FastJSONResponse, for service dicts and for Note models.
+# Run from the repository root: python -m benchmarks.bench_serialization
+import time
+from datetime import datetime, timezone
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.models.NoteModel import Note
+from app.utils.json_response import FastJSONResponse
+
+NOTES = 10_000
+REPEAT = 5
+
+def build_notes():
+	now = datetime.now(timezone.utc)
+	notes = []
+	for i in range(NOTES):
+		note = Note(id=i, content=f"note {i} " * 20, created_at=now, updated_at=now, user_id=1)
+		categories = [{"id": i * 3 + j, "name": f"tag {j}", "note_id": i} for j in range(3)]
+		notes.append((note, categories))
+	return notes
+
+def measure(render) -> float:
+	start = time.perf_counter()
+	for _ in range(REPEAT):
+		render()
+	return (time.perf_counter() - start) / REPEAT * 1000
+
+def main():
+	notes = build_notes()
+	dicts = [{**note.model_dump(), "categories": categories}
+			 for note, categories in notes]
+	models = [note for note, _ in notes]
+	print(f"{'payload':>8} {'renderer':>16} {'ms':>10}")
+	for payload, content in (("dicts", dicts), ("models", models)):
+		old = measure(lambda: JSONResponse(content={"notes": jsonable_encoder(content)}).body)
+		new = measure(lambda: FastJSONResponse(content={"notes": content}).body)
+		print(f"{payload:>8} {'jsonable_encoder':>16} {old:>10.1f}")
+		print(f"{payload:>8} {'FastJSONResponse':>16} {new:>10.1f}")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,68 @@
+# Concurrent write throughput with users' notes spread over 1, 2 and 4
+# SQLite shards. Each writer is its own process, as under a multi-worker
+# server, and commits single notes through NoteService for its own user, so
+# writers on different shards never wait for each other's write lock.
+# Scaling is bounded by the number of cores and, with SQLITE_SYNCHRONOUS=FULL,
+# by how many fsyncs the disk runs in parallel.
+# Run from the repository root: python -m benchmarks.bench_sharding
+import argparse
+import os
+import tempfile
+import time
+from multiprocessing import Barrier, Pool
+from sqlmodel import SQLModel, Session
+from app.config.database import create_app_engine
+from app.config.migrations import run_migrations
+from app.config.sharding import ShardMap
+from app.schemas.NoteSchema import NoteSchema
+from app.services.NoteService import NoteService
+
+SHARD_COUNTS = (1, 2, 4)
+
+def init_writer(barrier: Barrier):
+	global start_barrier
+	start_barrier = barrier
+
+def write_notes(args: tuple) -> float:
+	urls, user_id, writes = args
+	shard_map = ShardMap([create_app_engine(url, pool_size=1, max_overflow=0) for url in urls])
+	shard_engine = shard_map.engines[shard_map.place(user_id)]
+	with Session(shard_engine) as session:
+		service = NoteService(user_id, session)
+		service.create_note(NoteSchema(content="warm up", categories=[]))
+		start_barrier.wait()
+		start = time.perf_counter()
+		for i in range(writes):
+			service.create_note(NoteSchema(content=f"user {user_id} note {i}", categories=["bench"]))
+		elapsed = time.perf_counter() - start
+	shard_engine.dispose()
+	return elapsed
+
+def run(tmp: str, shards: int, writers: int, writes: int) -> float:
+	urls = [f"sqlite:///{os.path.join(tmp, f'shard{shards}_{shard}.sqlite')}" for shard in range(shards)]
+	for url in urls:
+		engine = create_app_engine(url)
+		SQLModel.metadata.create_all(engine)
+		run_migrations(engine)
+		engine.dispose()
+	# Users 1..writers, placed by user_id % shards, spread evenly.
+	with Pool(writers, initializer=init_writer, initargs=(Barrier(writers),)) as pool:
+		elapsed = pool.map(write_notes, [(urls, user_id, writes) for user_id in range(1, writers + 1)])
+	return writers * writes / max(elapsed)
+
+def main():
+	parser = argparse.ArgumentParser(description="Concurrent writers against 1, 2 and 4 shards.")
+	parser.add_argument("--writers", type=int, default=8)
+	parser.add_argument("--writes", type=int, default=500, help="Commits per writer.")
+	args = parser.parse_args()
+	print(f"{args.writers} writer processes, {args.writes} commits each, {os.cpu_count()} cores")
+	print(f"{'shards':>6} {'commits/s':>12} {'speedup':>8}")
+	with tempfile.TemporaryDirectory() as tmp:
+		baseline = None
+		for shards in SHARD_COUNTS:
+			throughput = run(tmp, shards, args.writers, args.writes)
+			baseline = baseline or throughput
+			print(f"{shards:>6} {throughput:>12.0f} {throughput / baseline:>7.2f}x")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,47 @@
+# Compares concurrent write throughput of a default SQLite engine with the
+# engine built by create_app_engine (WAL, synchronous=NORMAL, busy_timeout).
+# Run from the repository root: python -m benchmarks.bench_sqlite_pragmas
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, Session, create_engine
+from app.config.database import create_app_engine
+from app.models.NoteModel import Note
+from app.models.UserModel import User
+
+WRITERS = 8
+WRITES_PER_WRITER = 200
+
+def write_notes(engine, writer: int) -> int:
+	failed = 0
+	with Session(engine) as session:
+		for i in range(WRITES_PER_WRITER):
+			session.add(Note(content=f"writer {writer} note {i}", user_id=writer))
+			try:
+				session.commit()
+			except OperationalError:
+				session.rollback()
+				failed += 1
+	return failed
+
+def run(name: str, engine):
+	SQLModel.metadata.create_all(engine)
+	start = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=WRITERS) as pool:
+		failed = sum(pool.map(lambda writer: write_notes(engine, writer), range(WRITERS)))
+	elapsed = time.perf_counter() - start
+	committed = WRITERS * WRITES_PER_WRITER - failed
+	print(f"{name:>8} {committed / elapsed:>12.0f} {failed:>8}")
+	engine.dispose()
+
+def main():
+	with tempfile.TemporaryDirectory() as tmp:
+		print(f"{'engine':>8} {'commits/s':>12} {'locked':>8}")
+		run("default", create_engine(f"sqlite:///{os.path.join(tmp, 'default.sqlite')}",
+									 connect_args={"check_same_thread": False}))
+		run("tuned", create_app_engine(f"sqlite:///{os.path.join(tmp, 'tuned.sqlite')}"))
+
+if __name__ == "__main__":
+	main()
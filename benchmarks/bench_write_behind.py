@@ -0,0 +1,62 @@
+# Autosave pattern: a few notes, each edited many times in a row. Compares
+# NoteService.update_content committing every edit with the write-behind
+# buffer, which appends each edit to its log and writes only the newest
+# version of each note on flush.
+# Run from the repository root: python -m benchmarks.bench_write_behind
+import os
+import tempfile
+import time
+from sqlalchemy import insert
+from sqlmodel import SQLModel, Session
+from app.config.database import create_app_engine
+from app.models.NoteModel import Note
+from app.services.NoteService import NoteService
+from app.utils.write_behind import write_behind
+
+NOTES = 20
+EDITS_PER_NOTE = 50
+CONTENT = "autosaved text " * 200
+
+def seed(engine) -> list[int]:
+	with Session(engine) as session:
+		note_ids = list(session.execute(insert(Note).returning(Note.id),
+										[{"content": "", "user_id": 1} for _ in range(NOTES)]).scalars())
+		session.commit()
+	return note_ids
+
+def edit_all(engine, note_ids: list[int]) -> float:
+	start = time.perf_counter()
+	with Session(engine) as session:
+		service = NoteService(1, session)
+		for edit in range(EDITS_PER_NOTE):
+			for note_id in note_ids:
+				service.update_content(note_id, f"{CONTENT} {edit}")
+				session.close()
+	return time.perf_counter() - start
+
+def main():
+	edits = NOTES * EDITS_PER_NOTE
+	with tempfile.TemporaryDirectory() as tmp:
+		engine = create_app_engine(f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}")
+		SQLModel.metadata.create_all(engine)
+		note_ids = seed(engine)
+		print(f"{NOTES} notes x {EDITS_PER_NOTE} edits, {len(CONTENT)} characters each")
+		print(f"{'mode':>22} {'µs/edit':>10} {'commits':>8} {'flush ms':>9}")
+		elapsed = edit_all(engine, note_ids)
+		print(f"{'commit per edit':>22} {elapsed / edits * 1e6:>10.0f} {edits:>8} {'-':>9}")
+		for fsync in (True, False):
+			write_behind.log_path = os.path.join(tmp, f"write_behind_{fsync}.log")
+			write_behind.interval = 3600
+			write_behind.fsync = fsync
+			write_behind.start([engine])
+			elapsed = edit_all(engine, note_ids)
+			start = time.perf_counter()
+			flushed = write_behind.flush()
+			flush_ms = (time.perf_counter() - start) * 1000
+			write_behind.stop()
+			name = "write-behind" + (" (fsync)" if fsync else "")
+			print(f"{name:>22} {elapsed / edits * 1e6:>10.0f} {flushed:>8} {flush_ms:>9.1f}")
+		engine.dispose()
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,301 @@
+# Seeds a SQLite database, then drives every route of the app in-process
+# through httpx's ASGI transport, once with a single client and once with
+# concurrent clients. Reports p50/p95/p99 latency, requests per second and SQL
+# statements per request, and saves or compares a JSON baseline.
+# Run from the repository root:
+#   JWT_SECRET_KEY=x python -m benchmarks.load_test --save benchmarks/baselines/load_test.json
+#   JWT_SECRET_KEY=x python -m benchmarks.load_test --compare benchmarks/baselines/load_test.json
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+import httpx
+from sqlalchemy import Engine, event
+from sqlmodel import Session
+from app.main import app
+from app.config import settings
+from app.config.database import create_app_engine, get_db_session
+from app.utils.hash_password import hash_password, password_hasher
+from app.utils.token_manager import create_access_token
+from app.utils.note_cache import note_cache
+from app.utils.rate_limit import rate_limiter
+from benchmarks.seed import WORDS, SeededUser, seed_database, seed_notes, seed_tags
+
+PASSWORD = "load-test"
+
+class Fixture:
+	def __init__(self, engine: Engine, users: list[SeededUser], seed: int):
+		self.engine = engine
+		self.users = users
+		self.seed = seed
+		self.rng = random.Random(seed)
+		self.tokens = {user.id: create_access_token(user.username, user.id, timedelta(hours=1)) for user in users}
+		self.ids = itertools.count()
+
+	def user(self, i: int) -> SeededUser:
+		return self.users[i % len(self.users)]
+
+	def headers(self, user: SeededUser) -> dict:
+		return {"Authorization": f"Bearer {self.tokens[user.id]}"}
+
+	def unique(self, prefix: str) -> str:
+		return f"{prefix} {next(self.ids)}"
+
+	def fresh_notes(self, count: int, notes_per_request: int = 1, tags_per_note: int = 1) -> list:
+		# Resources that a request deletes or merges away are created up front,
+		# outside the timed loop, so every run starts from the same layout.
+		prepared = []
+		with Session(self.engine) as session:
+			for i in range(count):
+				user = self.user(i)
+				seeded_categories = len(user.category_ids)
+				note_ids = seed_notes(session, user, notes_per_request, tags_per_note, self.rng)
+				prepared.append((user, note_ids, user.category_ids[seeded_categories:]))
+			session.commit()
+		return prepared
+
+	def fresh_categories(self, count: int) -> list:
+		return [(user, category_ids[0]) for user, _, category_ids in self.fresh_notes(count)]
+
+	def fresh_tags(self, count: int, tags_per_request: int) -> list:
+		prepared = []
+		with Session(self.engine) as session:
+			for i in range(count):
+				user = self.user(i)
+				names = [self.unique("fresh tag") for _ in range(tags_per_request)]
+				tag_ids = seed_tags(session, user.id, names)
+				# The tagged notes stay out of user.note_ids so other scenarios
+				# keep working on the seeded layout.
+				seed_notes(session, SeededUser(user.id, user.username, tag_ids=tag_ids), 3, tags_per_request, self.rng)
+				prepared.append((user, [tag_ids[name] for name in names]))
+			session.commit()
+		return prepared
+
+@dataclass
+class Scenario:
+	name: str
+	# Returns (method, url, httpx keyword arguments) for request i.
+	build: Callable[[Fixture, int, object], tuple]
+	prepare: Callable[[Fixture, int], list] | None = None
+
+def note_request(method: str, path: str, **extra):
+	def build(fixture: Fixture, i: int, prepared) -> tuple:
+		user = fixture.user(i)
+		note_id = fixture.rng.choice(user.note_ids)
+		return method, path, {"params": {"note_id": note_id}, "headers": fixture.headers(user), **extra}
+	return build
+
+def user_request(method: str, path: str, **extra):
+	def build(fixture: Fixture, i: int, prepared) -> tuple:
+		user = fixture.user(i)
+		return method, path, {"headers": fixture.headers(user), **extra}
+	return build
+
+def new_notes(fixture: Fixture, count: int) -> list[dict]:
+	return [{"content": " ".join(fixture.rng.choices(WORDS, k=20)), "categories": ["tag 0", fixture.unique("new tag")]}
+			for _ in range(count)]
+
+SCENARIOS = [
+	Scenario("health", lambda f, i, p: ("GET", "/", {})),
+	Scenario("create_user", lambda f, i, p: ("POST", "/users/create",
+											 {"json": {"username": f.unique("new user"), "password": PASSWORD}})),
+	Scenario("login", lambda f, i, p: ("POST", "/users/login",
+									   {"data": {"grant_type": "password", "username": f.user(i).username, "password": PASSWORD}})),
+	Scenario("logout", lambda f, i, p: ("POST", "/users/logout", {"headers": {"Authorization": f"Bearer {p}"}}),
+			 lambda f, count: [create_access_token(f.user(i).username, f.user(i).id, timedelta(hours=1)) for i in range(count)]),
+	Scenario("create_note", lambda f, i, p: ("POST", "/notes/", {"json": new_notes(f, 1)[0], "headers": f.headers(f.user(i))})),
+	Scenario("list_notes", user_request("GET", "/notes/", params={"limit": 100})),
+	Scenario("list_all_notes", user_request("GET", "/notes/")),
+	Scenario("stream_notes", user_request("GET", "/notes/", params={"stream": "true"})),
+	Scenario("delta_sync", lambda f, i, p: ("GET", "/notes/", {
+		"params": {"since": (datetime.now(timezone.utc) - timedelta(seconds=5)).isoformat()},
+		"headers": f.headers(f.user(i))})),
+	Scenario("search", lambda f, i, p: ("GET", "/notes/search", {
+		"params": {"q": f.rng.choice(WORDS), "limit": 20}, "headers": f.headers(f.user(i))})),
+	Scenario("update_content", note_request("PATCH", "/notes/", json={"content": "updated by the load test"})),
+	Scenario("toggle_archived", note_request("PATCH", "/notes/archived")),
+	# Fresh notes, so every patch names the revision it was made against.
+	Scenario("patch_content", lambda f, i, p: ("PATCH", "/notes/diff", {
+		"params": {"note_id": p[1][0]}, "json": {"base_revision": 0, "ops": [{"offset": 0, "delete": 1, "insert": "P"}]},
+		"headers": f.headers(p[0])}),
+			 lambda f, count: f.fresh_notes(count)),
+	Scenario("get_categories", note_request("GET", "/notes/categories")),
+	Scenario("add_category", lambda f, i, p: ("POST", "/notes/categories", {
+		"params": {"note_id": f.rng.choice(f.user(i).note_ids), "name": "tag 1"}, "headers": f.headers(f.user(i))})),
+	Scenario("rename_category", lambda f, i, p: ("PATCH", "/notes/categories", {
+		"params": {"category_id": p[1], "new_name": "tag 2"}, "headers": f.headers(p[0])}),
+			 lambda f, count: f.fresh_categories(count)),
+	Scenario("delete_category", lambda f, i, p: ("DELETE", "/notes/categories", {
+		"params": {"category_id": p[1]}, "headers": f.headers(p[0])}),
+			 lambda f, count: f.fresh_categories(count)),
+	Scenario("filter_by_name", user_request("GET", "/notes/categories/filterbyname", params={"name": "tag 1", "limit": 100})),
+	Scenario("batch_create", lambda f, i, p: ("POST", "/notes/batch", {
+		"json": {"notes": new_notes(f, 10)}, "headers": f.headers(f.user(i))})),
+	Scenario("batch_archive", lambda f, i, p: ("PATCH", "/notes/batch/archived", {
+		"json": {"note_ids": f.rng.sample(f.user(i).note_ids, 10), "is_archived": True}, "headers": f.headers(f.user(i))})),
+	Scenario("batch_retag", lambda f, i, p: ("PUT", "/notes/batch/categories", {
+		"json": {"notes": [{"note_id": note_id, "categories": ["tag 3", "tag 4"]} for note_id in f.rng.sample(f.user(i).note_ids, 10)]},
+		"headers": f.headers(f.user(i))})),
+	Scenario("export_notes", user_request("GET", "/notes/export")),
+	Scenario("import_notes", lambda f, i, p: ("POST", "/notes/import", {
+		"content": "".join(json.dumps(note) + "\n" for note in new_notes(f, 10)), "headers": f.headers(f.user(i))})),
+	Scenario("list_tags", user_request("GET", "/tags/")),
+	Scenario("rename_tag", lambda f, i, p: ("PATCH", "/tags/", {
+		"params": {"tag_id": p[1][0], "new_name": f.unique("renamed tag")}, "headers": f.headers(p[0])}),
+			 lambda f, count: f.fresh_tags(count, 1)),
+	Scenario("merge_tags", lambda f, i, p: ("POST", "/tags/merge", {
+		"params": {"source_id": p[1][0], "target_id": p[1][1]}, "headers": f.headers(p[0])}),
+			 lambda f, count: f.fresh_tags(count, 2)),
+	Scenario("delete_note", lambda f, i, p: ("DELETE", "/notes/", {
+		"params": {"note_id": p[1][0]}, "headers": f.headers(p[0])}),
+			 lambda f, count: f.fresh_notes(count)),
+	Scenario("batch_delete", lambda f, i, p: ("DELETE", "/notes/batch", {
+		"json": {"note_ids": p[1]}, "headers": f.headers(p[0])}),
+			 lambda f, count: f.fresh_notes(count, notes_per_request=10)),
+]
+if settings.METRICS_ENABLED:
+	SCENARIOS.append(Scenario("metrics", lambda f, i, p: ("GET", "/metrics", {})))
+
+def percentile(values: list[float], p: float) -> float:
+	# Nearest-rank percentile over sorted values.
+	return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+async def run_scenario(client: httpx.AsyncClient, fixture: Fixture, scenario: Scenario,
+					   requests: int, concurrency: int, statements: list[int]) -> dict:
+	# Every run draws from its own random stream and starts with a cold note
+	# cache, so a run does the same work whichever scenarios ran before it.
+	fixture.rng = random.Random(f"{fixture.seed}:{scenario.name}:{concurrency}")
+	prepared = scenario.prepare(fixture, requests) if scenario.prepare else [None] * requests
+	note_cache.clear()
+	latencies = []
+	errors = 0
+	pending = iter(range(requests))
+	async def client_loop():
+		nonlocal errors
+		for i in pending:
+			method, url, kwargs = scenario.build(fixture, i, prepared[i])
+			start = time.perf_counter()
+			response = await client.request(method, url, **kwargs)
+			latencies.append(time.perf_counter() - start)
+			if response.status_code >= 400:
+				errors += 1
+	statements[0] = 0
+	start = time.perf_counter()
+	await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+	elapsed = time.perf_counter() - start
+	latencies.sort()
+	return {
+		"requests": requests,
+		"errors": errors,
+		"rps": round(requests / elapsed, 1),
+		"p50_ms": round(percentile(latencies, 50) * 1000, 3),
+		"p95_ms": round(percentile(latencies, 95) * 1000, 3),
+		"p99_ms": round(percentile(latencies, 99) * 1000, 3),
+		"queries_per_request": round(statements[0] / requests, 2),
+	}
+
+async def run(args, fixture: Fixture, statements: list[int]) -> dict:
+	scenarios = [scenario for scenario in SCENARIOS if not args.only or scenario.name in args.only]
+	results = {}
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+		print(f"{'scenario':>16} {'clients':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'q/req':>6} {'errors':>6}")
+		for scenario in scenarios:
+			results[scenario.name] = {}
+			for concurrency in sorted({1, args.concurrency}):
+				result = await run_scenario(client, fixture, scenario, args.requests, concurrency, statements)
+				results[scenario.name][str(concurrency)] = result
+				print(f"{scenario.name:>16} {concurrency:>7} {result['rps']:>9.1f} {result['p50_ms']:>9.2f} "
+					  f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['queries_per_request']:>6.2f} {result['errors']:>6}")
+	return results
+
+def compare(baseline: dict, current: dict, latency_tolerance: float) -> list[str]:
+	# Latency is compared with a tolerance because it depends on the machine.
+	# Statement counts of single-client runs are deterministic, so any increase
+	# is reported, which is what catches an N+1.
+	regressions = []
+	if baseline["config"] != current["config"]:
+		regressions.append(f"config differs: baseline {baseline['config']}, current {current['config']}")
+		return regressions
+	for name, runs in baseline["results"].items():
+		for concurrency, old in runs.items():
+			new = current["results"].get(name, {}).get(concurrency)
+			if new is None:
+				continue
+			label = f"{name} ({concurrency} clients)"
+			if new["p95_ms"] > old["p95_ms"] * (1 + latency_tolerance):
+				regressions.append(f"{label}: p95 {old['p95_ms']} ms -> {new['p95_ms']} ms")
+			if concurrency == "1" and new["queries_per_request"] > old["queries_per_request"]:
+				regressions.append(f"{label}: {old['queries_per_request']} -> {new['queries_per_request']} statements per request")
+			if new["errors"] > old["errors"]:
+				regressions.append(f"{label}: {old['errors']} -> {new['errors']} errors")
+	return regressions
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Load test for the note API.")
+	parser.add_argument("--users", type=int, default=20)
+	parser.add_argument("--notes", type=int, default=200, help="notes per user")
+	parser.add_argument("--tags", type=int, default=20, help="distinct tags per user")
+	parser.add_argument("--tags-per-note", type=int, default=2)
+	parser.add_argument("--requests", type=int, default=100, help="requests per scenario and client count")
+	parser.add_argument("--concurrency", type=int, default=8)
+	# Seeded and newly created passwords use a low cost so the user routes do
+	# not dominate the run; pass the production cost to measure it.
+	parser.add_argument("--bcrypt-rounds", type=int, default=4)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--only", type=lambda value: value.split(","), default=None, help="comma separated scenarios")
+	parser.add_argument("--save", help="write results to this JSON baseline")
+	parser.add_argument("--compare", help="compare against this JSON baseline and exit 1 on regressions")
+	parser.add_argument("--latency-tolerance", type=float, default=1.0, help="allowed relative p95 increase")
+	return parser.parse_args()
+
+def main():
+	args = parse_args()
+	config = {key: getattr(args, key) for key in ("users", "notes", "tags", "tags_per_note", "requests",
+												   "concurrency", "bcrypt_rounds", "seed")}
+	with tempfile.TemporaryDirectory() as tmp:
+		engine = create_app_engine(f"sqlite:///{os.path.join(tmp, 'load_test.sqlite')}")
+		statements = [0]
+		@event.listens_for(engine, "after_cursor_execute")
+		def count_statement(conn, cursor, statement, parameters, context, executemany):
+			statements[0] += 1
+		users = seed_database(engine, args.users, args.notes, args.tags, args.tags_per_note,
+							  hash_password(PASSWORD, args.bcrypt_rounds), args.seed)
+		def get_load_test_session():
+			with Session(engine) as session:
+				yield session
+		app.dependency_overrides[get_db_session] = get_load_test_session
+		password_hasher.rounds = args.bcrypt_rounds
+		# Every simulated client shares one address and a few users, so the
+		# limiter would turn most of the run into 429s.
+		rate_limiter.enabled = False
+		try:
+			results = asyncio.run(run(args, Fixture(engine, users, args.seed), statements))
+		finally:
+			app.dependency_overrides.clear()
+			engine.dispose()
+	current = {"config": config, "results": results}
+	if args.save:
+		os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+		with open(args.save, "w") as baseline_file:
+			json.dump(current, baseline_file, indent=2)
+			baseline_file.write("\n")
+	if args.compare:
+		with open(args.compare) as baseline_file:
+			regressions = compare(json.load(baseline_file), current, args.latency_tolerance)
+		for regression in regressions:
+			print(f"REGRESSION {regression}")
+		if regressions:
+			sys.exit(1)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,67 @@
+# Fills a database with synthetic users, notes and tags through bulk inserts,
+# for benchmarks that need a realistic account layout.
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from sqlalchemy import Engine, insert, select
+from sqlmodel import SQLModel, Session
+from app.config.migrations import run_migrations
+from app.models.NoteModel import Note, Tag, NoteTag
+from app.models.UserModel import User
+
+WORDS = [f"word{i}" for i in range(2000)]
+
+@dataclass
+class SeededUser:
+	id: int
+	username: str
+	note_ids: list[int] = field(default_factory=list)
+	tag_ids: dict[str, int] = field(default_factory=dict)
+	category_ids: list[int] = field(default_factory=list)
+
+def create_schema(engine: Engine):
+	SQLModel.metadata.create_all(engine)
+	run_migrations(engine)
+
+def seed_tags(session: Session, user_id: int, names: list[str]) -> dict[str, int]:
+	if not names:
+		return {}
+	now = datetime.now(timezone.utc)
+	rows = [{"user_id": user_id, "name": name, "updated_at": now} for name in names]
+	return dict(session.execute(insert(Tag).returning(Tag.name, Tag.id), rows).all())
+
+def seed_notes(session: Session, user: SeededUser, count: int, tags_per_note: int, rng: random.Random) -> list[int]:
+	if count == 0:
+		return []
+	now = datetime.now(timezone.utc)
+	rows = [{"content": " ".join(rng.choices(WORDS, k=20)), "created_at": now, "updated_at": now,
+			 "is_archived": False, "user_id": user.id} for _ in range(count)]
+	note_ids = sorted(session.execute(insert(Note).returning(Note.id), rows).scalars())
+	names = list(user.tag_ids)
+	links = [{"note_id": note_id, "tag_id": user.tag_ids[name]}
+			 for note_id in note_ids
+			 for name in rng.sample(names, min(tags_per_note, len(names)))]
+	if links:
+		user.category_ids.extend(session.execute(insert(NoteTag).returning(NoteTag.id), links).scalars())
+	user.note_ids.extend(note_ids)
+	return note_ids
+
+def seed_database(engine: Engine,
+				  users: int,
+				  notes_per_user: int,
+				  tags_per_user: int,
+				  tags_per_note: int,
+				  password_hash: str,
+				  seed: int = 0) -> list[SeededUser]:
+	create_schema(engine)
+	rng = random.Random(seed)
+	seeded = []
+	with Session(engine) as session:
+		session.execute(insert(User), [{"username": f"user{i}", "password": password_hash} for i in range(users)])
+		for user_id, username in session.execute(select(User.id, User.username).order_by(User.id)):
+			user = SeededUser(user_id, username)
+			user.tag_ids = seed_tags(session, user_id, [f"tag {i}" for i in range(tags_per_user)])
+			seed_notes(session, user, notes_per_user, tags_per_note, rng)
+			seeded.append(user)
+		session.commit()
+	return seeded
@@ -0,0 +1,84 @@
+import os
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.main import app
+from app.utils.note_cache import note_cache
+from app.config.database import get_session
+
+client = TestClient(app)
+
+@pytest.fixture
+def set_up_async_test_database():
+	db_path = "testing_async.db"
+	engine = create_engine(f"sqlite:///{db_path}")
+	note_cache.clear()
+	SQLModel.metadata.create_all(engine)
+	engine.dispose()
+	# Every TestClient request runs on a new event loop, so connections are
+	# not pooled across requests.
+	async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+	async def get_async_session_override():
+		async with AsyncSession(async_engine) as session:
+			yield session
+	app.dependency_overrides[get_session] = get_async_session_override
+	yield async_engine
+	app.dependency_overrides.clear()
+	if os.path.exists(db_path):
+		os.remove(db_path)
+
+@pytest.fixture
+def set_up_access_token(set_up_async_test_database):
+	response = client.post(
+		"/users/create", json={"username": "1", "password": "1"}
+	)
+	assert response.status_code == 201
+	response = client.post(
+		"/users/login",
+		data={"grant_type": "password", "username": "1", "password": "1"},
+		headers={"Content-Type": "application/x-www-form-urlencoded"}
+	)
+	assert response.status_code == 200
+	yield response.json()["access_token"]
+
+def test_async_note_lifecycle(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	response = client.post("/notes", json={"content": "note", "categories": ["cat"]}, headers=headers)
+	assert response.status_code == 201
+	note_id = response.json()["note"]["id"]
+	response = client.patch("/notes", json={"content": "new"}, params={"note_id": note_id}, headers=headers)
+	assert response.status_code == 200
+	assert response.json()["updated"]["content"] == "new"
+	response = client.get("/notes", headers=headers)
+	assert response.status_code == 200
+	notes = response.json()["notes"]
+	assert notes[0]["content"] == "new"
+	assert notes[0]["categories"][0]["name"] == "cat"
+	response = client.get("/notes/categories/filterbyname", params={"name": "cat"}, headers=headers)
+	assert [note["id"] for note in response.json()["notes"]] == [note_id]
+	response = client.delete("/notes", params={"note_id": note_id}, headers=headers)
+	assert response.json()["deleted"]
+
+def test_async_notes_stream(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	for i in range(3):
+		response = client.post("/notes", json={"content": f"note {i}", "categories": ["cat"]}, headers=headers)
+		assert response.status_code == 201
+	response = client.get("/notes", params={"stream": True}, headers=headers)
+	assert response.status_code == 200
+	notes = [json.loads(line) for line in response.text.splitlines()]
+	assert [note["content"] for note in notes] == ["note 0", "note 1", "note 2"]
+	assert all(note["categories"][0]["name"] == "cat" for note in notes)
+
+def test_async_export_and_import(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	body = "".join(json.dumps({"content": f"note {i}", "categories": ["cat"]}) + "\n" for i in range(3))
+	response = client.post("/notes/import", content=body, headers=headers)
+	assert response.json() == {"imported": 3}
+	response = client.get("/notes/export", headers=headers)
+	records = [json.loads(line) for line in response.text.splitlines()]
+	assert [(record["content"], record["categories"]) for record in records] == [(f"note {i}", ["cat"]) for i in range(3)]
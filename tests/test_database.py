@@ -0,0 +1,104 @@
+import os
+import asyncio
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config.database import create_app_engine, to_async_url
+from app.config.replica import RoutingSession, replica_router
+from app.models.NoteModel import Note
+from app.schemas.NoteSchema import NoteSchema
+from app.services.AsyncNoteService import AsyncNoteService
+from app.services.NoteService import NoteService
+from app.utils.note_cache import note_cache
+from datetime import datetime, timezone
+
+@pytest.fixture
+def set_up_app_engine():
+	db_path = "testing_engine.db"
+	engine = create_app_engine(f"sqlite:///{db_path}")
+	yield engine
+	engine.dispose()
+	for suffix in ("", "-wal", "-shm"):
+		if os.path.exists(db_path + suffix):
+			os.remove(db_path + suffix)
+
+def pragma(connection, name):
+	return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+def test_engine_applies_sqlite_pragmas(set_up_app_engine):
+	with set_up_app_engine.connect() as connection:
+		assert pragma(connection, "journal_mode") == "wal"
+		assert pragma(connection, "synchronous") == 1
+		assert pragma(connection, "busy_timeout") == 5000
+		assert pragma(connection, "cache_size") == -65536
+		assert pragma(connection, "temp_store") == 2
+
+def test_engine_echo_off_by_default(set_up_app_engine):
+	assert set_up_app_engine.echo is False
+
+def test_engine_accepts_in_memory_sqlite():
+	for url in ("sqlite://", "sqlite:///:memory:"):
+		engine = create_app_engine(url)
+		SQLModel.metadata.create_all(engine)
+		with engine.connect() as connection:
+			assert connection.execute(text("SELECT count(*) FROM note")).scalar() == 0
+		engine.dispose()
+
+@pytest.fixture
+def set_up_primary_and_replica(monkeypatch):
+	# Two SQLite files stand in for a primary and its replica; "replication"
+	# is copying rows by hand.
+	paths = ["testing_primary.db", "testing_replica.db"]
+	engines = [create_app_engine(f"sqlite:///{path}") for path in paths]
+	for engine in engines:
+		SQLModel.metadata.create_all(engine)
+	note_cache.clear()
+	monkeypatch.setattr(replica_router, "last_writes", {})
+	yield engines
+	for engine in engines:
+		engine.dispose()
+	for path in paths:
+		for suffix in ("", "-wal", "-shm"):
+			if os.path.exists(path + suffix):
+				os.remove(path + suffix)
+
+def replicate(replica, **values):
+	now = datetime.now(timezone.utc)
+	with replica.begin() as connection:
+		connection.execute(Note.__table__.insert().values(user_id=1, is_archived=False, created_at=now, updated_at=now, **values))
+
+def listed_contents(session) -> list[str]:
+	notes = NoteService.get_notes.__wrapped__(NoteService(1, session))
+	return [note["content"] for note in notes]
+
+def test_routing_session_reads_listings_from_replica(set_up_primary_and_replica):
+	primary, replica = set_up_primary_and_replica
+	with RoutingSession(primary, replica=replica) as session:
+		note = NoteService(1, session).create_note(NoteSchema(content="first", categories=[]))
+		# Right after a write the user's reads stay on the primary.
+		assert listed_contents(session) == ["first"]
+		replica_router.last_writes.clear()
+		assert listed_contents(session) == []
+		assert NoteService(1, session).get_notes_version()[0] == 0
+		replicate(replica, id=note["id"], content="replicated")
+		assert listed_contents(session) == ["replicated"]
+		# Methods that are not marked as reads, and every write, use the primary.
+		assert NoteService(1, session).get_note_by_id(note["id"]).content == "first"
+		NoteService(1, session).update_content(note["id"], "second")
+	with primary.connect() as connection:
+		assert connection.execute(text("SELECT content FROM note")).scalars().all() == ["second"]
+
+def test_async_routing_session_reads_listings_from_replica(set_up_primary_and_replica):
+	primary, replica = set_up_primary_and_replica
+	replicate(replica, content="replicated")
+	async def list_notes():
+		engines = [create_async_engine(to_async_url(str(engine.url)), poolclass=NullPool) for engine in (primary, replica)]
+		async with AsyncSession(engines[0], sync_session_class=RoutingSession, replica=engines[1].sync_engine) as session:
+			notes = await AsyncNoteService(1, session).get_notes()
+		for engine in engines:
+			await engine.dispose()
+		return [note["content"] for note in notes]
+	assert asyncio.run(list_notes()) == ["replicated"]
@@ -0,0 +1,33 @@
+import asyncio
+import pytest
+from threading import Event
+from fastapi import HTTPException
+from app.utils.hash_password import PasswordHasher, hash_password, verify_password
+
+def test_hash_password_uses_configured_rounds():
+	hashed = hash_password("secret", rounds=4)
+	assert hashed.startswith("$2b$04$")
+	assert verify_password("secret", hashed)
+	assert not verify_password("wrong", hashed)
+
+def test_password_hasher_runs_on_pool():
+	hasher = PasswordHasher(workers=2, max_pending=4, rounds=4)
+	async def hash_and_verify():
+		hashed = await hasher.hash("secret")
+		return await hasher.verify("secret", hashed)
+	assert asyncio.run(hash_and_verify())
+
+def test_password_hasher_rejects_when_full():
+	hasher = PasswordHasher(workers=1, max_pending=1, rounds=4)
+	release = Event()
+	async def saturate():
+		blocked = asyncio.ensure_future(hasher.run(release.wait))
+		await asyncio.sleep(0)
+		with pytest.raises(HTTPException) as error:
+			await hasher.hash("secret")
+		release.set()
+		await blocked
+		return error.value
+	error = asyncio.run(saturate())
+	assert error.status_code == 503
+	assert error.headers["Retry-After"] == "1"
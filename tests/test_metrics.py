@@ -0,0 +1,68 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, create_engine, Session
+from app.main import app
+from app.config.database import get_session
+from app.utils.metrics import Histogram, metrics, instrument_engine
+from app.utils.note_cache import note_cache
+from app.utils.token_manager import token_cache
+
+client = TestClient(app)
+
+@pytest.fixture
+def set_up_instrumented_database():
+	db_path = "testing_metrics.db"
+	engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+	instrument_engine(engine)
+	SQLModel.metadata.create_all(engine)
+	note_cache.clear()
+	token_cache.clear()
+	metrics.clear()
+	with Session(engine) as session:
+		app.dependency_overrides[get_session] = lambda: session
+		yield session
+	app.dependency_overrides.clear()
+	engine.dispose()
+	if os.path.exists(db_path):
+		os.remove(db_path)
+
+def metric_value(text: str, sample: str) -> float:
+	for line in text.splitlines():
+		if line.startswith(sample + " "):
+			return float(line.rsplit(" ", 1)[1])
+	raise AssertionError(f"{sample} not in /metrics")
+
+def test_histogram_buckets_are_cumulative():
+	histogram = Histogram((1, 5))
+	for value in (0.5, 3, 3, 10):
+		histogram.observe(value)
+	assert list(histogram.samples()) == [("1", 1), ("5", 3), ("+Inf", 4)]
+	assert histogram.sum == 16.5
+
+def test_metrics_endpoint(set_up_instrumented_database):
+	client.post("/users/create", json={"username": "1", "password": "1"})
+	response = client.post("/users/login", data={"grant_type": "password", "username": "1", "password": "1"},
+						   headers={"Content-Type": "application/x-www-form-urlencoded"})
+	headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+	client.post("/notes", json={"content": "note", "categories": ["cat"]}, headers=headers)
+	client.get("/notes", headers=headers)
+	client.get("/notes", params={"note_id": 1}, headers=headers)
+	client.get("/does-not-exist")
+	response = client.get("/metrics")
+	assert response.status_code == 200
+	assert response.headers["content-type"].startswith("text/plain")
+	text = response.text
+	assert metric_value(text, 'notapp_request_duration_seconds_count{method="GET",route="/notes/",status="200"}') == 2
+	assert metric_value(text, 'notapp_request_duration_seconds_count{method="GET",route="unmatched",status="404"}') == 1
+	# A cache miss lists the notes, loads their categories and reads the
+	# version for the ETag; the second listing is served from note_cache.
+	assert metric_value(text, 'notapp_request_db_queries_sum{method="GET",route="/notes/"}') == 4
+	assert metric_value(text, 'notapp_request_db_queries_count{method="GET",route="/notes/"}') == 2
+	assert metric_value(text, 'notapp_operation_duration_seconds_count{operation="bcrypt_hash"}') == 1
+	assert metric_value(text, 'notapp_operation_duration_seconds_count{operation="bcrypt_verify"}') == 1
+	assert metric_value(text, 'notapp_operation_duration_seconds_count{operation="jwt_decode"}') == 1
+	# RateLimitMiddleware resolves the token on each of the three requests and
+	# their /notes -> /notes/ redirects, the routes then hit the cache.
+	assert metric_value(text, "notapp_token_cache_hits") == 8
+	assert "notapp_note_cache_hit_rate" in text
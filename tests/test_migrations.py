@@ -0,0 +1,88 @@
+import os
+import pytest
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel, create_engine
+from app.config.migrations import run_migrations, MIGRATIONS
+import app.models.NoteModel
+import app.models.UserModel
+
+LEGACY_SCHEMA = [
+	"CREATE TABLE user (id INTEGER NOT NULL PRIMARY KEY, username VARCHAR NOT NULL, password VARCHAR NOT NULL)",
+	"CREATE TABLE note (id INTEGER NOT NULL PRIMARY KEY, content VARCHAR NOT NULL, created_at DATETIME NOT NULL, "
+	"updated_at DATETIME NOT NULL, is_archived BOOLEAN NOT NULL, user_id INTEGER REFERENCES user (id))",
+	"CREATE TABLE category (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR NOT NULL, note_id INTEGER REFERENCES note (id))",
+]
+
+@pytest.fixture
+def set_up_empty_database():
+	db_path = "testing_migrations.db"
+	engine = create_engine(f"sqlite:///{db_path}")
+	yield engine
+	engine.dispose()
+	if os.path.exists(db_path):
+		os.remove(db_path)
+
+@pytest.fixture
+def set_up_legacy_database(set_up_empty_database):
+	engine = set_up_empty_database
+	with engine.begin() as connection:
+		for statement in LEGACY_SCHEMA:
+			connection.execute(text(statement))
+	yield engine
+
+def index_names(engine, table):
+	return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+def test_migrations_add_indexes_to_legacy_database(set_up_legacy_database):
+	engine = set_up_legacy_database
+	assert index_names(engine, "note") == set()
+	applied = run_migrations(engine)
+	assert applied == [version for version, _ in MIGRATIONS]
+	assert index_names(engine, "note") == {"ix_note_user_id", "ix_note_user_id_is_archived_updated_at",
+										   "ix_note_user_id_is_archived_created_at", "ix_note_user_id_updated_at",
+										   "ix_note_user_id_created_at"}
+	assert "category" not in inspect(engine).get_table_names()
+	assert index_names(engine, "note_tag") == {"ix_note_tag_tag_id_note_id"}
+	assert index_names(engine, "user") == {"ix_user_username"}
+	assert "note_fts" in inspect(engine).get_table_names()
+	assert "revision" in {column["name"] for column in inspect(engine).get_columns("note")}
+	assert run_migrations(engine) == []
+
+def test_search_migration_indexes_existing_notes(set_up_legacy_database):
+	engine = set_up_legacy_database
+	with engine.begin() as connection:
+		connection.execute(text("INSERT INTO note (content, created_at, updated_at, is_archived, user_id) "
+								"VALUES ('old note', '2024-01-01', '2024-01-01', 0, 1)"))
+	run_migrations(engine)
+	with engine.connect() as connection:
+		matches = connection.execute(text("SELECT rowid FROM note_fts WHERE note_fts MATCH 'old'")).all()
+	assert matches == [(1,)]
+
+def test_tag_migration_moves_categories(set_up_legacy_database):
+	engine = set_up_legacy_database
+	with engine.begin() as connection:
+		connection.execute(text("INSERT INTO note (id, content, created_at, updated_at, is_archived, user_id) VALUES "
+								"(1, 'a', '2024-01-01', '2024-01-01', 0, 1), (2, 'b', '2024-01-01', '2024-01-01', 0, 1), "
+								"(3, 'c', '2024-01-01', '2024-01-01', 0, 2)"))
+		connection.execute(text("INSERT INTO category (id, name, note_id) VALUES "
+								"(10, 'cat', 1), (11, 'cat', 2), (12, 'dog', 2), (13, 'dog', 2), (14, 'cat', 3)"))
+	run_migrations(engine)
+	with engine.connect() as connection:
+		tags = connection.execute(text("SELECT user_id, name FROM tag ORDER BY user_id, name")).all()
+		links = connection.execute(text("SELECT note_tag.id, note_id, name FROM note_tag "
+										"JOIN tag ON tag.id = tag_id ORDER BY note_tag.id")).all()
+	assert tags == [(1, "cat"), (1, "dog"), (2, "cat")]
+	assert links == [(10, 1, "cat"), (11, 2, "cat"), (12, 2, "dog"), (14, 3, "cat")]
+
+def test_migrations_on_fresh_database(set_up_empty_database):
+	engine = set_up_empty_database
+	SQLModel.metadata.create_all(engine)
+	assert run_migrations(engine) == [version for version, _ in MIGRATIONS]
+	assert "ix_user_username" in index_names(engine, "user")
+
+def test_login_lookup_uses_username_index(set_up_legacy_database):
+	engine = set_up_legacy_database
+	run_migrations(engine)
+	with engine.connect() as connection:
+		plan = connection.execute(text("EXPLAIN QUERY PLAN SELECT * FROM user WHERE username = 'a'")).all()
+	assert "ix_user_username" in plan[0][-1]
@@ -0,0 +1,59 @@
+import time
+from app.utils.note_cache import MemoryCache, NoteCache
+
+class FakeRedis:
+	def __init__(self):
+		self.data = {}
+
+	def get(self, key):
+		value = self.data.get(key)
+		if value is None or (value[1] is not None and value[1] <= time.monotonic()):
+			return None
+		return value[0]
+
+	def set(self, key, value, ex=None):
+		self.data[key] = (value, time.monotonic() + ex if ex else None)
+
+	def delete(self, *keys):
+		for key in keys:
+			self.data.pop(key, None)
+
+def test_memory_cache_evicts_least_recently_used():
+	cache = MemoryCache(max_size=2)
+	cache.set("a", b"1")
+	cache.set("b", b"2")
+	cache.get("a")
+	cache.set("c", b"3")
+	assert cache.get("b") is None
+	assert cache.get("a") == b"1"
+
+def test_memory_cache_expires_entries():
+	cache = MemoryCache(max_size=2)
+	cache.set("a", b"1", ex=-1)
+	assert cache.get("a") is None
+
+def test_note_cache_with_redis_compatible_backend():
+	cache = NoteCache(FakeRedis(), ttl=60)
+	loads = []
+	def load(user_id):
+		loads.append(user_id)
+		return [{"id": user_id}]
+	assert cache.get_or_load(1, "get_notes", (), lambda: load(1)) == [{"id": 1}]
+	assert cache.get_or_load(1, "get_notes", (), lambda: load(1)) == [{"id": 1}]
+	assert cache.get_or_load(2, "get_notes", (), lambda: load(2)) == [{"id": 2}]
+	cache.invalidate(1)
+	cache.get_or_load(1, "get_notes", (), lambda: load(1))
+	cache.get_or_load(2, "get_notes", (), lambda: load(2))
+	assert loads == [1, 2, 1]
+	assert cache.stats() == {"hits": 2, "misses": 3, "invalidations": 1, "hit_rate": 0.4}
+
+def test_note_cache_keys_include_arguments():
+	cache = NoteCache(MemoryCache(max_size=10), ttl=60)
+	assert cache.get_or_load(1, "get_notes", ((2, None), {}), lambda: ["first page"]) == ["first page"]
+	assert cache.get_or_load(1, "get_notes", ((2, 5), {}), lambda: ["second page"]) == ["second page"]
+
+def test_note_cache_disabled():
+	cache = NoteCache(None, ttl=60)
+	assert cache.get_or_load(1, "get_notes", (), lambda: [1]) == [1]
+	cache.invalidate(1)
+	assert cache.stats()["hits"] == 0
@@ -1,10 +1,19 @@
 from fastapi import status
 from fastapi.testclient import TestClient
 from app.main import app
+from app.utils.note_cache import note_cache
 import pytest
 import os
+import json
+import itertools
+from datetime import datetime, timezone
 from app.config.database import get_session
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
+from app.models.NoteModel import Note, Tag, NoteTag
+from app.schemas.NoteFilterSchema import NoteFilterSchema
+from app.services.NoteService import NoteService
+from app.services.TagService import TagService
 
 client = TestClient(app)
 
@@ -14,6 +23,7 @@ def set_up_test_database():
 	engine = create_engine(
 		f"sqlite:///{db_path}", connect_args={"check_same_thread": False}
 	)
+	note_cache.clear()
 	SQLModel.metadata.create_all(engine) 
 	with Session(engine) as session:
 		def get_session_override():
@@ -25,6 +35,16 @@ def set_up_test_database():
 	if os.path.exists(db_path):
 		os.remove(db_path)  
 		
+@pytest.fixture
+def count_statements(set_up_test_database):
+	statements = []
+	engine = set_up_test_database.get_bind()
+	def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+		statements.append(statement)
+	event.listen(engine, "before_cursor_execute", before_cursor_execute)
+	yield statements
+	event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
 @pytest.fixture
 def set_up_new_user(set_up_test_database):
 	username = "1"
@@ -126,6 +146,78 @@ def test_get_notes(set_up_new_note):
 	data = response.json()
 	assert data["notes"][0]["id"] == note_id
 
+def test_get_notes_statement_count(set_up_access_token, count_statements):
+	token = set_up_access_token
+	for i in range(5):
+		response = client.post(
+			"/notes", json={"content": f"note {i}", "categories": ["cat", "dog"]},
+			headers={
+				"Authorization": f"Bearer {token}",
+			}
+		)
+		assert response.status_code == 201
+	count_statements.clear()
+	response = client.get(
+		"/notes",
+		headers={
+			"Authorization": f"Bearer {token}"
+		}
+	)
+	assert response.status_code == 200
+	data = response.json()
+	assert len(data["notes"]) == 5
+	assert all(len(note["categories"]) == 2 for note in data["notes"])
+	assert len(count_statements) == 3
+
+def test_get_notes_paginated(set_up_access_token):
+	token = set_up_access_token
+	for i in range(5):
+		response = client.post(
+			"/notes", json={"content": f"note {i}", "categories": ["cat"]},
+			headers={
+				"Authorization": f"Bearer {token}",
+			}
+		)
+		assert response.status_code == 201
+	contents = []
+	cursor = None
+	while True:
+		params = {"limit": 2}
+		if cursor is not None:
+			params["cursor"] = cursor
+		response = client.get(
+			"/notes",
+			params=params,
+			headers={
+				"Authorization": f"Bearer {token}"
+			}
+		)
+		assert response.status_code == 200
+		data = response.json()
+		assert len(data["notes"]) <= 2
+		contents += [note["content"] for note in data["notes"]]
+		cursor = data["next_cursor"]
+		if cursor is None:
+			break
+	assert contents == [f"note {i}" for i in range(5)]
+
+def test_get_notes_stream(set_up_new_note):
+	token, note_id = set_up_new_note
+	response = client.get(
+		"/notes",
+		params={"stream": True},
+		headers={
+			"Authorization": f"Bearer {token}"
+		}
+	)
+	assert response.status_code == 200
+	assert response.headers["content-type"] == "application/x-ndjson"
+	lines = response.text.splitlines()
+	assert len(lines) == 1
+	note = json.loads(lines[0])
+	assert note["id"] == note_id
+	assert note["categories"][0]["name"] == "cat"
+
 def test_get_notes_unauthorized(set_up_new_note):
 	response = client.get(
 		"/notes",
@@ -379,4 +471,457 @@ def test_category_filter_by_name(set_up_new_note):
 			"Authorization": f"Bearer ###"
 		}
 	)
-	assert response.status_code == 401
\ No newline at end of file
+	assert response.status_code == 401
+
+def test_filter_notes_by_category_name(set_up_new_note, count_statements):
+	token, note_id = set_up_new_note
+	response = client.post(
+		"/notes", json={"content": "other", "categories": ["dog"]},
+		headers={
+			"Authorization": f"Bearer {token}",
+		}
+	)
+	assert response.status_code == 201
+	count_statements.clear()
+	response = client.get(
+		"/notes/categories/filterbyname",
+		params={"name": "cat"},
+		headers={
+			"Authorization": f"Bearer {token}"
+		}
+	)
+	assert response.status_code == 200
+	data = response.json()
+	assert [note["id"] for note in data["notes"]] == [note_id]
+	assert len(count_statements) == 2
+
+def test_filter_notes_by_category_name_only_own_notes(set_up_test_database):
+	session = set_up_test_database
+	session.add(Note(content="mine", user_id=1, tag_links=[NoteTag(tag=Tag(user_id=1, name="cat"))]))
+	session.add(Note(content="theirs", user_id=2, tag_links=[NoteTag(tag=Tag(user_id=2, name="cat"))]))
+	session.commit()
+	notes = NoteService(1, session).get_categories_by_name("cat")
+	assert [note["content"] for note in notes] == ["mine"]
+
+def test_batch_note_operations(set_up_access_token, count_statements):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	notes = [{"content": f"note {i}", "categories": ["cat", f"tag {i}"]} for i in range(50)]
+	count_statements.clear()
+	response = client.post("/notes/batch", json={"notes": notes}, headers=headers)
+	assert response.status_code == 201
+	assert len(count_statements) == 4
+	results = response.json()["results"]
+	assert [note["content"] for note in results] == [note["content"] for note in notes]
+	assert [category["name"] for category in results[1]["categories"]] == ["cat", "tag 1"]
+	note_ids = [note["id"] for note in results]
+
+	count_statements.clear()
+	response = client.patch("/notes/batch/archived", json={"note_ids": note_ids[:10] + [999999], "is_archived": True}, headers=headers)
+	assert response.status_code == 200
+	assert len(count_statements) == 1
+	results = response.json()["results"]
+	assert all(result["updated"] for result in results[:10])
+	assert results[10] == {"id": 999999, "updated": False}
+
+	count_statements.clear()
+	response = client.put("/notes/batch/categories", json={"notes": [{"note_id": note_ids[0], "categories": ["dog"]}]}, headers=headers)
+	assert response.status_code == 200
+	assert len(count_statements) == 6
+	assert response.json()["results"][0]["categories"][0]["name"] == "dog"
+
+	count_statements.clear()
+	response = client.request("DELETE", "/notes/batch", json={"note_ids": note_ids[:25]}, headers=headers)
+	assert response.status_code == 200
+	assert len(count_statements) == 4
+	assert all(result["deleted"] for result in response.json()["results"])
+
+	response = client.get("/notes", headers=headers)
+	notes = response.json()["notes"]
+	assert len(notes) == 25
+	assert sum(note["is_archived"] for note in notes) == 0
+	response = client.get("/notes/categories/filterbyname", params={"name": "dog"}, headers=headers)
+	assert response.json()["notes"] == []
+
+@pytest.mark.parametrize("method, path, params, body, expected_statements", [
+	("POST", "/notes", {}, {"content": "note", "categories": ["a", "b"]}, 4),
+	("PATCH", "/notes", {"note_id": "{note_id}"}, {"content": "new"}, 1),
+	("PATCH", "/notes/archived", {"note_id": "{note_id}"}, None, 1),
+	("DELETE", "/notes", {"note_id": "{note_id}"}, None, 4),
+	("POST", "/notes/categories", {"note_id": "{note_id}", "name": "dog"}, None, 4),
+	("PATCH", "/notes/categories", {"category_id": "{category_id}", "new_name": "dog"}, None, 7),
+	("DELETE", "/notes/categories", {"category_id": "{category_id}"}, None, 3),
+])
+def test_write_statement_count(set_up_new_note, count_statements, method, path, params, body, expected_statements):
+	token, note_id = set_up_new_note
+	headers = {"Authorization": f"Bearer {token}"}
+	category_id = client.get("/notes/categories", params={"note_id": note_id}, headers=headers).json()["categories"][0]["id"]
+	params = {key: value.format(note_id=note_id, category_id=category_id) for key, value in params.items()}
+	count_statements.clear()
+	response = client.request(method, path, params=params, json=body, headers=headers)
+	assert response.status_code in (200, 201)
+	assert len(count_statements) == expected_statements
+
+def test_write_on_other_users_note(set_up_test_database):
+	session = set_up_test_database
+	session.add(Note(content="theirs", user_id=2, tag_links=[NoteTag(tag=Tag(user_id=2, name="cat"))]))
+	session.commit()
+	note_service = NoteService(1, session)
+	note = NoteService(2, session).get_notes()[0]
+	category_id = note["categories"][0]["id"]
+	assert not note_service.update_content(note["id"], "mine")
+	assert not note_service.update_archived_status(note["id"])
+	assert not note_service.add_category(note["id"], "dog")
+	assert not note_service.update_category_by_category_id(category_id, "dog")
+	assert not note_service.delete_category_by_category_id(category_id)
+	assert not note_service.delete_note(note["id"])
+	assert NoteService(2, session).get_notes()[0]["content"] == "theirs"
+
+def test_search_notes(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	notes = [{"content": content, "categories": []} for content in
+			 ["shopping list: apples and pears", "meeting notes about apple pie", "nothing to see"]]
+	response = client.post("/notes/batch", json={"notes": notes}, headers=headers)
+	note_ids = [note["id"] for note in response.json()["results"]]
+	response = client.get("/notes/search", params={"q": "appl*"}, headers=headers)
+	assert response.status_code == 200
+	assert sorted(note["id"] for note in response.json()["notes"]) == note_ids[:2]
+	response = client.get("/notes/search", params={"q": "apple pie"}, headers=headers)
+	notes = response.json()["notes"]
+	assert [note["id"] for note in notes] == [note_ids[1]]
+	assert "[apple] [pie]" in notes[0]["snippet"]
+	client.patch("/notes", json={"content": "pears only"}, params={"note_id": note_ids[1]}, headers=headers)
+	client.delete("/notes", params={"note_id": note_ids[0]}, headers=headers)
+	response = client.get("/notes/search", params={"q": "pears"}, headers=headers)
+	assert [note["id"] for note in response.json()["notes"]] == [note_ids[1]]
+	response = client.get("/notes/search", params={"q": "\"unbalanced ("}, headers=headers)
+	assert response.status_code == 200
+	assert response.json()["notes"] == []
+
+def test_search_notes_only_own_notes(set_up_test_database):
+	session = set_up_test_database
+	session.add(Note(content="shared word", user_id=1))
+	session.add(Note(content="shared word", user_id=2))
+	session.commit()
+	notes = NoteService(1, session).search_notes("shared")
+	assert [note["user_id"] for note in notes] == [1]
+
+def test_get_notes_etag(set_up_new_note, count_statements):
+	token, note_id = set_up_new_note
+	headers = {"Authorization": f"Bearer {token}"}
+	response = client.get("/notes", headers=headers)
+	etag = response.headers["etag"]
+	count_statements.clear()
+	response = client.get("/notes", headers={**headers, "If-None-Match": etag})
+	assert response.status_code == 304
+	assert response.headers["etag"] == etag
+	assert len(count_statements) == 1
+	response = client.get("/notes", params={"limit": 1}, headers={**headers, "If-None-Match": etag})
+	assert response.status_code == 200
+	client.patch("/notes/archived", params={"note_id": note_id}, headers=headers)
+	response = client.get("/notes", headers={**headers, "If-None-Match": etag})
+	assert response.status_code == 200
+	assert response.headers["etag"] != etag
+
+def test_get_notes_since(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	notes = [{"content": f"note {i}", "categories": ["cat"]} for i in range(3)]
+	response = client.post("/notes/batch", json={"notes": notes}, headers=headers)
+	note_ids = [note["id"] for note in response.json()["results"]]
+	since = datetime.now(timezone.utc).isoformat()
+	client.post("/notes/categories", params={"note_id": note_ids[0], "name": "dog"}, headers=headers)
+	client.delete("/notes", params={"note_id": note_ids[1]}, headers=headers)
+	response = client.get("/notes", params={"since": since}, headers=headers)
+	assert response.status_code == 200
+	data = response.json()
+	assert [note["id"] for note in data["notes"]] == [note_ids[0]]
+	assert data["deleted"] == [note_ids[1]]
+
+def test_get_notes_cached_until_write(set_up_new_note, count_statements):
+	token, note_id = set_up_new_note
+	headers = {"Authorization": f"Bearer {token}"}
+	client.get("/notes", headers=headers)
+	count_statements.clear()
+	response = client.get("/notes", headers=headers)
+	assert response.json()["notes"][0]["id"] == note_id
+	assert len(count_statements) == 1
+	client.patch("/notes", json={"content": "changed"}, params={"note_id": note_id}, headers=headers)
+	response = client.get("/notes", headers=headers)
+	assert response.json()["notes"][0]["content"] == "changed"
+	assert note_cache.stats()["hits"] >= 1
+
+def test_get_notes_cache_follows_etag(set_up_new_note):
+	token, note_id = set_up_new_note
+	headers = {"Authorization": f"Bearer {token}"}
+	etag = client.get("/notes", headers=headers).headers["etag"]
+	# A write from another worker: the database changes but this process's
+	# cache is not invalidated.
+	session = app.dependency_overrides[get_session]()
+	session.connection().exec_driver_sql(
+		"UPDATE note SET content = 'elsewhere', updated_at = '2100-01-01 00:00:00' WHERE id = ?", (note_id,))
+	session.commit()
+	response = client.get("/notes", headers={**headers, "If-None-Match": etag})
+	assert response.status_code == 200
+	assert response.headers["etag"] != etag
+	assert response.json()["notes"][0]["content"] == "elsewhere"
+
+def test_categories_share_one_tag(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	notes = [{"content": f"note {i}", "categories": ["cat", "cat"]} for i in range(3)]
+	response = client.post("/notes/batch", json={"notes": notes}, headers=headers)
+	results = response.json()["results"]
+	assert all(len(note["categories"]) == 1 for note in results)
+	response = client.get("/tags", headers=headers)
+	assert response.status_code == 200
+	assert [(tag["name"], tag["note_count"]) for tag in response.json()["tags"]] == [("cat", 3)]
+	note_id = results[0]["id"]
+	category_id = client.post("/notes/categories", params={"note_id": note_id, "name": "dog"}, headers=headers).json()["added"]["id"]
+	response = client.patch("/notes/categories", params={"category_id": category_id, "new_name": "cat"}, headers=headers)
+	assert response.json()["updated"] == {"id": category_id, "name": "cat", "note_id": note_id}
+	response = client.get("/notes/categories", params={"note_id": note_id}, headers=headers)
+	assert response.json()["categories"] == [{"id": category_id, "name": "cat", "note_id": note_id}]
+
+def test_unused_tags_are_removed(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	notes = [{"content": "first", "categories": ["shared", "gone", "renamed"]},
+			 {"content": "second", "categories": ["shared", "kept"]}]
+	results = client.post("/notes/batch", json={"notes": notes}, headers=headers).json()["results"]
+	categories = {category["name"]: category["id"] for category in results[0]["categories"]}
+	def tag_names():
+		return [tag["name"] for tag in client.get("/tags", headers=headers).json()["tags"]]
+	client.delete("/notes/categories", params={"category_id": categories["gone"]}, headers=headers)
+	client.patch("/notes/categories", params={"category_id": categories["renamed"], "new_name": "new"}, headers=headers)
+	assert tag_names() == ["kept", "new", "shared"]
+	client.put("/notes/batch/categories", json={"notes": [{"note_id": results[1]["id"], "categories": ["shared"]}]}, headers=headers)
+	assert tag_names() == ["new", "shared"]
+	client.delete("/notes", params={"note_id": results[0]["id"]}, headers=headers)
+	assert tag_names() == ["shared"]
+
+def test_rename_tag(set_up_access_token, count_statements):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	notes = [{"content": f"note {i}", "categories": ["cat"]} for i in range(20)]
+	client.post("/notes/batch", json={"notes": notes}, headers=headers)
+	client.post("/notes", json={"content": "dog note", "categories": ["dog"]}, headers=headers)
+	response = client.get("/notes", headers=headers)
+	etag = response.headers["etag"]
+	since = datetime.now(timezone.utc).isoformat()
+	tag_id = client.get("/tags", headers=headers).json()["tags"][0]["id"]
+	count_statements.clear()
+	response = client.patch("/tags", params={"tag_id": tag_id, "new_name": "kitten"}, headers=headers)
+	assert response.status_code == 200
+	assert response.json()["updated"] == {"id": tag_id, "name": "kitten"}
+	assert len(count_statements) == 2
+	response = client.get("/notes", headers={**headers, "If-None-Match": etag})
+	assert response.status_code == 200
+	assert sum(note["categories"][0]["name"] == "kitten" for note in response.json()["notes"]) == 20
+	response = client.get("/notes", params={"since": since}, headers=headers)
+	assert len(response.json()["notes"]) == 20
+	response = client.patch("/tags", params={"tag_id": tag_id, "new_name": "dog"}, headers=headers)
+	assert response.status_code == 409
+	response = client.patch("/tags", params={"tag_id": 999999, "new_name": "bird"}, headers=headers)
+	assert response.status_code == 404
+
+def test_merge_tags(set_up_access_token, count_statements):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	notes = ([{"content": f"cat {i}", "categories": ["cat"]} for i in range(10)]
+			 + [{"content": f"both {i}", "categories": ["cat", "kitten"]} for i in range(5)])
+	client.post("/notes/batch", json={"notes": notes}, headers=headers)
+	tags = {tag["name"]: tag["id"] for tag in client.get("/tags", headers=headers).json()["tags"]}
+	count_statements.clear()
+	response = client.post("/tags/merge", params={"source_id": tags["kitten"], "target_id": tags["cat"]}, headers=headers)
+	assert response.status_code == 200
+	assert response.json()["merged"] == {"id": tags["cat"], "name": "cat"}
+	assert len(count_statements) == 4
+	response = client.get("/tags", headers=headers)
+	assert [(tag["name"], tag["note_count"]) for tag in response.json()["tags"]] == [("cat", 15)]
+	response = client.get("/notes/categories/filterbyname", params={"name": "cat"}, headers=headers)
+	assert len(response.json()["notes"]) == 15
+	response = client.post("/tags/merge", params={"source_id": tags["kitten"], "target_id": tags["cat"]}, headers=headers)
+	assert response.status_code == 404
+
+def test_tags_only_own_tags(set_up_test_database):
+	session = set_up_test_database
+	session.add(Note(content="mine", user_id=1, tag_links=[NoteTag(tag=Tag(user_id=1, name="cat"))]))
+	session.add(Note(content="theirs", user_id=2, tag_links=[NoteTag(tag=Tag(user_id=2, name="cat"))]))
+	session.commit()
+	tag_service = TagService(1, session)
+	their_tag_id = TagService(2, session).get_tags()[0]["id"]
+	my_tag_id = tag_service.get_tags()[0]["id"]
+	assert tag_service.get_tags() == [{"id": my_tag_id, "name": "cat", "note_count": 1}]
+	assert not tag_service.rename_tag(their_tag_id, "dog")
+	assert not tag_service.merge_tags(their_tag_id, my_tag_id)
+	assert not tag_service.merge_tags(my_tag_id, their_tag_id)
+	assert TagService(2, session).get_tags() == [{"id": their_tag_id, "name": "cat", "note_count": 1}]
+
+def test_export_and_import_notes(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	notes = [{"content": f"note {i}", "categories": ["cat", f"tag {i % 3}"]} for i in range(25)]
+	client.post("/notes/batch", json={"notes": notes}, headers=headers)
+	client.patch("/notes/archived", params={"note_id": 1}, headers=headers)
+	response = client.get("/notes/export", headers=headers)
+	assert response.status_code == 200
+	assert response.headers["content-type"] == "application/x-ndjson"
+	exported = response.text
+	records = [json.loads(line) for line in exported.splitlines()]
+	assert len(records) == 25
+	assert records[0]["is_archived"] is True
+	assert records[4] == {**records[4], "content": "note 4", "categories": ["cat", "tag 1"]}
+	assert "id" not in records[0]
+	# The body is sent in small pieces so lines arrive split across chunks.
+	body = exported.encode("utf-8")
+	response = client.post("/notes/import", content=(body[i:i + 7] for i in range(0, len(body), 7)), headers=headers)
+	assert response.status_code == 201
+	assert response.json() == {"imported": 25}
+	response = client.get("/notes/export", headers=headers)
+	reimported = [json.loads(line) for line in response.text.splitlines()[25:]]
+	assert [{**record, "updated_at": None} for record in reimported] == [{**record, "updated_at": None} for record in records]
+	response = client.get("/tags", headers=headers)
+	assert [(tag["name"], tag["note_count"]) for tag in response.json()["tags"]] == [
+		("cat", 50), ("tag 0", 18), ("tag 1", 16), ("tag 2", 16)]
+
+def test_imported_notes_reach_delta_sync(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	client.post("/notes", json={"content": "existing", "categories": []}, headers=headers)
+	since = datetime.now(timezone.utc).isoformat()
+	body = '{"content": "old", "created_at": "2024-01-01T00:00:00", "updated_at": "2024-01-01T00:00:00"}\n'
+	assert client.post("/notes/import", content=body, headers=headers).status_code == 201
+	response = client.get("/notes", params={"since": since}, headers=headers)
+	notes = response.json()["notes"]
+	assert [note["content"] for note in notes] == ["old"]
+	assert notes[0]["created_at"].startswith("2024-01-01")
+	assert not notes[0]["updated_at"].startswith("2024-01-01")
+
+def test_import_notes_rejects_invalid_line(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	body = '{"content": "first"}\n\n{"content": "second", "categories": ["cat"]}\n{"categories": []}\n'
+	response = client.post("/notes/import", content=body, headers=headers)
+	assert response.status_code == 422
+	assert response.json()["line"] == 4
+	assert response.json()["imported"] == 0
+	response = client.post("/notes/import", content=b'{"content": "' + b"x" * (2 * 1024 * 1024), headers=headers)
+	assert response.status_code == 413
+	assert client.get("/notes", headers=headers).json()["notes"] == []
+
+def test_get_notes_sparse_fields_and_summary(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	client.post("/notes", json={"content": "x" * 500, "categories": ["cat"]}, headers=headers)
+	response = client.get("/notes", params={"fields": "updated_at,categories"}, headers=headers)
+	note = response.json()["notes"][0]
+	assert list(note) == ["id", "updated_at", "categories"]
+	assert list(note["categories"][0]) == ["id", "name", "note_id"]
+	response = client.get("/notes", params={"summary": True}, headers=headers)
+	note = response.json()["notes"][0]
+	assert len(note["content"]) == 200
+	assert note["truncated"] is True
+	assert note["categories"] == [{"id": 1, "name": "cat"}]
+	response = client.get("/notes", params={"stream": True, "fields": "content", "summary": True}, headers=headers)
+	assert [json.loads(line) for line in response.text.splitlines()] == [{"id": 1, "content": "x" * 200, "truncated": True}]
+	response = client.get("/notes", params={"fields": "id,password"}, headers=headers)
+	assert response.status_code == 422
+
+def test_get_notes_compressed(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	response = client.get("/notes", headers={**headers, "Accept-Encoding": "gzip"})
+	assert "content-encoding" not in response.headers
+	assert response.headers["vary"] == "Accept-Encoding"
+	notes = [{"content": f"note {i}", "categories": ["cat"]} for i in range(50)]
+	client.post("/notes/batch", json={"notes": notes}, headers=headers)
+	response = client.get("/notes", headers={**headers, "Accept-Encoding": "gzip"})
+	assert response.headers["content-encoding"] == "gzip"
+	assert int(response.headers["content-length"]) < len(response.content) / 4
+	assert len(response.json()["notes"]) == 50
+	response = client.get("/notes", params={"stream": True}, headers={**headers, "Accept-Encoding": "gzip"})
+	assert response.headers["content-encoding"] == "gzip"
+	assert len(response.text.splitlines()) == 50
+	response = client.get("/notes", headers={**headers, "Accept-Encoding": "identity"})
+	assert "content-encoding" not in response.headers
+
+def test_get_notes_filters_and_sort(set_up_access_token):
+	headers = {"Authorization": f"Bearer {set_up_access_token}"}
+	notes = [{"content": f"note {i}", "categories": ["even" if i % 2 == 0 else "odd"]} for i in range(6)]
+	response = client.post("/notes/batch", json={"notes": notes}, headers=headers)
+	note_ids = [note["id"] for note in response.json()["results"]]
+	for note_id in note_ids[:2]:
+		client.patch("/notes/archived", params={"note_id": note_id}, headers=headers)
+	response = client.get("/notes", params={"archived": False, "tag": "even"}, headers=headers)
+	assert [note["id"] for note in response.json()["notes"]] == [note_ids[2], note_ids[4]]
+	# The archived notes were touched last, so they lead a newest-first listing.
+	response = client.get("/notes", params={"sort": "-updated_at"}, headers=headers)
+	assert [note["id"] for note in response.json()["notes"]][:2] == [note_ids[1], note_ids[0]]
+	pages = []
+	cursor = None
+	while True:
+		params = {"sort": "-updated_at", "limit": 4, **({"cursor": cursor} if cursor else {})}
+		data = client.get("/notes", params=params, headers=headers).json()
+		pages.append([note["id"] for note in data["notes"]])
+		cursor = data["next_cursor"]
+		if cursor is None:
+			break
+	assert sum(pages, []) == [note["id"] for note in response.json()["notes"]]
+	updated_at = response.json()["notes"][1]["updated_at"]
+	response = client.get("/notes", params={"updated_after": updated_at, "sort": "-id"}, headers=headers)
+	assert [note["id"] for note in response.json()["notes"]] == [note_ids[1], note_ids[0]]
+	response = client.get("/notes", params={"sort": "content"}, headers=headers)
+	assert response.status_code == 422
+	response = client.get("/notes", params={"sort": "created_at", "cursor": "5"}, headers=headers)
+	assert response.status_code == 422
+
+def test_get_notes_query_plans_use_indexes(set_up_test_database):
+	# Every filter and sort combination must be served by index seeks: SQLite
+	# reports a full table or index scan as "SCAN <table>".
+	session = set_up_test_database
+	note = Note(content="note", user_id=1)
+	tag = Tag(user_id=1, name="tag")
+	session.add(NoteTag(note=note, tag=tag))
+	session.commit()
+	executed = []
+	def capture(conn, cursor, statement, parameters, context, executemany):
+		executed.append((statement, parameters))
+	engine = session.get_bind()
+	event.listen(engine, "before_cursor_execute", capture)
+	timestamp = datetime(2024, 1, 1)
+	for archived, tag_name, ranges, sort, since in itertools.product(
+			(None, False), (None, "tag"), ({}, {"created_after": timestamp}, {"updated_before": timestamp}),
+			("id", "-id", "created_at", "-created_at", "updated_at", "-updated_at"), (None, timestamp)):
+		filters = NoteFilterSchema(archived=archived, tag=tag_name, sort=sort, **ranges)
+		cursor = 0 if sort.endswith("id") else f"{timestamp.isoformat()},0"
+		for page_cursor in (None, cursor):
+			NoteService.get_notes.__wrapped__(NoteService(1, session), 10, page_cursor, since, filters)
+	event.remove(engine, "before_cursor_execute", capture)
+	assert len(executed) > 100
+	for statement, parameters in executed:
+		plan = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+		assert [row[3] for row in plan if row[3].startswith("SCAN")] == [], statement
+
+def test_patch_note_content(set_up_new_note):
+	token, note_id = set_up_new_note
+	headers = {"Authorization": f"Bearer {token}"}
+	response = client.patch("/notes/diff", params={"note_id": note_id}, headers=headers,
+							json={"base_revision": 0, "ops": [{"offset": 0, "delete": 1, "insert": "N"},
+															  {"offset": 4, "insert": "s!"}]})
+	assert response.status_code == 200
+	assert response.json()["updated"]["revision"] == 1
+	assert "content" not in response.json()["updated"]
+	notes = client.get("/notes", headers=headers).json()["notes"]
+	assert (notes[0]["content"], notes[0]["revision"]) == ("Notes!", 1)
+	# Full replacements bump the revision too.
+	response = client.patch("/notes", params={"note_id": note_id}, json={"content": "new"}, headers=headers)
+	assert response.json()["updated"]["revision"] == 2
+
+def test_patch_note_content_rejects_stale_or_invalid_edits(set_up_new_note):
+	token, note_id = set_up_new_note
+	headers = {"Authorization": f"Bearer {token}"}
+	def patch(base_revision, *ops):
+		return client.patch("/notes/diff", params={"note_id": note_id}, headers=headers,
+							json={"base_revision": base_revision, "ops": list(ops)})
+	assert patch(0, {"offset": 4, "insert": "1"}).status_code == 200
+	response = patch(0, {"offset": 4, "insert": "2"})
+	assert response.status_code == 409
+	assert response.json() == {"updated": False, "revision": 1}
+	response = client.patch("/notes", params={"note_id": note_id}, json={"content": "x", "base_revision": 0}, headers=headers)
+	assert response.status_code == 409
+	assert patch(1, {"offset": 6, "insert": "x"}).status_code == 422
+	assert patch(1, {"offset": 2, "delete": 2}, {"offset": 3, "insert": "x"}).status_code == 422
+	assert client.patch("/notes/diff", params={"note_id": note_id + 1}, headers=headers,
+						json={"base_revision": 1, "ops": [{"offset": 0}]}).status_code == 404
+	notes = client.get("/notes", headers=headers).json()["notes"]
+	assert (notes[0]["content"], notes[0]["revision"]) == ("note1", 1)
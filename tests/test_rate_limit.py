@@ -0,0 +1,105 @@
+import asyncio
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, create_engine, Session
+from app.main import app
+from app.config.database import get_session
+from app.utils import rate_limit
+from app.utils.rate_limit import Budget, MemoryBucketStore, RateLimiter, RateLimitMiddleware, rate_limiter
+from app.utils.note_cache import note_cache
+
+client = TestClient(app)
+
+@pytest.fixture
+def set_up_test_database():
+	db_path = "testing_rate_limit.db"
+	engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+	SQLModel.metadata.create_all(engine)
+	note_cache.clear()
+	with Session(engine) as session:
+		app.dependency_overrides[get_session] = lambda: session
+		yield session
+	app.dependency_overrides.clear()
+	engine.dispose()
+	if os.path.exists(db_path):
+		os.remove(db_path)
+
+@pytest.fixture
+def small_budgets():
+	budgets = dict(rate_limiter.budgets)
+	rate_limiter.store.clear()
+	rate_limiter.budgets.update(read=Budget(0.001, 5), write=Budget(0.001, 2), auth=Budget(0.001, 4))
+	yield
+	rate_limiter.budgets.update(budgets)
+	rate_limiter.store.clear()
+
+def login(username: str) -> dict:
+	client.post("/users/create", json={"username": username, "password": "1"})
+	response = client.post("/users/login", data={"grant_type": "password", "username": username, "password": "1"},
+						   headers={"Content-Type": "application/x-www-form-urlencoded"})
+	return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_memory_bucket_allows_burst_then_refills(monkeypatch):
+	now = [100.0]
+	monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+	store = MemoryBucketStore(max_keys=10)
+	budget = Budget(rate=2, burst=3)
+	assert [asyncio.run(store.take("a", budget)) for _ in range(3)] == [0, 0, 0]
+	assert asyncio.run(store.take("a", budget)) == pytest.approx(0.5)
+	assert asyncio.run(store.take("b", budget)) == 0
+	now[0] += 0.5
+	assert asyncio.run(store.take("a", budget)) == 0
+	assert asyncio.run(store.take("a", budget)) > 0
+
+def test_memory_bucket_evicts_least_recently_used():
+	store = MemoryBucketStore(max_keys=2)
+	budget = Budget(rate=0.001, burst=1)
+	for key in ("a", "b", "c"):
+		asyncio.run(store.take(key, budget))
+	assert list(store.buckets) == ["b", "c"]
+
+def test_writes_are_limited_per_user(set_up_test_database, small_budgets):
+	first = login("1")
+	second = login("2")
+	for _ in range(2):
+		assert client.post("/notes/", json={"content": "note", "categories": []}, headers=first).status_code == 201
+	response = client.post("/notes/", json={"content": "note", "categories": []}, headers=first)
+	assert response.status_code == 429
+	assert int(response.headers["Retry-After"]) >= 1
+	# Reads and other users have their own buckets.
+	assert client.get("/notes/", headers=first).status_code == 200
+	assert client.post("/notes/", json={"content": "note", "categories": []}, headers=second).status_code == 201
+
+def test_auth_routes_are_limited_per_client_address(set_up_test_database, small_budgets):
+	login("1")
+	login("2")
+	response = client.post("/users/create", json={"username": "3", "password": "1"})
+	assert response.status_code == 429
+
+def test_concurrent_requests_are_capped_per_client():
+	release = asyncio.Event()
+	async def slow_app(scope, receive, send):
+		await release.wait()
+		await send({"type": "http.response.start", "status": 200, "headers": []})
+		await send({"type": "http.response.body", "body": b""})
+	limiter = RateLimiter(MemoryBucketStore(10), {"read": Budget(100, 100)}, max_concurrent=1)
+	middleware = RateLimitMiddleware(slow_app, limiter)
+	scope = {"type": "http", "method": "GET", "path": "/notes/", "headers": [], "client": ("10.0.0.1", 1)}
+	async def request() -> int:
+		statuses = []
+		async def send(message):
+			if message["type"] == "http.response.start":
+				statuses.append(message["status"])
+		async def receive():
+			return {"type": "http.request", "body": b"", "more_body": False}
+		await middleware(dict(scope), receive, send)
+		return statuses[0]
+	async def run():
+		first = asyncio.create_task(request())
+		await asyncio.sleep(0)
+		second = await request()
+		release.set()
+		return await first, second
+	assert asyncio.run(run()) == (200, 429)
+	assert limiter.in_flight == {}
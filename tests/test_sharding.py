@@ -0,0 +1,121 @@
+import os
+import pytest
+from datetime import datetime, timezone
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import SQLModel
+from app.main import app
+from app.config.database import create_app_engine, get_session
+from app.config.migrations import run_migrations
+from app.config.replica import RoutingSession
+from app.config.sharding import ShardMap
+from app.models.NoteModel import Note
+from app.utils.note_cache import note_cache
+from app.utils.rate_limit import rate_limiter
+
+client = TestClient(app)
+
+@pytest.fixture
+def set_up_shards(monkeypatch):
+	paths = [f"testing_shard_{shard}.db" for shard in range(3)]
+	engines = [create_app_engine(f"sqlite:///{path}") for path in paths]
+	for engine in engines:
+		SQLModel.metadata.create_all(engine)
+		run_migrations(engine)
+	shard_map = ShardMap(engines)
+	monkeypatch.setattr("app.dependencies.shard_map", shard_map)
+	monkeypatch.setattr("app.services.UserService.shard_map", shard_map)
+	monkeypatch.setattr(rate_limiter, "enabled", False)
+	note_cache.clear()
+	def get_session_override():
+		with RoutingSession(engines[0]) as session:
+			yield session
+	app.dependency_overrides[get_session] = get_session_override
+	yield shard_map
+	app.dependency_overrides.clear()
+	for engine in engines:
+		engine.dispose()
+	for path in paths:
+		for suffix in ("", "-wal", "-shm"):
+			if os.path.exists(path + suffix):
+				os.remove(path + suffix)
+
+def log_in(username: str) -> dict:
+	assert client.post("/users/create", json={"username": username, "password": "1"}).status_code == 201
+	response = client.post("/users/login", data={"username": username, "password": "1"})
+	return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def note_contents(engine) -> list[tuple]:
+	with engine.connect() as connection:
+		return connection.execute(text("SELECT user_id, content FROM note ORDER BY id")).all()
+
+def test_notes_are_written_to_the_users_shard(set_up_shards):
+	shard_map = set_up_shards
+	headers = [log_in(username) for username in ("1", "2", "3")]
+	# Users 1, 2 and 3 are placed on shards 1, 2 and 0.
+	assert [shard_map.locate(user_id).shard for user_id in (1, 2, 3)] == [1, 2, 0]
+	for index, user_headers in enumerate(headers):
+		response = client.post("/notes", json={"content": f"note {index + 1}", "categories": ["cat"]}, headers=user_headers)
+		assert response.status_code == status.HTTP_201_CREATED
+	assert note_contents(shard_map.engines[0]) == [(3, "note 3")]
+	assert note_contents(shard_map.engines[1]) == [(1, "note 1")]
+	assert note_contents(shard_map.engines[2]) == [(2, "note 2")]
+	response = client.get("/notes", headers=headers[1])
+	assert [note["content"] for note in response.json()["notes"]] == ["note 2"]
+	response = client.get("/tags", headers=headers[1])
+	assert [tag["name"] for tag in response.json()["tags"]] == ["cat"]
+
+def test_move_user_copies_notes_under_new_ids(set_up_shards):
+	shard_map = set_up_shards
+	other_headers = log_in("0")
+	headers = log_in("1")
+	# Takes the ids on shard 0 that the moved rows have on shard 2.
+	shard_map.assign(1, 0)
+	client.post("/notes/batch", json={"notes": [{"content": "other", "categories": ["tag"]}] * 3}, headers=other_headers)
+	created = client.post("/notes/batch", json={"notes": [{"content": "a", "categories": ["x", "y"]},
+														  {"content": "b", "categories": ["y"]}]},
+						  headers=headers).json()["results"]
+	assert client.delete("/notes", params={"note_id": created[1]["id"]}, headers=headers).status_code == status.HTTP_200_OK
+	synced_at = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+	client.post("/notes", json={"content": "c", "categories": []}, headers=headers)
+	before = client.get("/notes", headers=headers).json()["notes"]
+
+	assert shard_map.move_user(2, 0, grace=0) == 2
+	assert shard_map.locate(2).shard == 0 and not shard_map.locate(2).moving
+	assert all(user_id != 2 for user_id, _ in note_contents(shard_map.engines[2]))
+	after = client.get("/notes", headers=headers).json()["notes"]
+	assert [(note["content"], note["created_at"]) for note in after] == [(note["content"], note["created_at"]) for note in before]
+	assert [[category["name"] for category in note["categories"]] for note in after] == [["x", "y"], []]
+	assert {note["id"] for note in after}.isdisjoint(note["id"] for note in before)
+	# A client that synced before the move is told to drop every old id.
+	response = client.get("/notes", params={"since": synced_at}, headers=headers).json()
+	assert set(response["deleted"]) >= {note["id"] for note in before}
+	assert [note["content"] for note in response["notes"]] == ["a", "c"]
+
+def test_writes_are_refused_while_user_moves(set_up_shards):
+	shard_map = set_up_shards
+	headers = log_in("1")
+	shard_map.assign(1, 1, moving=True)
+	response = client.post("/notes", json={"content": "note", "categories": []}, headers=headers)
+	assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+	assert response.headers["retry-after"] == "1"
+	assert client.get("/notes", headers=headers).status_code == status.HTTP_200_OK
+	shard_map.assign(1, 1)
+	response = client.post("/notes", json={"content": "note", "categories": []}, headers=headers)
+	assert response.status_code == status.HTTP_201_CREATED
+
+def test_plan_balance_evens_out_notes(set_up_shards):
+	shard_map = set_up_shards
+	now = datetime.now(timezone.utc)
+	# Users 1 to 4 predate sharding: no directory rows, all on shard 0.
+	with shard_map.engines[0].begin() as connection:
+		connection.execute(Note.__table__.insert(), [{"content": "note", "user_id": user_id, "is_archived": False,
+													  "created_at": now, "updated_at": now}
+													 for user_id, count in ((1, 40), (2, 30), (3, 20), (4, 10))
+													 for _ in range(count)])
+	assert shard_map.plan_balance() == [(1, 0, 1), (2, 0, 2)]
+	for user_id, source, target in shard_map.plan_balance():
+		shard_map.move_user(user_id, target, grace=0)
+	assert {shard: sum(users.values()) for shard, users in shard_map.note_counts().items()} == {0: 30, 1: 40, 2: 30}
+	assert shard_map.plan_balance() == []
@@ -0,0 +1,53 @@
+import time
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from app.utils.token_manager import MemoryRevocationStore, TokenCache, token_cache, create_access_token, get_current_user, revoke_access_token
+
+@pytest.fixture
+def clear_token_cache():
+	token_cache.clear()
+	yield token_cache
+	token_cache.clear()
+
+def test_get_current_user_caches_claims(clear_token_cache):
+	token = create_access_token("user", 1, timedelta(minutes=5))
+	assert get_current_user(token) == {"username": "user", "id": 1}
+	assert get_current_user(token) == {"username": "user", "id": 1}
+	stats = token_cache.stats()
+	assert stats["misses"] == 1
+	assert stats["hits"] == 1
+
+def test_revoked_token_is_rejected(clear_token_cache):
+	token = create_access_token("user", 1, timedelta(minutes=5))
+	get_current_user(token)
+	revoke_access_token(token)
+	with pytest.raises(HTTPException) as error:
+		get_current_user(token)
+	assert error.value.status_code == 401
+
+def test_revocations_are_shared_through_the_store():
+	# Two caches on one store stand in for two workers sharing redis.
+	store = MemoryRevocationStore()
+	worker, other_worker = TokenCache(10, store), TokenCache(10, store)
+	expires_at = time.time() + 60
+	other_worker.put("token", {"id": 1}, expires_at)
+	worker.revoke("token", expires_at)
+	assert other_worker.is_revoked("token")
+	assert not other_worker.is_revoked("other token")
+
+def test_token_cache_expires_entries():
+	cache = TokenCache(max_size=10)
+	cache.put("token", {"id": 1}, time.time() - 1)
+	assert cache.get("token") is None
+
+def test_token_cache_evicts_least_recently_used():
+	cache = TokenCache(max_size=2)
+	expires_at = time.time() + 60
+	cache.put("a", {"id": 1}, expires_at)
+	cache.put("b", {"id": 2}, expires_at)
+	cache.get("a")
+	cache.put("c", {"id": 3}, expires_at)
+	assert cache.get("b") is None
+	assert cache.get("a") == {"id": 1}
+	assert cache.get("c") == {"id": 3}
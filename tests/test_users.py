@@ -89,8 +89,19 @@ def test_user_unauthorized(set_up_new_user):
 	assert response.status_code == 401
 	data = response.json()
 	assert data["detail"] == "Unauthorized"
-	
-	
-	
-	
-	
+
+def test_user_logout_revokes_token(set_up_new_user):
+	username, password, _ = set_up_new_user
+	response = client.post(
+		"/users/login", 
+		data={"grant_type": "password", "username": username, "password": password},
+		headers={"Content-Type": "application/x-www-form-urlencoded"}
+	)
+	token = response.json()["access_token"]
+	headers = {"Authorization": f"Bearer {token}"}
+	response = client.get("/notes", headers=headers)
+	assert response.status_code == 200
+	response = client.post("/users/logout", headers=headers)
+	assert response.status_code == 200
+	response = client.get("/notes", headers=headers)
+	assert response.status_code == 401
@@ -0,0 +1,114 @@
+import os
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.main import app
+from app.config.database import get_session
+from app.utils.note_cache import note_cache
+from app.utils.write_behind import WriteBehindBuffer, write_behind
+
+client = TestClient(app)
+
+@pytest.fixture
+def set_up_write_behind(monkeypatch, tmp_path):
+	db_path = "testing_write_behind.db"
+	engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+	SQLModel.metadata.create_all(engine)
+	note_cache.clear()
+	def get_session_override():
+		with Session(engine) as session:
+			yield session
+	app.dependency_overrides[get_session] = get_session_override
+	# Flushes only when a test asks for one.
+	monkeypatch.setattr(write_behind, "log_path", str(tmp_path / "write_behind.log"))
+	monkeypatch.setattr(write_behind, "interval", 3600)
+	write_behind.start([engine])
+	client.post("/users/create", json={"username": "1", "password": "1"})
+	response = client.post("/users/login", data={"username": "1", "password": "1"})
+	headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+	yield engine, headers
+	write_behind.stop()
+	app.dependency_overrides.clear()
+	engine.dispose()
+	if os.path.exists(db_path):
+		os.remove(db_path)
+
+def stored_content(engine, note_id: int) -> str:
+	with engine.connect() as connection:
+		return connection.execute(text("SELECT content FROM note WHERE id = :id"), {"id": note_id}).scalar()
+
+def edit(headers, note_id: int, content: str):
+	return client.patch("/notes", params={"note_id": note_id}, json={"content": content}, headers=headers)
+
+def test_edits_are_coalesced_until_flushed(set_up_write_behind):
+	engine, headers = set_up_write_behind
+	note_id = client.post("/notes", json={"content": "v0", "categories": []}, headers=headers).json()["note"]["id"]
+	etag = client.get("/notes", headers=headers).headers["etag"]
+	for version in ("v1", "v2", "v3"):
+		response = edit(headers, note_id, version)
+		assert response.status_code == status.HTTP_200_OK
+		assert response.json()["updated"]["content"] == version
+	assert stored_content(engine, note_id) == "v0"
+	# Reads see the pending version, and the ETag moves with it.
+	response = client.get("/notes", headers=headers)
+	assert [note["content"] for note in response.json()["notes"]] == ["v3"]
+	assert response.headers["etag"] != etag
+	stream = client.get("/notes", params={"stream": True}, headers=headers)
+	assert '"content":"v3"' in stream.text
+	assert edit(headers, note_id + 1, "other").status_code == status.HTTP_404_NOT_FOUND
+	assert write_behind.flush() == 1
+	assert stored_content(engine, note_id) == "v3"
+	assert write_behind.flush() == 0
+	assert [note["content"] for note in client.get("/notes", headers=headers).json()["notes"]] == ["v3"]
+
+def test_pending_edits_are_replayed_on_start(set_up_write_behind, tmp_path):
+	engine, headers = set_up_write_behind
+	note_id = client.post("/notes", json={"content": "v0", "categories": []}, headers=headers).json()["note"]["id"]
+	deleted_id = client.post("/notes", json={"content": "gone", "categories": []}, headers=headers).json()["note"]["id"]
+	edit(headers, note_id, "v1")
+	edit(headers, deleted_id, "edited")
+	client.delete("/notes", params={"note_id": deleted_id}, headers=headers)
+	edit(headers, note_id, "v2")
+	# A second buffer on the same log stands in for the process after a crash.
+	recovered = WriteBehindBuffer(write_behind.log_path, 3600)
+	recovered.start([engine])
+	recovered.stop()
+	assert stored_content(engine, note_id) == "v2"
+	assert stored_content(engine, deleted_id) is None
+	# Replayed segments are removed once their edits are written.
+	assert "write_behind.log.0" not in os.listdir(tmp_path)
+
+def test_patches_apply_to_the_pending_revision(set_up_write_behind):
+	engine, headers = set_up_write_behind
+	note_id = client.post("/notes", json={"content": "v0", "categories": []}, headers=headers).json()["note"]["id"]
+	assert edit(headers, note_id, "v1").json()["updated"]["revision"] == 1
+	def patch(base_revision, insert):
+		return client.patch("/notes/diff", params={"note_id": note_id}, headers=headers,
+							json={"base_revision": base_revision, "ops": [{"offset": 2, "insert": insert}]})
+	assert patch(1, "a").json()["updated"]["revision"] == 2
+	assert patch(1, "b").status_code == status.HTTP_409_CONFLICT
+	write_behind.flush()
+	assert patch(2, "c").json()["updated"]["revision"] == 3
+	write_behind.flush()
+	with engine.connect() as connection:
+		assert connection.execute(text("SELECT content, revision FROM note")).one() == ("v1ca", 3)
+
+def test_async_streams_see_pending_edits(set_up_write_behind):
+	engine, headers = set_up_write_behind
+	note_id = client.post("/notes", json={"content": "v0", "categories": []}, headers=headers).json()["note"]["id"]
+	async_engine = create_async_engine(f"sqlite+aiosqlite:///{engine.url.database}", poolclass=NullPool)
+	async def get_async_session_override():
+		async with AsyncSession(async_engine) as session:
+			yield session
+	app.dependency_overrides[get_session] = get_async_session_override
+	assert edit(headers, note_id, "v1").status_code == status.HTTP_200_OK
+	assert stored_content(engine, note_id) == "v0"
+	assert [note["content"] for note in client.get("/notes", headers=headers).json()["notes"]] == ["v1"]
+	stream = client.get("/notes", params={"stream": True}, headers=headers)
+	assert '"content":"v1"' in stream.text
+	assert '"revision":1' in stream.text